@@ -1,97 +1,398 @@
 """Flask application for Pawprint."""
 
-from flask import Flask, render_template, request, flash, redirect, session, get_flashed_messages, g 
-from flask_debugtoolbar import DebugToolbarExtension
-from sqlalchemy.exc import IntegrityError
-import requests
-
-from models import db, connect_db, User, Organization, Pet, Bookmark, Follow
+import asyncio
+import logging
+import os
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import click
+from flask import Flask, Blueprint, current_app, render_template, stream_template, request, flash, redirect, session, get_flashed_messages, g, jsonify
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from models import db, connect_db, User, CurrentUser, Organization, Bookmark, Follow, ApiUsage, StoredSession
+from ingest import ingest, KINDS
+from refresh import refresh
+from search import search_pets, can_search_locally
+from geo import locate, load_centroids
 from forms import SignUpForm, LoginForm, EditUserForm, PetSearchForm, OrganizationSearchForm
-from secret import MY_API_KEY, MY_SECRET
+from petfinder import PetfinderClient, AsyncPetfinderClient, PetfinderError
+from cache import TTLCache
+from resilience import CircuitBreaker
+from ratelimit import RateLimiter
+from prefetch import Prefetcher
+from passwords import PasswordHasher, PasswordHasherBusy
+from markers import SavedMarkers
+from sessions import ServerSideSessionInterface, DictSessionStore, SQLSessionStore, CachedSessionStore
+from config import config_by_name
 
 from wtforms import StringField
 
-app = Flask(__name__)
+logger = logging.getLogger(__name__)
+
+# views and hooks are registered on each app create_app() builds
+views = Blueprint('pawprint', __name__, cli_group=None)
+
+
+def create_app(config_name=None):
+    """
+    Build a Pawprint app with the named configuration profile
+    ("development", "test", "production" or "offline"; defaults to
+    $PAWPRINT_ENV, then "development").
+    """
+
+    app = Flask(__name__)
+    app.config.from_object(config_by_name[config_name or os.environ.get('PAWPRINT_ENV', "development")])
+
+    if app.config['SECRET_KEY'] is None:
+        raise RuntimeError("SECRET_KEY must be set in the environment")
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///pawprint'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ECHO'] = True
-app.config['SECRET_KEY'] = "geram03_pawprint"
-app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = False
+    if app.config['DEBUG_TB_ENABLED']:
+        # only development needs the toolbar, so only development pays for importing it
+        from flask_debugtoolbar import DebugToolbarExtension
+        DebugToolbarExtension(app)
 
-debug = DebugToolbarExtension(app)
+    connect_db(app)
+    init_services(app)
+    app.register_blueprint(views)
 
-connect_db(app)
+    # reading the postcode centroids takes a few tenths of a second; pay for it here rather
+    # than in the first request that locates anything (preloaded workers inherit the copy)
+    load_centroids()
+
+    # under a preloading server (e.g. gunicorn --preload) workers are forked from a process
+    # that already built this app; each needs its own connections, threads and caches
+    app_ref = weakref.ref(app)
+    os.register_at_fork(after_in_child=lambda: app_ref() and reset_after_fork(app_ref()))
+
+    return app
+
+def petfinder_credentials(config):
+    """
+    Return the Petfinder (API key, secret) from PETFINDER_API_KEY and
+    PETFINDER_SECRET, falling back to secret.py, which is only imported
+    when they are not set.
+    """
+
+    if config['PETFINDER_API_KEY'] and config['PETFINDER_SECRET']:
+        return config['PETFINDER_API_KEY'], config['PETFINDER_SECRET']
+
+    from secret import MY_API_KEY, MY_SECRET
+    return MY_API_KEY, MY_SECRET
+
+def init_services(app):
+    """Create the per-process Petfinder client, upstream executor, password hasher, saved markers and session store for app."""
+
+    config = app.config
+    api_key, secret = petfinder_credentials(config)
+    base_url = config['PETFINDER_BASE_URL']
+
+    if config['PETFINDER_STAND_IN'] is not None:
+        # offline: this worker answers its own Petfinder calls from a generated dataset
+        from standin import PetfinderStandIn
+        stand_in = PetfinderStandIn(**config['PETFINDER_STAND_IN'])
+        base_url = stand_in.start()
+        app.extensions['petfinder_stand_in'] = stand_in
+
+    # one pooled Petfinder client (and access token) shared by every request this worker serves
+    petfinder = PetfinderClient(
+        api_key,
+        secret,
+        base_url=base_url,
+        pool_size=config['PETFINDER_POOL_SIZE'],
+        connect_timeout=config['PETFINDER_CONNECT_TIMEOUT'],
+        read_timeout=config['PETFINDER_READ_TIMEOUT'],
+        max_retries=config['PETFINDER_MAX_RETRIES'],
+        search_cache=TTLCache(
+            max_bytes=config['SEARCH_CACHE_MAX_BYTES'],
+            ttl=config['SEARCH_CACHE_TTL'],
+            stale_ttl=config['SEARCH_CACHE_STALE_TTL'],
+        ),
+        detail_cache=TTLCache(
+            max_bytes=config['DETAIL_CACHE_MAX_BYTES'],
+            ttl=config['DETAIL_CACHE_TTL'],
+            stale_ttl=config['DETAIL_CACHE_STALE_TTL'],
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=config['BREAKER_FAILURE_THRESHOLD'],
+            slow_call_seconds=config['BREAKER_SLOW_CALL_SECONDS'],
+            reset_timeout=config['BREAKER_RESET_TIMEOUT'],
+        ),
+        rate_limiter=RateLimiter(
+            rate=config['PETFINDER_RATE_LIMIT'],
+            burst=config['PETFINDER_RATE_LIMIT_BURST'],
+            daily_quota=config['PETFINDER_DAILY_QUOTA'],
+            background_reserve=config['PETFINDER_BACKGROUND_RESERVE'],
+        ),
+        rate_limit_mode=config['PETFINDER_RATE_LIMIT_MODE'],
+        rate_limit_max_wait=config['PETFINDER_RATE_LIMIT_MAX_WAIT'],
+        recent_payloads=TTLCache(
+            max_bytes=config['RECENT_PAYLOADS_MAX_BYTES'],
+            ttl=config['RECENT_PAYLOADS_TTL'],
+        ),
+        prefetcher=Prefetcher(
+            TTLCache(max_bytes=config['PREFETCH_MAX_BYTES'], ttl=config['PREFETCH_TTL']),
+            max_in_flight=config['PREFETCH_MAX_IN_FLIGHT'],
+            per_owner=config['PREFETCH_PER_USER'],
+        ),
+        page_size=config['SEARCH_PAGE_SIZE'],
+        upstream_limit=config['PETFINDER_PAGE_LIMIT'],
+        fan_out_workers=config['PETFINDER_FAN_OUT_WORKERS'],
+    )
+
+    # Petfinder calls run on these threads, so async views can overlap independent calls and
+    # streamed pages can send their shell while the call is in flight
+    upstream_executor = ThreadPoolExecutor(max_workers=config['PETFINDER_POOL_SIZE'], thread_name_prefix="petfinder-upstream")
+
+    app.extensions['petfinder'] = petfinder
+    app.extensions['upstream_executor'] = upstream_executor
+    app.extensions['async_petfinder'] = AsyncPetfinderClient(petfinder, upstream_executor)
+
+    # bcrypt runs in worker processes, so a burst of logins cannot stall the threads serving pages
+    app.extensions['passwords'] = PasswordHasher(
+        rounds=config['BCRYPT_ROUNDS'],
+        workers=config['PASSWORD_HASH_WORKERS'],
+        max_pending=config['PASSWORD_HASH_MAX_PENDING'],
+        queue_timeout=config['PASSWORD_HASH_QUEUE_TIMEOUT'],
+    )
+
+    # which results on a search page the user already bookmarked or followed
+    app.extensions['saved_markers'] = SavedMarkers(
+        TTLCache(max_bytes=config['SAVED_MARKERS_MAX_BYTES'], ttl=config['SAVED_MARKERS_TTL']),
+        {"bookmarks" : Bookmark.saved_among, "follows" : Follow.saved_among},
+    )
+
+    # the session cookie only holds an id; search state, flashes and identity live server-side
+    session_store = SQLSessionStore(StoredSession) if config['SESSION_BACKEND'] == "sql" else DictSessionStore()
+    app.session_interface = ServerSideSessionInterface(CachedSessionStore(
+        session_store,
+        TTLCache(max_bytes=config['SESSION_CACHE_MAX_BYTES'], ttl=config['SESSION_CACHE_TTL']),
+    ))
+
+def reset_after_fork(app):
+    """
+    In a freshly forked worker, drop the database connections inherited
+    from the parent (without closing them under the parent) and build new
+    Petfinder sockets, threads, locks and caches.
+    """
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    init_services(app)
+
+def current_petfinder():
+    """The current app's Petfinder client."""
+
+    return current_app.extensions['petfinder']
 
 CURRENT_USER_KEY = "current_user"
+CURRENT_USER_NAME_KEY = "current_user_first_name"
 PET_SEARCH_FORM_KEY = "pet_search_form"
 ORGANIZATION_SEARCH_FORM_KEY = "organization_search_form"
 
-# Known Bug: Query string persists in request after submitting new filter criteria in search while on pages beyond the first.
-
 ##### STRETCH GOALS #####
 # 1: Implement a dynamic WTForms form on the homepage which lets the user toggle between searching for animals or organizations, and then
 # populates a drop-down with a list of potential filters followed by a text input for that filter's value. Also has a "Add another filter" button which would 
 # keep adding filters and text areas.
-# 2: Find a way to ensure that user always has a valid token. If a request fails (401), attempt to resolve it by generating a new token and
-# redirecting to the same page that the user was trying to access. timer, etc.? Could make this process a separate function that adds to flask session
-# For Reference: {"type":"https://httpstatus.es/401", "status":401, "title":"Unauthorized", "detail":"Access token invalid or expired"}
-# 3: Implement password reset functionality
+# 2: Implement password reset functionality
 
 
-@app.before_request
+@views.before_app_request
 def add_user_to_g():
-    """If user is logged in, add the current user to Flask globally."""
+    """
+    If user is logged in, add the current user to Flask globally.
+
+    The user's identity comes from the session; the User row is only
+    queried if a view needs more than the id and first name.
+    """
 
     if CURRENT_USER_KEY in session:
-        g.user = User.query.get(session[CURRENT_USER_KEY])
+        g.user = CurrentUser(session[CURRENT_USER_KEY], session.get(CURRENT_USER_NAME_KEY))
     else:
         g.user = None
 
+@views.after_app_request
+def forget_deleted_user(response):
+    """Log out a session whose user turned out to have been deleted."""
+
+    if g.get("user") is not None and not g.user:
+        do_logout()
+
+    return response
+
+@views.after_app_request
+def record_api_usage(response):
+    """Persist this worker's recent Petfinder call count and pick up the shared daily total."""
+
+    ApiUsage.flush(current_petfinder().rate_limiter)
+
+    return response
+
+def prefetch_owner():
+    """Who a prefetch is counted against: the logged in user, else the client address."""
+
+    return g.user.id if g.user else request.remote_addr
+
+def render_upstream(template, call, *args, **context):
+    """
+    Render template around the result of call(*args), a Petfinder call.
+
+    The call runs on the upstream executor while the page streams, so the
+    shell, nav and search form reach the browser before Petfinder answers;
+    the template waits on the future it gets as upstream. Flashed messages
+    are read first, since the session cookie is sent before the body.
+    """
+
+    get_flashed_messages()
+    upstream = current_app.extensions['upstream_executor'].submit(call, *args)
+
+    if not current_app.config['STREAM_TEMPLATES']:
+        upstream.exception()
+        return render_template(template, upstream=upstream, **context)
+
+    return stream_template(template, upstream=upstream, **context)
+
+def render_local(template, result, **context):
+    """Render a template written for render_upstream around a result already at hand."""
+
+    upstream = Future()
+    upstream.set_result(result)
+
+    return render_template(template, upstream=upstream, **context)
+
+def saved_ids(kind, ids):
+    """Return the ids the logged in user has saved as kind; nobody has saved anything when logged out."""
+
+    if not g.user or not ids:
+        return set()
+
+    return current_app.extensions['saved_markers'].saved(kind, g.user.id, ids)
+
+def bookmarked_pet_ids(animals):
+    """Return the ids among Petfinder animals the logged in user has bookmarked."""
+
+    return saved_ids("bookmarks", [animal["id"] for animal in animals])
+
+def followed_organization_ids(organizations):
+    """Return the ids among Petfinder organizations the logged in user follows."""
+
+    return saved_ids("follows", [organization["id"] for organization in organizations])
+
 def do_login(user):
     """Log in user."""
 
+    session.regenerate()
     session[CURRENT_USER_KEY] = user.id
+    session[CURRENT_USER_NAME_KEY] = user.first_name
 
 def do_logout():
     """Log user out."""
 
-    if CURRENT_USER_KEY in session:
-        del session[CURRENT_USER_KEY]
-
-@app.route('/')
-def generate_token():
-    """Generate an access token and redirect to homepage."""
-
-    url = "https://api.petfinder.com/v2/oauth2/token"
-
-    data = {
-        "grant_type" : "client_credentials",
-        "client_id" : MY_API_KEY,
-        "client_secret" : MY_SECRET
-    }
-
-    response = requests.post(url, data=data)
+    session.pop(CURRENT_USER_KEY, None)
+    session.pop(CURRENT_USER_NAME_KEY, None)
+
+@views.cli.command("purge-sessions")
+def purge_sessions():
+    """Delete expired server-side sessions."""
+
+    print(f"Removed {StoredSession.purge_expired()} expired sessions.")
+
+@views.cli.command("ingest")
+@click.option("--region", "regions", multiple=True, help="Postcode, \"City, State\" or state to mirror; defaults to INGEST_REGIONS.")
+@click.option("--kind", type=click.Choice(KINDS + ("all",)), default="all", help="Which listing to mirror.")
+@click.option("--restart", is_flag=True, help="Ignore checkpoints and start every listing from page 1.")
+def ingest_listings(regions, kind, restart):
+    """Mirror Petfinder organizations and animals for regions into the database."""
+
+    regions = regions or current_app.config['INGEST_REGIONS']
+
+    if not regions:
+        raise click.UsageError("Pass --region or set INGEST_REGIONS.")
+
+    # organizations first, so most animals find theirs already stored
+    for region in regions:
+        for listing in (KINDS if kind == "all" else (kind,)):
+            result = ingest(current_petfinder(), listing, region, restart=restart)
+            print(f"{result['stream']}: {result['rows']} rows from {result['pages']} pages "
+                  f"(from page {result['start_page']}) in {result['seconds']}s, {result['rows_per_second']} rows/s")
+
+@views.cli.command("refresh")
+@click.option("--kind", type=click.Choice(KINDS + ("all",)), default="all", help="Which stored rows to refresh.")
+@click.option("--max-age", type=int, help="Refresh rows synced more than this many seconds ago; defaults to REFRESH_MAX_AGE.")
+@click.option("--limit", type=int, help="Stop after this many rows.")
+def refresh_stored(kind, max_age, limit):
+    """Re-fetch stored pets and organizations from Petfinder, stalest first."""
+
+    config = current_app.config
+
+    for listing in (KINDS if kind == "all" else (kind,)):
+        result = refresh(
+            current_petfinder(),
+            listing,
+            max_age=config['REFRESH_MAX_AGE'] if max_age is None else max_age,
+            batch_size=config['REFRESH_BATCH_SIZE'],
+            workers=config['REFRESH_WORKERS'],
+            limit=limit,
+        )
+        print(f"{listing}: checked {result['checked']}, updated {result['updated']}, unlisted {result['unlisted']}, "
+              f"failed {result['failed']} in {result['seconds']}s ({result['rows_per_second']} rows/s, "
+              f"{result['upstream_calls']} upstream calls)")
+
+@views.cli.command("locate-organizations")
+def locate_organizations():
+    """Give stored organizations without coordinates their postcode's centroid."""
+
+    located = Organization.fill_coordinates()
+    db.session.commit()
+    print(f"Located {located} organizations.")
 
-    status_code = response.status_code
-    text = response.text
-    json = response.json()
+@views.cli.command("nearby")
+@click.argument("location")
+@click.option("--miles", type=float, default=25, help="Search radius.")
+@click.option("--limit", type=int, default=20, help="Show at most this many organizations.")
+def nearby_organizations(location, miles, limit):
+    """List stored organizations within --miles of a postcode or "City, State"."""
 
-    access_token = json.get("access_token")
+    point = locate(location)
+    if not point:
+        raise click.BadParameter(f"No centroid for {location!r}.", param_hint="LOCATION")
 
-    session["access_token"] = access_token
+    for organization, distance in Organization.within(*point, miles, limit=limit):
+        print(f"{distance:6.1f} mi  {organization.id}  {organization.name} ({organization.city}, {organization.state})")
 
-    flash("Access token generated!")
+@views.route('/')
+def show_root():
+    """Redirect to homepage."""
 
     return redirect('/home')
 
-@app.route('/home')
+@views.route('/status')
+def show_status():
+    """Report Petfinder client, circuit breaker, coalescing, rate limit, cache, prefetch, password hashing and saved marker state as JSON."""
+
+    petfinder = current_petfinder()
+
+    return jsonify(
+        petfinder=petfinder.stats(),
+        breaker=petfinder.breaker.stats(),
+        coalescing=petfinder.inflight.stats(),
+        rate_limit=petfinder.rate_limiter.stats(),
+        search_cache=petfinder.search_cache.stats(),
+        detail_cache=petfinder.detail_cache.stats(),
+        recent_payloads=petfinder.recent_payloads.stats(),
+        prefetch=petfinder.prefetcher.stats(),
+        passwords=current_app.extensions['passwords'].stats(),
+        saved_markers=current_app.extensions['saved_markers'].stats(),
+    )
+
+@views.route('/home')
 def show_homepage():
     """Show Pawprint homepage with options to search, register, log in."""
 
     return render_template('homepage.html')
 
-@app.route('/signup', methods=["GET", "POST"])
+@views.route('/signup', methods=["GET", "POST"])
 def signup():
     """
     Handle user signup.
@@ -120,6 +421,10 @@ def signup():
             flash("Username or email already taken", "danger")
             return render_template('users/signup.html', form=form)
 
+        except PasswordHasherBusy:
+            flash("Pawprint is busy right now. Please try again in a moment.", "danger")
+            return render_template('users/signup.html', form=form), 503
+
         do_login(user)
 
         flash(f"Welcome to Pawprint, {user.first_name}!")
@@ -130,17 +435,23 @@ def signup():
         return render_template('users/signup.html', form=form)
 
 
-@app.route('/login', methods=["GET", "POST"])
+@views.route('/login', methods=["GET", "POST"])
 def login():
     """Handle user login."""
 
     form = LoginForm()
 
     if form.validate_on_submit():
-        user = User.authenticate(form.username.data,
-                                 form.password.data)
+        try:
+            user = User.authenticate(form.username.data,
+                                     form.password.data)
+        except PasswordHasherBusy:
+            flash("Pawprint is busy right now. Please try again in a moment.", "danger")
+            return render_template('users/login.html', form=form), 503
         
         if user:
+            # keeps a password rehashed at the current cost
+            db.session.commit()
             do_login(user)
             flash(f"Welcome back, {user.first_name}!", "success")
             return redirect("/")
@@ -149,7 +460,7 @@ def login():
 
     return render_template('users/login.html', form=form)
 
-@app.route('/logout')
+@views.route('/logout')
 def logout():
     """Handle user logout."""
 
@@ -157,16 +468,16 @@ def logout():
     flash("Logout successful.")
     return redirect('login')
 
-@app.route('/profile', methods=["GET", "POST"])
+@views.route('/profile', methods=["GET", "POST"])
 def show_profile():
     """Show and edit profile for logged in user."""
 
-    if not g.user:
+    user = g.user.load() if g.user else None
+
+    if not user:
         flash("Please log in to view and edit your profile!", "danger")
         return redirect("/")
     
-    user = g.user
-    
     form = EditUserForm(obj=user)
 
     if form.validate_on_submit():
@@ -180,6 +491,7 @@ def show_profile():
             user.location = form.location.data 
             
             db.session.commit()
+            session[CURRENT_USER_NAME_KEY] = user.first_name
 
         except IntegrityError:
             flash("Username or email already taken", "danger")
@@ -192,7 +504,7 @@ def show_profile():
         return render_template('users/profile.html', form=form)
 
 
-@app.route('/bookmarks')
+@views.route('/bookmarks')
 def show_bookmarks():
     """Show bookmarks for the logged in user."""
 
@@ -200,11 +512,19 @@ def show_bookmarks():
         flash("Please log in to view your bookmarks!", "danger")
         return redirect("/")
     
-    pets = g.user.bookmarked_pets
+    try:
+        page = Bookmark.page_for_user(
+            g.user.id,
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+            per_page=current_app.config['BOOKMARKS_PER_PAGE'],
+        )
+    except ValueError:
+        return redirect('/bookmarks')
 
-    return render_template('users/bookmarks.html', pets=pets)
+    return render_template('users/bookmarks.html', pets=page.items, page=page)
 
-@app.route('/bookmarks/remove', methods=["POST"])
+@views.route('/bookmarks/remove', methods=["POST"])
 def remove_bookmark():
     """Remove target bookmark and redirect to bookmarks page."""
 
@@ -222,23 +542,62 @@ def remove_bookmark():
     
     db.session.delete(bookmark)
     db.session.commit()
+    current_app.extensions['saved_markers'].forget(user_id, "bookmarks")
 
     flash("Bookmark successfully removed.")
     return redirect('/bookmarks')
 
-@app.route('/follows')
+@views.route('/follows')
 def show_follows():
     """Show follows for the logged in user."""
 
     if not g.user:
         flash("Please log in to view your followed organizations!", "danger")
         return redirect('/')
+
+    if request.args.get("sort") == "distance":
+        return show_follows_by_distance()
     
-    organizations = g.user.followed_organizations
+    try:
+        page = Follow.page_for_user(
+            g.user.id,
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+            per_page=current_app.config['FOLLOWS_PER_PAGE'],
+        )
+    except ValueError:
+        return redirect('/follows')
+
+    return render_template('users/follows.html', organizations=page.items, page=page)
+
+def show_follows_by_distance():
+    """Show the logged in user's follows nearest to their location first."""
+
+    user = g.user.load()
+    if not user:
+        flash("Please log in to view your followed organizations!", "danger")
+        return redirect('/')
+
+    point = locate(user.location)
+    if not point:
+        flash("Add a postcode or \"City, State\" location to your profile to sort by distance.", "danger")
+        return redirect('/follows')
 
-    return render_template('users/follows.html', organizations=organizations)
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+    except ValueError:
+        return redirect('/follows?sort=distance')
 
-@app.route('/follows/remove', methods=["POST"])
+    per_page = current_app.config['FOLLOWS_PER_PAGE']
+    rows = Follow.page_by_distance(g.user.id, *point, page=page, per_page=per_page + 1)
+
+    return render_template('users/follows.html',
+                           organizations=[organization for organization, _ in rows[:per_page]],
+                           distances={organization.id : miles for organization, miles in rows[:per_page]},
+                           page_number=page,
+                           has_next=len(rows) > per_page)
+
+@views.route('/follows/remove', methods=["POST"])
 def remove_follows():
     """Remove target follow and redirect to follows page."""
 
@@ -256,181 +615,144 @@ def remove_follows():
     
     db.session.delete(follows)
     db.session.commit()
+    current_app.extensions['saved_markers'].forget(user_id, "follows")
 
     flash("Follow successfully removed.")
     return redirect('/follows')
     
-@app.route('/pets', methods=["GET", "POST"]) 
+@views.route('/pets', methods=["GET", "POST"]) 
 def show_pets():
-    """Show list of pets from Petfinder API."""
-
-    url = f"https://api.petfinder.com/v2/animals"
-    headers = {"Authorization" : f"Bearer {session['access_token']}"}
-    parameters = {}
-
-    if PET_SEARCH_FORM_KEY in session:
-
-        search_form_dict = session[PET_SEARCH_FORM_KEY]
-        form = PetSearchForm(data=search_form_dict) # use "data" parameter to pre-populate search form all active filters
-        parameters = { key : value for key, value in search_form_dict.items() if value }
-        parameters["page"] = request.args["page"] if "page" in request.args else 1
+    """
+    Show list of pets from Petfinder API, or from the pets stored in the
+    Pawprint DB when LOCAL_PET_SEARCH is on and the filters allow it.
+    """
 
-    else:
-        form = PetSearchForm()
+    # the active filters live in the session and the page in the query string,
+    # so a new search always starts again at page 1 of a clean URL
+    search_form_dict = session.get(PET_SEARCH_FORM_KEY, {})
+    form = PetSearchForm(data=search_form_dict) # use "data" parameter to pre-populate search form all active filters
 
     if form.validate_on_submit():
-        session[PET_SEARCH_FORM_KEY] = { field.name : field.data for field in form }
-
-        parameters = { field.name : field.data for field in form if field.data }
-        parameters["page"] = 1
-
-    response = requests.get(url, params=parameters, headers=headers)
-    status_code = response.status_code
-    json = response.json()
-        
-    pets = json.get("animals")
-    pagination = json.get("pagination")
+        session[PET_SEARCH_FORM_KEY] = form.search_data()
+        return redirect('/pets')
 
-    return render_template('pets.html', form=form, status_code=status_code, pets=pets, pagination=pagination)
-    # parameters = request.args
+    parameters = dict(search_form_dict, page=request.args.get("page", 1))
 
-@app.route('/organizations', methods=["GET", "POST"])
+    if current_app.config['LOCAL_PET_SEARCH'] and can_search_locally(parameters):
+        try:
+            json = search_pets(parameters, per_page=current_app.config['SEARCH_PAGE_SIZE'] or 20)
+        except SQLAlchemyError as exc:
+            # the local index is only a shortcut; Petfinder can still answer
+            db.session.rollback()
+            logger.warning("Local pet search failed: %s", exc)
+        else:
+            return render_local('pets.html', json, form=form, bookmarked_pet_ids=bookmarked_pet_ids)
+
+    petfinder = current_petfinder()
+    owner = prefetch_owner()
+
+    def search():
+        json = petfinder.search_animals(parameters)
+        # the next page is usually clicked next, so have it ready
+        petfinder.prefetch_animals(parameters, json.get("pagination"), owner)
+        return json
+
+    return render_upstream('pets.html', search, form=form, bookmarked_pet_ids=bookmarked_pet_ids)
+
+@views.route('/organizations', methods=["GET", "POST"])
 def show_organizations():
     """Show list of organizations from Petfinder API."""
 
-    url = f"https://api.petfinder.com/v2/organizations"
-    headers = {"Authorization" : f"Bearer {session['access_token']}"}
-    parameters = {}
-
-    if ORGANIZATION_SEARCH_FORM_KEY in session:
-
-        search_form_dict = session[ORGANIZATION_SEARCH_FORM_KEY]
-        form = OrganizationSearchForm(data=search_form_dict) # use "data" parameter to pre-populate search form all active filters
-        parameters = { key : value for key, value in search_form_dict.items() if value }
-        parameters["page"] = request.args["page"] if "page" in request.args else 1
-
-    else:
-        form = OrganizationSearchForm()
+    # the active filters live in the session and the page in the query string,
+    # so a new search always starts again at page 1 of a clean URL
+    search_form_dict = session.get(ORGANIZATION_SEARCH_FORM_KEY, {})
+    form = OrganizationSearchForm(data=search_form_dict) # use "data" parameter to pre-populate search form all active filters
 
     if form.validate_on_submit():
-        session[ORGANIZATION_SEARCH_FORM_KEY] = { field.name : field.data for field in form }
+        session[ORGANIZATION_SEARCH_FORM_KEY] = form.search_data()
+        return redirect('/organizations')
 
-        parameters = { field.name : field.data for field in form if field.data }
-        parameters["page"] = 1
+    parameters = dict(search_form_dict, page=request.args.get("page", 1))
 
-    response = requests.get(url, params=parameters, headers=headers)
-    status_code = response.status_code
-    json = response.json()
+    petfinder = current_petfinder()
+    owner = prefetch_owner()
 
-    organizations = json.get("organizations")
-    pagination = json.get("pagination")
+    def search():
+        json = petfinder.search_organizations(parameters)
+        petfinder.prefetch_organizations(parameters, json.get("pagination"), owner)
+        return json
 
-    return render_template('organizations.html', form=form, status_code=status_code, organizations=organizations, pagination=pagination)
+    return render_upstream('organizations.html', search, form=form, followed_organization_ids=followed_organization_ids)
 
-@app.route('/organizations/<string:organization_id>')
+@views.route('/organizations/<string:organization_id>')
 def show_organization(organization_id):
     """Show details page for target organization."""
 
-    url = f"https://api.petfinder.com/v2/organizations/{organization_id}"
-    headers = {"Authorization" : f"Bearer {session['access_token']}"}
-    response = requests.get(url, headers=headers)
-
-    status_code = response.status_code
-    json = response.json()
-
-    organization = json.get("organization")
-
-    return render_template('organization.html', organization=organization)
+    return render_upstream('organization.html', current_petfinder().get_organization, organization_id)
     
-@app.route('/pets/<int:pet_id>')
+@views.route('/pets/<int:pet_id>')
 def show_pet(pet_id):
     """Show details page for target pet."""
 
-    url = f"https://api.petfinder.com/v2/animals/{pet_id}"
-    headers = {"Authorization" : f"Bearer {session['access_token']}"}
-    response = requests.get(url, headers=headers)
-
-    status_code = response.status_code
-    json = response.json()
-
-    pet = json.get("animal")
-
-    return render_template('pet.html', pet=pet)
-
-def create_organization(organization_id):
-    """
-    Helper function that accepts an organization ID and makes a request to Petfinder API
-    for all of the organization information to add it to Pawprint DB.
-    """
-
-    url = f"https://api.petfinder.com/v2/organizations/{organization_id}"
-    headers = {"Authorization" : f"Bearer {session['access_token']}"}
-    response = requests.get(url, headers=headers)
-
-    status_code = response.status_code
-    json = response.json()
-    petfinder_organization = json.get("organization")
-
-    organization = Organization.create(petfinder_organization)
+    return render_upstream('pet.html', current_petfinder().get_animal, pet_id)
 
-    db.session.commit()
-
-    return organization
-
-def create_pet(pet_id):
+async def fetch_for_bookmark(pet_id, organization_id):
     """
-    Helper function that accepts a pet ID and makes a request to Petfinder API
-    for all of the pet details to add it to Pawprint DB.
+    Helper function that fetches a Petfinder animal and organization concurrently.
+    Either ID may be None to skip that fetch; returns (animal, organization).
     """
 
-    url = f"https://api.petfinder.com/v2/animals/{pet_id}"
-    headers = {"Authorization" : f"Bearer {session['access_token']}"}
-    response = requests.get(url, headers=headers)
+    async_petfinder = current_app.extensions['async_petfinder']
 
+    async def nothing():
+        return None
 
-    status_code = response.status_code
-    json = response.json()
-    petfinder_animal = json.get("animal")
+    return await asyncio.gather(
+        async_petfinder.get_animal(pet_id) if pet_id else nothing(),
+        async_petfinder.get_organization(organization_id) if organization_id else nothing(),
+    )
 
-    pet = Pet.create(petfinder_animal)
-    db.session.commit()
-    return pet
-
-@app.route('/pets/bookmark/new', methods=["POST"])
-def bookmark_pet():
+@views.route('/pets/bookmark/new', methods=["POST"])
+async def bookmark_pet():
     """
     Bookmark target pet for logged-in user.
     Adds pet and its organization to Pawprint DB.
+
+    Looks up both in one query, fetches whichever are missing from Petfinder
+    concurrently, and writes everything with upserts in one transaction.
     """
 
-    if not g.user:
+    # the bookmark references the user's row, so make sure it still exists
+    if not g.user or not g.user.load():
         flash("Please log in to bookmark a pet!", "danger")
         return redirect("/")
     
-    organization_id = request.form["organization_id"]
-    organization = Organization.query.get(organization_id)
-
-    if not organization:
-        organization = create_organization(organization_id)
-
-    pet_id = request.form["pet_id"]
-    pet = Pet.query.get(pet_id)
+    try:
+        pet_id = int(request.form["pet_id"])
+    except ValueError:
+        flash("Invalid pet.", "danger")
+        return redirect('/pets')
 
-    if not pet:
-        pet = create_pet(pet_id)
+    organization_id = request.form["organization_id"]
 
-    bookmark = Bookmark.query.get((g.user.id, pet.id))
-    if not bookmark:
-        bookmark = Bookmark(user_id=g.user.id, pet_id=pet.id)
-        db.session.add(bookmark)
+    pet_name, organization_name = Bookmark.stored_names(pet_id, organization_id)
 
-    follow = Follow.query.get((g.user.id, organization.id))
-    if not follow:
-        follow = Follow(user_id=g.user.id, organization_id=organization.id)
-        db.session.add(follow)
+    try:
+        petfinder_animal, petfinder_organization = await fetch_for_bookmark(
+            pet_id if pet_name is None else None,
+            organization_id if organization_name is None else None,
+        )
+    except PetfinderError:
+        flash("Could not reach Petfinder to bookmark that pet. Please try again shortly.", "danger")
+        return redirect('/pets')
 
+    Bookmark.save_for_user(g.user.id, pet_id, organization_id, petfinder_animal, petfinder_organization)
     db.session.commit()
+    current_app.extensions['saved_markers'].forget(g.user.id, "bookmarks", "follows")
+
+    pet_name = pet_name or petfinder_animal.get("name")
+    organization_name = organization_name or petfinder_organization.get("name")
 
-    flash(f"Successfully bookmarked {pet.name} and followed {organization.name} for your profile, {g.user.first_name}!")
+    flash(f"Successfully bookmarked {pet_name} and followed {organization_name} for your profile, {g.user.first_name}!")
 
     return redirect('/pets')
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Benchmark sequential vs. concurrent Petfinder calls for a view that needs
+both an animal and its organization (as bookmark_pet does when neither is
+stored yet).
+
+Runs the local Petfinder stand-in (standin.py), which answers every
+request after --latency seconds, then serves --requests simulated page
+views from --concurrency worker threads, once calling the blocking client
+twice in a row and once awaiting both calls through AsyncPetfinderClient.
+
+    python bench_async.py --requests 200 --concurrency 8 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from petfinder import PetfinderClient, AsyncPetfinderClient
+from standin import PetfinderStandIn
+
+
+def run(view, requests, concurrency):
+    """Call view(i) for each of requests page views from concurrency threads. Returns requests/second."""
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as workers:
+        list(workers.map(view, range(requests)))
+
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="worker threads serving page views")
+    parser.add_argument("--latency", type=float, default=0.1, help="stand-in latency per call in seconds")
+    args = parser.parse_args()
+
+    stand_in = PetfinderStandIn(latency=args.latency)
+    base_url = stand_in.start()
+    organization_ids = [organization["id"] for organization in stand_in.organizations]
+
+    # no caches, so every page view really makes both upstream calls
+    client = PetfinderClient("BENCH-KEY", "BENCH-SECRET", base_url=base_url, pool_size=4 * args.concurrency)
+    async_client = AsyncPetfinderClient(client, ThreadPoolExecutor(max_workers=2 * args.concurrency))
+
+    def animal_id(i):
+        return i % len(stand_in.animals) + 1
+
+    def sync_view(i):
+        client.get_animal(animal_id(i))
+        client.get_organization(organization_ids[i % len(organization_ids)])
+
+    def async_view(i):
+        async def view():
+            await asyncio.gather(async_client.get_animal(animal_id(i)),
+                                 async_client.get_organization(organization_ids[i % len(organization_ids)]))
+
+        asyncio.run(view())
+
+    # warm up the token and connection pool
+    run(sync_view, args.concurrency, args.concurrency)
+
+    sync_rate = run(sync_view, args.requests, args.concurrency)
+    async_rate = run(lambda i: async_view(args.requests + i), args.requests, args.concurrency)
+
+    print(f"{'views':<12}{'requests/s':>12}")
+    print(f"{'sequential':<12}{sync_rate:>12.1f}")
+    print(f"{'concurrent':<12}{async_rate:>12.1f}")
+    print(f"speedup: {async_rate / sync_rate:.2f}x")
+
+    stand_in.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark bookmarking a pet: latency and DB statements per bookmark.
+
+Compares the original bookmark flow (look up each row, create missing
+rows with separate commits) with the current one (one lookup query,
+concurrent upstream fetches, upserts in one transaction). Petfinder is
+replaced by a stub that sleeps for --latency seconds per call.
+
+Needs the pawprint-test Postgres database:
+
+    python bench_bookmark.py --iterations 50 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+from models import db, User, Organization, Pet, Bookmark, Follow
+
+from app import create_app, fetch_for_bookmark
+
+app = create_app("test")
+petfinder = app.extensions['petfinder']
+
+
+def fake_animal(pet_id, organization_id):
+    """A Petfinder animal object with the fields Pet.create reads."""
+
+    return {
+        "id" : pet_id,
+        "name" : f"Bench Pet {pet_id}",
+        "type" : "Dog",
+        "species" : "Dog",
+        "breeds" : {"primary" : "Mixed"},
+        "colors" : {"primary" : None},
+        "age" : "Adult",
+        "gender" : "Female",
+        "size" : "Medium",
+        "status" : "adoptable",
+        "description" : None,
+        "photos" : [],
+        "organization_id" : organization_id,
+    }
+
+
+def fake_organization(organization_id):
+    """A Petfinder organization object with the fields Organization.create reads."""
+
+    return {
+        "id" : organization_id,
+        "name" : f"Bench Organization {organization_id}",
+        "email" : "bench@organization.org",
+        "phone" : None,
+        "address" : {"address1" : None, "city" : "Bench City", "state" : "NY", "postcode" : "10001", "country" : "US"},
+        "url" : "https://example.com",
+        "photos" : [],
+    }
+
+
+def legacy_bookmark(user_id, pet_id, organization_id, latency):
+    """The bookmark flow as it was before upserts: up to six SELECTs and three commits."""
+
+    organization = Organization.query.get(organization_id)
+
+    if not organization:
+        time.sleep(latency)
+        organization = Organization.create(fake_organization(organization_id))
+        db.session.commit()
+
+    pet = Pet.query.get(pet_id)
+
+    if not pet:
+        time.sleep(latency)
+        pet = Pet.create(fake_animal(pet_id, organization_id))
+        db.session.commit()
+
+    if not Bookmark.query.get((user_id, pet.id)):
+        db.session.add(Bookmark(user_id=user_id, pet_id=pet.id))
+
+    if not Follow.query.get((user_id, organization.id)):
+        db.session.add(Follow(user_id=user_id, organization_id=organization.id))
+
+    db.session.commit()
+
+
+def current_bookmark(user_id, pet_id, organization_id, latency):
+    """The steps bookmark_pet runs today."""
+
+    def get_animal(animal_id):
+        time.sleep(latency)
+        return fake_animal(animal_id, organization_id)
+
+    def get_organization(id):
+        time.sleep(latency)
+        return fake_organization(id)
+
+    with patch.object(petfinder, "get_animal", get_animal), \
+         patch.object(petfinder, "get_organization", get_organization):
+
+        pet_name, organization_name = Bookmark.stored_names(pet_id, organization_id)
+        petfinder_animal, petfinder_organization = asyncio.run(fetch_for_bookmark(
+            pet_id if pet_name is None else None,
+            organization_id if organization_name is None else None,
+        ))
+        Bookmark.save_for_user(user_id, pet_id, organization_id, petfinder_animal, petfinder_organization)
+        db.session.commit()
+
+
+def reset():
+    """Empty the tables and add one bench user. Returns the user's id."""
+
+    db.session.rollback()
+    for model in (Bookmark, Follow, Pet, Organization, User):
+        model.query.delete()
+
+    user = User(email="bench@test.com", username="benchuser", password="HASHED_PASSWORD", first_name="Bench")
+    db.session.add(user)
+    db.session.commit()
+
+    return user.id
+
+
+def run(flow, iterations, latency, stored):
+    """
+    Bookmark iterations pets with flow. If stored, the pets and their
+    organizations are already in the DB. Returns (latencies, statement counts).
+    """
+
+    user_id = reset()
+
+    if stored:
+        for i in range(iterations):
+            Organization.create(fake_organization(f"BENCH-{i}"))
+            db.session.flush()
+            Pet.create(fake_animal(900000 + i, f"BENCH-{i}"))
+        db.session.commit()
+
+    latencies = []
+    statements = []
+    count = [0]
+
+    def before_cursor_execute(*args):
+        count[0] += 1
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    try:
+        for i in range(iterations):
+            db.session.expire_all()
+            count[0] = 0
+            start = time.perf_counter()
+            flow(user_id, 900000 + i, f"BENCH-{i}", latency)
+            latencies.append(time.perf_counter() - start)
+            statements.append(count[0])
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    return latencies, statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated Petfinder latency in seconds")
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"{'flow':<10}{'pet stored':<12}{'p50 ms':>10}{'p95 ms':>10}{'statements':>12}")
+
+        for stored in (False, True):
+            for name, flow in (("before", legacy_bookmark), ("after", current_bookmark)):
+                latencies, statements = run(flow, args.iterations, args.latency, stored)
+                latencies.sort()
+                p50 = statistics.median(latencies) * 1000
+                p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+                print(f"{name:<10}{str(stored):<12}{p50:>10.1f}{p95:>10.1f}{statistics.mean(statements):>12.1f}")
+
+        reset()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark "organizations within N miles" (Organization.within) latency at
+several table sizes.
+
+Fills the organizations table with generated rows scattered over the
+contiguous US using INSERT ... SELECT over generate_series, analyzes it,
+then times Organization.within() around a few postcodes and radii.
+
+Needs the pawprint-test Postgres database; its pets, follows, bookmarks
+and organizations are replaced:
+
+    python bench_geo.py --rows 10000 100000 --repeat 20
+"""
+
+import argparse
+import statistics
+import time
+
+from models import db, Organization, Pet, Bookmark, Follow
+from geo import centroid
+
+from app import create_app
+
+SEARCHES = (
+    ("10001", 10),
+    ("10001", 50),
+    ("60601", 25),
+    ("80202", 100),
+    ("99501", 25),
+)
+
+# repeatable random points between 25N-49N and 124W-67W
+FILL = """
+INSERT INTO organizations (id, name, email, city, state, postcode, country, url, latitude, longitude)
+SELECT 'GEO' || i, 'Generated Organization ' || i, 'test@organization.org', 'Test City', 'TS', '00000', 'US',
+       'https://example.org', 25 + random() * 24, -124 + random() * 57
+FROM generate_series(1, :rows) AS i
+"""
+
+
+def fill(rows):
+    """Replace every stored organization with rows generated ones."""
+
+    for model in (Bookmark, Follow, Pet, Organization):
+        db.session.execute(db.delete(model))
+
+    db.session.execute(db.select(db.func.setseed(0.5)))
+    db.session.execute(db.text(FILL), {"rows" : rows})
+    db.session.commit()
+
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(db.text("VACUUM ANALYZE organizations"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="table sizes to test")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs of each search")
+    args = parser.parse_args()
+
+    app = create_app("test")
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"{'rows':>9}  {'postcode':<10}{'miles':>6}{'matches':>9}{'p50 ms':>9}{'p95 ms':>9}")
+
+        for rows in args.rows:
+            fill(rows)
+
+            for postcode, miles in SEARCHES:
+                point = centroid(postcode)
+                Organization.within(*point, miles)
+                timings = []
+
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    found = Organization.within(*point, miles)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                timings.sort()
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                print(f"{rows:>9}  {postcode:<10}{miles:>6}{len(found):>9}"
+                      f"{statistics.median(timings):>9.1f}{p95:>9.1f}")
+
+        db.session.execute(db.delete(Organization))
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark ingestion from the local Petfinder stand-in (standin.py):
+rows/second, and peak Python memory for a run twice as long, which
+should stay about the same since only one page is held at a time.
+
+Needs the pawprint-test Postgres database:
+
+    python bench_ingest.py --animals 20000 --latency 0.05
+"""
+
+import argparse
+import tracemalloc
+
+from models import db, Pet, Organization, IngestCheckpoint
+from petfinder import PetfinderClient
+from standin import PetfinderStandIn
+from ingest import ingest
+
+from app import create_app
+
+
+def run(app, petfinder, region):
+    """Ingest region into empty tables. Returns (ingest result, peak traced memory in KiB)."""
+
+    with app.app_context():
+        Pet.query.delete()
+        Organization.query.delete()
+        IngestCheckpoint.query.delete()
+        db.session.commit()
+
+        tracemalloc.start()
+        result = ingest(petfinder, "animals", region)
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    return result, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--animals", type=int, default=20000, help="animals in the stand-in's dataset")
+    parser.add_argument("--organizations", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in latency per call in seconds")
+    args = parser.parse_args()
+
+    app = create_app("test")
+
+    with app.app_context():
+        db.create_all()
+
+    print(f"{'animals':>10}{'pages':>8}{'rows':>8}{'rows/s':>10}{'peak KiB':>10}")
+
+    for animals in (args.animals // 2, args.animals):
+        stand_in = PetfinderStandIn(animals=animals, organizations=args.organizations, latency=args.latency)
+        petfinder = PetfinderClient("BENCH-KEY", "BENCH-SECRET", base_url=stand_in.start())
+
+        # a state covers far more pages than a postcode
+        result, peak = run(app, petfinder, "NY")
+        print(f"{animals:>10}{result['pages']:>8}{result['rows']:>8}{result['rows_per_second']:>10}{peak:>10.0f}")
+
+        stand_in.shutdown()
+
+
+if __name__ == "__main__":
+    main()
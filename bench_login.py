@@ -0,0 +1,78 @@
+"""
+Benchmark login throughput under concurrency: password checks on the
+request threads vs. on PasswordHasher's process pool.
+
+--logins checks (a quarter of them for unknown usernames, which go
+through the dummy hash) are made from --concurrency threads, as a burst
+of login requests would. Reports logins/second, median latency for known
+and unknown usernames, and how many were turned away by back-pressure.
+
+    python bench_login.py --logins 200 --concurrency 16 --rounds 12 --workers 4
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+def run(hasher, hashed, logins, concurrency):
+    """Make logins checks from concurrency threads. Returns (logins/s, known p50 ms, unknown p50 ms, rejected)."""
+
+    def login(i):
+        start = time.perf_counter()
+        unknown = i % 4 == 0
+
+        try:
+            if unknown:
+                hasher.check_unknown("password")
+            else:
+                hasher.check(hashed, "password")
+        except PasswordHasherBusy:
+            return unknown, None
+
+        return unknown, time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        results = list(threads.map(login, range(logins)))
+
+    elapsed = time.perf_counter() - start
+
+    known = [seconds * 1000 for unknown, seconds in results if seconds is not None and not unknown]
+    unknown = [seconds * 1000 for unknown, seconds in results if seconds is not None and unknown]
+    rejected = sum(seconds is None for unknown, seconds in results)
+
+    return (logins - rejected) / elapsed, statistics.median(known), statistics.median(unknown), rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="threads making login requests")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=4, help="hashing processes")
+    parser.add_argument("--max-pending", type=int, default=16, help="checks queued or running before back-pressure")
+    parser.add_argument("--queue-timeout", type=float, default=30, help="seconds to wait for a queue slot")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'logins/s':>10}{'known p50 ms':>14}{'unknown p50 ms':>16}{'rejected':>10}")
+
+    for mode, workers in (("inline", 0), ("pool", args.workers)):
+        hasher = PasswordHasher(rounds=args.rounds, workers=workers, max_pending=args.max_pending, queue_timeout=args.queue_timeout)
+        hashed = hasher.hash("password")
+
+        # warm up the worker processes and the dummy hash
+        run(hasher, hashed, args.workers, args.workers)
+
+        rate, known, unknown, rejected = run(hasher, hashed, args.logins, args.concurrency)
+        print(f"{mode:<10}{rate:>10.1f}{known:>14.1f}{unknown:>16.1f}{rejected:>10}")
+
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
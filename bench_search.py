@@ -0,0 +1,95 @@
+"""
+Benchmark local pet search (search.py) latency at several table sizes.
+
+Fills the pets table with generated rows using INSERT ... SELECT over
+generate_series, vacuums and analyzes it, then times search_pets() (a facet count
+query plus a page query) for a few typical searches.
+
+Needs the pawprint-test Postgres database; its pets are replaced:
+
+    python bench_search.py --rows 100000 1000000 --repeat 20
+"""
+
+import argparse
+import statistics
+import time
+
+from models import db, Pet
+from search import search_pets
+
+from app import create_app
+
+SEARCHES = (
+    {"type" : "dog"},
+    {"type" : "cat", "size" : "small,medium", "age" : "young"},
+    {"breed" : "samoyed"},
+    {"name" : "luna", "gender" : "female"},
+    {"type" : "dog", "page" : 50},
+)
+
+# generated pets pick each column from these, by row number
+FILL = """
+INSERT INTO pets (id, name, type, species, breed, color, age, gender, size, status, description)
+SELECT i,
+       (ARRAY['Fred','Spark','Luna','Milo','Bella','Max','Daisy','Oliver','Coco','Rocky'])[i % 10 + 1] || ' ' || i,
+       (ARRAY['Dog','Cat','Rabbit'])[i % 3 + 1],
+       (ARRAY['Dog','Cat','Rabbit'])[i % 3 + 1],
+       (ARRAY['Pug','Samoyed','Beagle','Siamese','Tabby','Maine Coon','Lop Eared'])[i % 7 + 1],
+       (ARRAY['Black','White','Brown','Gray','Golden'])[i % 5 + 1],
+       (ARRAY['Baby','Young','Adult','Senior'])[i % 4 + 1],
+       (ARRAY['Male','Female'])[i / 3 % 2 + 1],
+       (ARRAY['Small','Medium','Large','Extra Large'])[i / 7 % 4 + 1],
+       (ARRAY['adoptable','adoptable','adoptable','adopted','found'])[i % 5 + 1],
+       'A friendly pet looking for a home.'
+FROM generate_series(1, :rows) AS i
+"""
+
+
+def fill(rows):
+    """Replace every stored pet with rows generated ones."""
+
+    db.session.execute(db.delete(Pet))
+    db.session.execute(db.text(FILL), {"rows" : rows})
+    db.session.commit()
+
+    # as autovacuum would, so facet counts can use an index-only scan
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(db.text("VACUUM ANALYZE pets"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000], help="table sizes to test")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs of each search")
+    args = parser.parse_args()
+
+    app = create_app("test")
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"{'rows':>9}  {'search':<50}{'matches':>9}{'p50 ms':>9}{'p95 ms':>9}")
+
+        for rows in args.rows:
+            fill(rows)
+
+            for params in SEARCHES:
+                search_pets(params)
+                timings = []
+
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    json = search_pets(params)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                timings.sort()
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                print(f"{rows:>9}  {str(params):<50}{json['pagination']['total_count']:>9}"
+                      f"{statistics.median(timings):>9.1f}{p95:>9.1f}")
+
+        db.session.execute(db.delete(Pet))
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
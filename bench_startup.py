@@ -0,0 +1,74 @@
+"""
+Benchmark worker startup: how long `import app` takes in a fresh
+interpreter, and how long building the app and serving its first request
+takes after that. Exits with status 1 if either median is over budget,
+so it can guard against import-time work creeping back in.
+
+Needs the pawprint-test Postgres database:
+
+    python bench_startup.py --runs 5 --import-budget 1.0 --first-request-budget 0.5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# runs in a fresh interpreter each time, so nothing is already imported
+STARTUP_SCRIPT = """
+import json, time
+
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+
+application = app.create_app("test")
+response = application.test_client().get("/home")
+served = time.perf_counter()
+
+assert response.status_code == 200, response.status_code
+print(json.dumps({"import" : imported - start, "first_request" : served - imported}))
+"""
+
+
+def measure(runs):
+    """Start runs fresh interpreters. Returns lists of import and first-request seconds."""
+
+    imports = []
+    first_requests = []
+
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True, check=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        imports.append(timings["import"])
+        first_requests.append(timings["first_request"])
+
+    return imports, first_requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=1.0, help="seconds allowed for `import app`")
+    parser.add_argument("--first-request-budget", type=float, default=0.5, help="seconds allowed for create_app() plus one request")
+    args = parser.parse_args()
+
+    imports, first_requests = measure(args.runs)
+    over_budget = False
+
+    print(f"{'phase':<16}{'p50 ms':>10}{'max ms':>10}{'budget ms':>12}")
+
+    for name, timings, budget in (("import app", imports, args.import_budget),
+                                  ("first request", first_requests, args.first_request_budget)):
+        median = statistics.median(timings)
+        over_budget = over_budget or median > budget
+        print(f"{name:<16}{median * 1000:>10.1f}{max(timings) * 1000:>10.1f}{budget * 1000:>12.0f}")
+
+    if over_budget:
+        print("startup is over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark time to first byte and total time of the search and detail
+pages, rendered whole and streamed.
+
+Petfinder is replaced by the local stand-in (standin.py), which answers
+after --latency seconds, and the app is served on a local port.
+Caches and prefetching are switched off so every page view waits on the
+stand-in.
+
+Needs the pawprint-test Postgres database:
+
+    python bench_ttfb.py --requests 20 --latency 0.3
+"""
+
+import argparse
+import http.client
+import logging
+import statistics
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from standin import PetfinderStandIn
+
+from app import create_app
+
+
+
+def fetch(port, path):
+    """GET path. Returns (seconds until the status line, seconds until the last byte)."""
+
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+
+    connection.request("GET", path)
+    response = connection.getresponse()
+    first_byte = time.perf_counter() - start
+
+    response.read()
+    total = time.perf_counter() - start
+    connection.close()
+
+    return first_byte, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="views of each page per mode")
+    parser.add_argument("--latency", type=float, default=0.3, help="stand-in latency per call in seconds")
+    args = parser.parse_args()
+
+    stand_in = PetfinderStandIn(latency=args.latency)
+    base_url = stand_in.start()
+    pages = ("/pets", "/organizations", f"/pets/{stand_in.animals[0]['id']}", f"/organizations/{stand_in.organizations[0]['id']}")
+
+    app = create_app("test")
+
+    petfinder = app.extensions['petfinder']
+    petfinder.base_url = base_url
+    petfinder.token_manager.token_url = f"{base_url}/oauth2/token"
+    petfinder.search_cache = petfinder.detail_cache = petfinder.recent_payloads = petfinder.prefetcher = None
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{'page':<24}{'mode':<10}{'TTFB p50 ms':>14}{'total p50 ms':>14}")
+
+    for path in pages:
+        for mode, streamed in (("whole", False), ("streamed", True)):
+            app.config['STREAM_TEMPLATES'] = streamed
+            timings = [fetch(server.server_port, path) for _ in range(args.requests)]
+
+            first_byte = statistics.median(timing[0] for timing in timings) * 1000
+            total = statistics.median(timing[1] for timing in timings) * 1000
+            print(f"{path:<24}{mode:<10}{first_byte:>14.1f}{total:>14.1f}")
+
+    server.shutdown()
+    stand_in.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""In-process caching for Pawprint."""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    The cache is bounded by the approximate size of its values (their JSON
+    encoding) rather than by entry count, so a handful of large search
+    pages cannot crowd out memory. Least recently used entries are evicted
+    first once max_bytes is exceeded.
+
+    With a stale_ttl, an entry is kept for that many extra seconds after
+    it stops being fresh. get() ignores such stale entries, but lookup()
+    returns them so callers can serve old data while refreshing it or
+    while the upstream service is down.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=300, stale_ttl=0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the fresh value stored under key, or default."""
+
+        value, fresh = self.lookup(key)
+        return value if fresh else default
+
+    def lookup(self, key):
+        """
+        Return (value, fresh) for key.
+
+        value is None if key is not cached at all; fresh is False if the
+        value is past its TTL but still inside the stale window.
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[3] <= now:
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            self._entries.move_to_end(key)
+            value, size, fresh_until, expires_at = entry
+
+            if fresh_until <= now:
+                self.stale_hits += 1
+                return value, False
+
+            self.hits += 1
+            return value, True
+
+    def pop(self, key, default=None):
+        """Remove key and return its fresh value, or default."""
+
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._remove(key)
+
+            if entry[2] <= now:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (defaults to the cache TTL)."""
+
+        size = len(json.dumps(value, default=str))
+
+        # a value bigger than the whole budget would only evict everything else
+        if size > self.max_bytes:
+            return
+
+        fresh_until = time.monotonic() + (self.ttl if ttl is None else ttl)
+        expires_at = fresh_until + self.stale_ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, fresh_until, expires_at)
+            self.bytes += size
+
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove key from the cache if present."""
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Remove every entry."""
+
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        """Drop key and its size from the budget. Caller holds the lock."""
+
+        value, size, fresh_until, expires_at = self._entries.pop(key)
+        self.bytes -= size
+
+    def __contains__(self, key):
+        """Is a fresh value stored under key? Does not count as a lookup."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[2] > time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size for monitoring."""
+
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+
+            return {
+                "entries" : len(self._entries),
+                "bytes" : self.bytes,
+                "max_bytes" : self.max_bytes,
+                "hits" : self.hits,
+                "stale_hits" : self.stale_hits,
+                "misses" : self.misses,
+                "evictions" : self.evictions,
+                "hit_rate" : round(self.hits / lookups, 3) if lookups else 0,
+            }
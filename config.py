@@ -0,0 +1,145 @@
+"""Configuration profiles for Pawprint, selected by PAWPRINT_ENV."""
+
+import os
+
+
+def database_url(variable, default):
+    """Return the URL in environment variable (or default), accepting the postgres:// scheme Heroku uses."""
+
+    url = os.environ.get(variable, default)
+
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+
+    return url
+
+
+class Config:
+    """Settings shared by every profile."""
+
+    SQLALCHEMY_DATABASE_URI = database_url('DATABASE_URL', 'postgresql:///pawprint')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = False
+    SECRET_KEY = os.environ.get('SECRET_KEY', "geram03_pawprint")
+    DEBUG_TB_ENABLED = False
+    PETFINDER_API_KEY = os.environ.get('PETFINDER_API_KEY') # when unset, read from secret.py
+    PETFINDER_SECRET = os.environ.get('PETFINDER_SECRET')
+    PETFINDER_BASE_URL = os.environ.get('PETFINDER_BASE_URL', "https://api.petfinder.com/v2")
+    PETFINDER_STAND_IN = None # PetfinderStandIn options; when set, each worker serves Petfinder from its own stand-in
+    PETFINDER_POOL_SIZE = 10
+    PETFINDER_CONNECT_TIMEOUT = 3.05
+    PETFINDER_READ_TIMEOUT = 10
+    PETFINDER_MAX_RETRIES = 2
+    SEARCH_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    SEARCH_CACHE_TTL = 300
+    SEARCH_CACHE_STALE_TTL = 3600
+    DETAIL_CACHE_MAX_BYTES = 8 * 1024 * 1024
+    DETAIL_CACHE_TTL = 600
+    DETAIL_CACHE_STALE_TTL = 24 * 3600
+    BREAKER_FAILURE_THRESHOLD = 5
+    BREAKER_SLOW_CALL_SECONDS = 5
+    BREAKER_RESET_TIMEOUT = 30
+    PETFINDER_RATE_LIMIT = 50
+    PETFINDER_RATE_LIMIT_BURST = 50
+    PETFINDER_DAILY_QUOTA = 1000
+    PETFINDER_BACKGROUND_RESERVE = 0.2
+    PETFINDER_RATE_LIMIT_MODE = "queue" # "queue", "cache" or "fail" when the budget is exhausted
+    PETFINDER_RATE_LIMIT_MAX_WAIT = 2
+    RECENT_PAYLOADS_MAX_BYTES = 4 * 1024 * 1024
+    RECENT_PAYLOADS_TTL = 600
+    SEARCH_PAGE_SIZE = 20 # None to show Petfinder's own pages
+    PETFINDER_PAGE_LIMIT = 100
+    PETFINDER_FAN_OUT_WORKERS = 4
+    PREFETCH_MAX_IN_FLIGHT = 4
+    PREFETCH_PER_USER = 1
+    PREFETCH_MAX_BYTES = 4 * 1024 * 1024
+    PREFETCH_TTL = 120
+    LOCAL_PET_SEARCH = False # answer /pets from stored pets when no location is given
+    STREAM_TEMPLATES = True
+    SESSION_BACKEND = "sql" # "sql" shares sessions between workers, "dict" is for a single worker
+    SESSION_CACHE_MAX_BYTES = 4 * 1024 * 1024
+    SESSION_CACHE_TTL = 30
+    SAVED_MARKERS_MAX_BYTES = 2 * 1024 * 1024
+    SAVED_MARKERS_TTL = 60 # how long another worker may show a bookmark or follow marker after it changes
+    BOOKMARKS_PER_PAGE = 20
+    FOLLOWS_PER_PAGE = 20
+    INGEST_REGIONS = [region for region in os.environ.get('INGEST_REGIONS', "").split(";") if region.strip()] # e.g. "10001;Austin, TX"
+    REFRESH_MAX_AGE = 24 * 3600 # stored pets and organizations older than this are re-fetched
+    REFRESH_BATCH_SIZE = 100
+    REFRESH_WORKERS = 4
+    BCRYPT_ROUNDS = 12 # raising it rehashes each password at its owner's next login
+    PASSWORD_HASH_WORKERS = 2 # 0 hashes on the request thread
+    PASSWORD_HASH_MAX_PENDING = 16
+    PASSWORD_HASH_QUEUE_TIMEOUT = 2
+
+
+class DevelopmentConfig(Config):
+    """Local development: log every SQL statement and show the debug toolbar."""
+
+    SQLALCHEMY_ECHO = True
+    DEBUG_TB_ENABLED = True
+    DEBUG_TB_INTERCEPT_REDIRECTS = False
+
+
+class TestConfig(Config):
+    """The test suite: its own database, no CSRF tokens, sessions in memory, dummy Petfinder credentials, cheap inline hashing."""
+
+    SQLALCHEMY_DATABASE_URI = database_url('TEST_DATABASE_URL', 'postgresql:///pawprint-test')
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SESSION_BACKEND = "dict"
+    PETFINDER_API_KEY = "TEST-KEY"
+    PETFINDER_SECRET = "TEST-SECRET"
+    BCRYPT_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
+
+
+class ProductionConfig(Config):
+    """
+    Multi-process deployment: no echo or toolbar, and a tuned engine pool.
+
+    Each worker process gets its own pool of DB_POOL_SIZE connections (plus
+    DB_MAX_OVERFLOW in bursts). Connections are checked before use and
+    recycled before the server or a proxy drops them, and runaway queries
+    are cancelled after DB_STATEMENT_TIMEOUT_MS.
+    """
+
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SESSION_COOKIE_SECURE = True
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size" : int(os.environ.get('DB_POOL_SIZE', 5)),
+        "max_overflow" : int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        "pool_timeout" : 10,
+        "pool_pre_ping" : True,
+        "pool_recycle" : 1800,
+        "connect_args" : {"options" : f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))}"},
+    }
+
+
+class OfflineConfig(DevelopmentConfig):
+    """
+    Development against a local Petfinder stand-in (see standin.py), so
+    the whole app can be run and load-tested without the live API or
+    credentials. Echo is off so it does not skew timings.
+    """
+
+    SQLALCHEMY_ECHO = False
+    DEBUG_TB_ENABLED = False
+    PETFINDER_API_KEY = "STAND-IN-KEY"
+    PETFINDER_SECRET = "STAND-IN-SECRET"
+    PETFINDER_STAND_IN = {
+        "animals" : int(os.environ.get('STAND_IN_ANIMALS', 1000)),
+        "organizations" : int(os.environ.get('STAND_IN_ORGANIZATIONS', 100)),
+        "latency" : float(os.environ.get('STAND_IN_LATENCY', 0)),
+        "error_rate" : float(os.environ.get('STAND_IN_ERROR_RATE', 0)),
+        "rate_limited_rate" : float(os.environ.get('STAND_IN_RATE_LIMITED_RATE', 0)),
+        "unauthorized_rate" : float(os.environ.get('STAND_IN_UNAUTHORIZED_RATE', 0)),
+    }
+
+
+config_by_name = {
+    "development" : DevelopmentConfig,
+    "test" : TestConfig,
+    "production" : ProductionConfig,
+    "offline" : OfflineConfig,
+}
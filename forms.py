@@ -32,7 +32,15 @@ class EditUserForm(FlaskForm):
     location = StringField('(Optional) Location', validators=[Optional()])
     profile_picture_url = URLField('(Optional) Profile Picture URL', validators=[Optional()])
 
-class PetSearchForm(FlaskForm):
+class SearchForm(FlaskForm):
+    """Base form for Petfinder search filters."""
+
+    def search_data(self):
+        """Return the entered filters, keyed by field name, without the CSRF token."""
+
+        return { field.name : field.data for field in self if field.name != "csrf_token" }
+
+class PetSearchForm(SearchForm):
     """Form for searching for pets."""
 
     type = StringField('Type (e.g. "dog" or "cat")')
@@ -45,7 +53,7 @@ class PetSearchForm(FlaskForm):
     name = StringField('Name (e.g. "Fred" or "Spark")')
     location = StringField('Location ("[City], [State]"; or "[PostalCode]")')
 
-class OrganizationSearchForm(FlaskForm):
+class OrganizationSearchForm(SearchForm):
     """Form for searching for animal welfare organizations."""
 
     name = StringField('Name (e.g. "Sanctuary" or "Rescue")')
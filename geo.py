@@ -0,0 +1,97 @@
+"""Postcode centroids and distances, without any geocoding service."""
+
+import csv
+import functools
+import math
+import os
+
+# postcode,city,state,country,latitude,longitude for every US ZIP code, adapted from the
+# CivicSpace US ZIP Code Database by CivicSpace Labs. It is CC BY-SA 2.0, not public
+# domain; see data/LICENSE for the attribution that must travel with it. Any file with
+# the same columns can replace it, e.g. one built from the public domain Census ZCTA
+# Gazetteer. Reading it takes a few tenths of a second, so create_app() loads it up front.
+CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "postcode_centroids.csv")
+
+EARTH_RADIUS_MILES = 3958.8
+
+MILES_PER_DEGREE_LATITUDE = 69.0
+
+
+@functools.lru_cache(maxsize=None)
+def load_centroids(path=CENTROIDS_PATH):
+    """
+    Read the centroid file once. Returns ({postcode: (latitude, longitude)},
+    {"city, state": (latitude, longitude)}), the latter the mean of each
+    city's postcode centroids.
+    """
+
+    postcodes = {}
+    city_points = {}
+
+    with open(path, newline="", encoding="UTF-8") as file:
+        for row in csv.DictReader(file):
+            point = (float(row["latitude"]), float(row["longitude"]))
+            postcodes[row["postcode"].upper()] = point
+            city_points.setdefault(f"{row['city']}, {row['state']}".lower(), []).append(point)
+
+    cities = {city : (sum(point[0] for point in points) / len(points), sum(point[1] for point in points) / len(points))
+              for city, points in city_points.items()}
+
+    return postcodes, cities
+
+
+def normalize_postcode(postcode):
+    """Uppercase and strip postcode, dropping a US ZIP+4 suffix."""
+
+    postcode = (postcode or "").strip().upper()
+
+    if len(postcode) == 10 and postcode[5] == "-" and postcode[:5].isdigit():
+        return postcode[:5]
+
+    return postcode
+
+
+def centroid(postcode):
+    """Return (latitude, longitude) of postcode's centroid, or None if it is not listed."""
+
+    return load_centroids()[0].get(normalize_postcode(postcode))
+
+
+def locate(location):
+    """
+    Return (latitude, longitude) for a free-text location, as users and
+    Petfinder write them: a postcode or "City, State". None if unknown.
+    """
+
+    if not location:
+        return None
+
+    postcodes, cities = load_centroids()
+    city = ", ".join(part.strip() for part in location.split(",")).lower()
+
+    return postcodes.get(normalize_postcode(location)) or cities.get(city)
+
+
+def bounding_box(latitude, longitude, miles):
+    """
+    Return (min latitude, max latitude, min longitude, max longitude) of a
+    box holding every point within miles of (latitude, longitude), for an
+    index range scan before the exact distance check.
+    """
+
+    latitude_delta = miles / MILES_PER_DEGREE_LATITUDE
+    # a degree of longitude shrinks towards the poles
+    longitude_delta = min(miles / (MILES_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 0.01)), 180)
+
+    return latitude - latitude_delta, latitude + latitude_delta, longitude - longitude_delta, longitude + longitude_delta
+
+
+def distance_miles(latitude, longitude, other_latitude, other_longitude):
+    """Great-circle (haversine) distance in miles between two points."""
+
+    latitude, longitude, other_latitude, other_longitude = map(math.radians, (latitude, longitude, other_latitude, other_longitude))
+
+    a = (math.sin((other_latitude - latitude) / 2) ** 2
+         + math.cos(latitude) * math.cos(other_latitude) * math.sin((other_longitude - longitude) / 2) ** 2)
+
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
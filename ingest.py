@@ -0,0 +1,130 @@
+"""Mirroring Petfinder's animal and organization listings into the Pawprint DB."""
+
+import logging
+import time
+
+from models import db, Organization, Pet, IngestCheckpoint, ApiUsage
+from petfinder import PetfinderError, MAX_PAGE_LIMIT
+from ratelimit import INTERACTIVE, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("organizations", "animals")
+
+
+def stream_name(kind, region):
+    """The checkpoint key for one listing of kind in region."""
+
+    return f"{kind}:{region.strip().lower()}"
+
+
+def iter_pages(petfinder, kind, params, start_page=1):
+    """
+    Yield (page, total_pages, items) for each page of Petfinder's kind
+    listing matching params, from start_page to the last page.
+
+    Pages are fetched one at a time as the consumer asks for them, so only
+    one page is ever held in memory.
+    """
+
+    page = start_page
+
+    while True:
+        json = petfinder.get(f"/{kind}", dict(params, page=page, limit=MAX_PAGE_LIMIT))
+        items = json.get(kind) or []
+        total_pages = (json.get("pagination") or {}).get("total_pages") or 0
+
+        if not items:
+            return
+
+        yield page, total_pages, items
+
+        if page >= total_pages:
+            return
+
+        page += 1
+
+
+def store_organizations(petfinder, organizations):
+    """Upsert one page of organizations. Returns how many rows were written."""
+
+    return Organization.upsert_many(organizations)
+
+
+def store_animals(petfinder, animals):
+    """
+    Upsert one page of animals, first fetching and storing any of their
+    organizations that are not stored yet. Animals whose organization
+    Petfinder no longer has are skipped. Returns how many rows were written.
+    """
+
+    unavailable = set()
+
+    for organization_id in sorted(Organization.missing_ids(animal["organization_id"] for animal in animals if animal.get("organization_id"))):
+        try:
+            Organization.upsert_many([petfinder.get_organization(organization_id)])
+        except PetfinderError as exc:
+            if exc.status_code != 404:
+                raise
+            unavailable.add(organization_id)
+
+    return Pet.upsert_many(animal for animal in animals if animal.get("organization_id") not in unavailable)
+
+
+def ingest(petfinder, kind, region, restart=False):
+    """
+    Mirror Petfinder's kind ("animals" or "organizations") listing for
+    region (a postcode, "City, State" or state) into the Pawprint DB.
+
+    Each page is upserted and checkpointed in one transaction, so an
+    interrupted run resumes after the last stored page. A finished run
+    clears its checkpoint, so the next one refreshes from page 1. Calls
+    are made at background priority, leaving the rate limit's reserve to
+    page views. The run starts from the day's shared Petfinder usage and
+    records its own requests after every page, so it stays inside the
+    daily quota the web workers share.
+
+    Returns a dict of pages and rows stored, seconds taken and rows/second.
+    """
+
+    stream = stream_name(kind, region)
+    store = store_animals if kind == "animals" else store_organizations
+
+    if restart:
+        IngestCheckpoint.clear(stream)
+        db.session.commit()
+
+    start_page = IngestCheckpoint.last_page(stream) + 1
+    pages = rows = 0
+    start = time.perf_counter()
+
+    ApiUsage.flush(petfinder.rate_limiter, force=True)
+    petfinder.set_priority(BACKGROUND)
+
+    try:
+        for page, total_pages, items in iter_pages(petfinder, kind, {"location" : region}, start_page):
+            rows += store(petfinder, items)
+            IngestCheckpoint.record(stream, page, total_pages)
+            db.session.commit()
+            ApiUsage.flush(petfinder.rate_limiter, force=True)
+
+            pages += 1
+            logger.info("Stored %s page %s of %s", stream, page, total_pages)
+    finally:
+        petfinder.set_priority(INTERACTIVE)
+        # the requests for a page that failed part way were still made
+        ApiUsage.flush(petfinder.rate_limiter, force=True)
+
+    IngestCheckpoint.clear(stream)
+    db.session.commit()
+
+    seconds = time.perf_counter() - start
+
+    return {
+        "stream" : stream,
+        "start_page" : start_page,
+        "pages" : pages,
+        "rows" : rows,
+        "seconds" : round(seconds, 3),
+        "rows_per_second" : round(rows / seconds, 1) if seconds else 0,
+    }
@@ -0,0 +1,63 @@
+"""Which search results the logged in user has already bookmarked or followed."""
+
+import threading
+
+
+class SavedMarkers:
+    """
+    Per-user answers to "did this user save that id?" for search result
+    pages, kept in a TTLCache under (kind, user_id).
+
+    Each entry maps every id asked about so far to whether it was saved,
+    so a page costs at most one query (for the ids not seen before) and a
+    revisited page none. Views that add or remove a bookmark or follow
+    call forget(), so this worker never shows a stale marker; other
+    workers' entries expire after the cache TTL.
+    """
+
+    def __init__(self, cache, lookups):
+        """lookups maps each kind to a function (user_id, ids) -> set of saved ids."""
+
+        self.cache = cache
+        self.lookups = lookups
+
+        # bumped by forget(), so an answer looked up before it is not cached after it
+        self._lock = threading.Lock()
+        self._generations = {}
+
+    def saved(self, kind, user_id, ids):
+        """Return the subset of ids the user has saved as kind."""
+
+        key = (kind, user_id)
+        ids = list(dict.fromkeys(ids))
+
+        with self._lock:
+            generation = self._generations.get(key, 0)
+            known = self.cache.get(key) or {}
+
+        unknown = [id for id in ids if id not in known]
+
+        if unknown:
+            found = self.lookups[kind](user_id, unknown)
+            # a new dict, so the cache measures the entry again
+            known = {**known, **{id : id in found for id in unknown}}
+
+            with self._lock:
+                if self._generations.get(key, 0) == generation:
+                    self.cache.set(key, known)
+
+        return {id for id in ids if known.get(id)}
+
+    def forget(self, user_id, *kinds):
+        """Drop the user's cached answers for kinds (all kinds by default)."""
+
+        with self._lock:
+            for kind in kinds or self.lookups:
+                key = (kind, user_id)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self.cache.delete(key)
+
+    def stats(self):
+        """Return the cache's counters for monitoring."""
+
+        return self.cache.stats()
@@ -1,14 +1,109 @@
 """SQLAlchemy models for Pawprint."""
 
-from flask_bcrypt import Bcrypt
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
-from secret import MY_API_KEY, MY_SECRET
+from sqlalchemy import tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert, TSVECTOR
+
+from geo import locate, bounding_box, EARTH_RADIUS_MILES
+from passwords import current_hasher
 
-bcrypt = Bcrypt()
 db = SQLAlchemy()
 
-hashed_api_key = bcrypt.generate_password_hash(MY_API_KEY).decode('UTF-8')
-hashed_secret = bcrypt.generate_password_hash(MY_SECRET).decode('UTF-8')
+# one page of a keyset-paginated listing; cursors are None when there is no such page
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'previous_cursor'])
+
+
+def encode_cursor(created_at, id):
+    """Encode a row's sort key as an opaque, URL-safe cursor."""
+
+    raw = json.dumps([created_at.isoformat(), id]).encode('UTF-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor, id_type):
+    """
+    Decode a cursor from encode_cursor whose id must be an id_type.
+    Raises ValueError if it is malformed or was tampered with.
+    """
+
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+
+    # cursors come from the query string, so they go into SQL only once their types check out
+    if type(id) is not id_type:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+    return created_at, id
+
+
+def keyset_page(query, created_at_column, id_column, after=None, before=None, per_page=20):
+    """
+    Return one KeysetPage of query, newest first, ordered by
+    (created_at_column, id_column).
+
+    query must select the listed entity first, then the two sort columns.
+    after/before are cursors from a previous page; the cost of a page
+    depends only on per_page, never on how many rows come before it. A
+    malformed or tampered cursor raises ValueError.
+    """
+
+    sort_key = tuple_(created_at_column, id_column)
+    id_type = id_column.type.python_type
+
+    if after:
+        query = query.filter(sort_key < decode_cursor(after, id_type)).order_by(created_at_column.desc(), id_column.desc())
+    elif before:
+        query = query.filter(sort_key > decode_cursor(before, id_type)).order_by(created_at_column.asc(), id_column.asc())
+    else:
+        query = query.order_by(created_at_column.desc(), id_column.desc())
+
+    # one extra row tells us whether another page exists in that direction
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([], None, None)
+
+    next_cursor = encode_cursor(*rows[-1][1:]) if (has_more or before) else None
+    previous_cursor = encode_cursor(*rows[0][1:]) if (after or (before and has_more)) else None
+
+    return KeysetPage([row[0] for row in rows], next_cursor, previous_cursor)
+
+
+def upsert_rows(model, rows):
+    """
+    Insert rows (column dicts) into model's table in a single statement,
+    updating every column of rows whose id is already stored, and mark
+    them synced now. Returns how many rows were written.
+    """
+
+    # one statement may not touch the same row twice
+    rows = list({row["id"] : row for row in rows}.values())
+
+    if not rows:
+        return 0
+
+    statement = insert(model).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[model.id],
+        set_=dict({name : statement.excluded[name] for name in rows[0] if name != "id"}, synced_at=db.func.now()),
+    )
+
+    db.session.execute(statement)
+    return len(rows)
 
 class User(db.Model):
     """Pawprint user."""
@@ -56,7 +151,7 @@ class User(db.Model):
         Hashes password to securely add user to Pawprint DB.
         """
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('UTF-8')
+        hashed_password = current_hasher().hash(password)
 
         user = User(
             email=email,
@@ -80,17 +175,67 @@ class User(db.Model):
         Returns the matching User object if successful.
         
         If no such user can be found, or the password is incorrect, returns False.
+
+        A password hashed at an older cost is rehashed at the current one;
+        the caller commits the change.
         """
 
+        hasher = current_hasher()
         user = cls.query.filter_by(username=username).one_or_none()
 
-        if user:
-            is_authenticated = bcrypt.check_password_hash(user.password, password)
+        if not user:
+            # as slow as a wrong password, so usernames cannot be probed by timing
+            return hasher.check_unknown(password)
 
-            if is_authenticated:
-                return user
-            
-        return False
+        if not hasher.check(user.password, password):
+            return False
+
+        if hasher.needs_rehash(user.password):
+            user.password = hasher.hash(password)
+
+        return user
+
+
+class CurrentUser:
+    """
+    The logged in user, as far as the session knows them.
+
+    id (and first_name, if the session has it) cost no query, so the nav
+    and most views never touch the users table. Any other attribute loads
+    the User row on first access; views that edit the user should work
+    on load() directly.
+
+    Until the row is loaded it is assumed to exist. Once load() finds it
+    deleted, the CurrentUser is falsy, so views that write rows for the
+    user should check load() first.
+    """
+
+    def __init__(self, id, first_name=None):
+        self.id = id
+        self._user = None
+        self._loaded = False
+
+        if first_name is not None:
+            self.first_name = first_name
+
+    def load(self):
+        """Return the User row, querying for it the first time. None if it no longer exists."""
+
+        if not self._loaded:
+            self._user = User.query.get(self.id)
+            self._loaded = True
+
+        return self._user
+
+    def __bool__(self):
+        return not self._loaded or self._user is not None
+
+    def __getattr__(self, name):
+        # only reached for attributes not set in __init__
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return getattr(self.load(), name)
 
 
 class Organization(db.Model):
@@ -128,9 +273,25 @@ class Organization(db.Model):
     
     image_url = db.Column(db.String)
 
+    # the postcode's centroid (see geo.py); None when the postcode is not listed
+    latitude = db.Column(db.Float)
+
+    longitude = db.Column(db.Float)
+
+    # when these columns were last copied from Petfinder
+    synced_at = db.Column(db.DateTime,
+                          nullable=False,
+                          server_default=db.func.now(),
+                          index=True)
+
     pets = db.relationship('Pet',
                            backref='organization')
 
+    __table_args__ = (
+        # distance searches range-scan a bounding box before checking exact distances
+        db.Index('ix_organizations_latitude_longitude', 'latitude', 'longitude'),
+    )
+
     # add methods to help create organization?
     @classmethod
     def create(cls, petfinder_organization):
@@ -139,7 +300,22 @@ class Organization(db.Model):
         a given Petfinder API organization object.
         """
 
-        organization = Organization(
+        organization = Organization(**cls.columns_from_petfinder(petfinder_organization))
+
+        db.session.add(organization)
+        return organization
+
+    @classmethod
+    def columns_from_petfinder(cls, petfinder_organization):
+        """
+        Maps a given Petfinder API organization object to
+        Pawprint DB organization column values.
+        """
+
+        location = petfinder_organization.get("address") or {}
+        point = locate(location.get("postcode")) or locate(f"{location.get('city')}, {location.get('state')}")
+
+        return dict(
             id = petfinder_organization.get("id"),
             name = petfinder_organization.get("name"),
             email = petfinder_organization.get("email"),
@@ -150,11 +326,80 @@ class Organization(db.Model):
             postcode = petfinder_organization.get("address").get("postcode"), #CARE
             country = petfinder_organization.get("address").get("country"), #CARE
             url = petfinder_organization.get("url"),
-            image_url = petfinder_organization.get("photos")[0].get("full") if petfinder_organization.get("photos") else "" #CARE
+            image_url = petfinder_organization.get("photos")[0].get("full") if petfinder_organization.get("photos") else "", #CARE
+            latitude = point[0] if point else None,
+            longitude = point[1] if point else None,
         )
 
-        db.session.add(organization)
-        return organization
+    @classmethod
+    def upsert_many(cls, petfinder_organizations):
+        """
+        Insert or update organizations from Petfinder API organization
+        objects in one multi-row statement, in the caller's transaction.
+        Returns how many rows were written.
+        """
+
+        return upsert_rows(cls, [cls.columns_from_petfinder(organization) for organization in petfinder_organizations])
+
+    @classmethod
+    def missing_ids(cls, ids):
+        """Return which of the given organization ids are not in the Pawprint DB yet."""
+
+        ids = set(ids)
+
+        if not ids:
+            return set()
+
+        return ids - set(db.session.execute(db.select(cls.id).where(cls.id.in_(ids))).scalars())
+
+    @classmethod
+    def fill_coordinates(cls):
+        """
+        Set latitude and longitude on stored organizations without them, from
+        their stored postcode or city and state. Returns how many were set.
+        """
+
+        located = 0
+
+        for organization in cls.query.filter(cls.latitude.is_(None)):
+            point = locate(organization.postcode) or locate(f"{organization.city}, {organization.state}")
+            if point:
+                organization.latitude, organization.longitude = point
+                located += 1
+
+        return located
+
+    @classmethod
+    def distance_from(cls, latitude, longitude):
+        """SQL expression for the haversine distance in miles from (latitude, longitude)."""
+
+        a = (db.func.power(db.func.sin(db.func.radians(cls.latitude - latitude) / 2), 2)
+             + db.func.cos(db.func.radians(latitude)) * db.func.cos(db.func.radians(cls.latitude))
+             * db.func.power(db.func.sin(db.func.radians(cls.longitude - longitude) / 2), 2))
+
+        return 2 * EARTH_RADIUS_MILES * db.func.asin(db.func.sqrt(a))
+
+    @classmethod
+    def within(cls, latitude, longitude, miles, limit=None):
+        """
+        Return [(organization, miles away)] for stored organizations within
+        miles of (latitude, longitude), nearest first.
+
+        The bounding box narrows the search to a range of the
+        latitude/longitude index, so only nearby rows get the exact check.
+        """
+
+        min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(latitude, longitude, miles)
+        distance = cls.distance_from(latitude, longitude)
+
+        query = (db.select(cls, distance)
+                 .where(cls.latitude.between(min_latitude, max_latitude),
+                        cls.longitude.between(min_longitude, max_longitude),
+                        distance <= miles)
+                 .order_by(distance, cls.id)
+                 .limit(limit))
+
+        return db.session.execute(query).all()
 
 
 class Pet(db.Model):
@@ -198,6 +443,33 @@ class Pet(db.Model):
 
     organization_id = db.Column(db.String,
                                 db.ForeignKey('organizations.id', ondelete="cascade"))
+
+    # when these columns were last copied from Petfinder
+    synced_at = db.Column(db.DateTime,
+                          nullable=False,
+                          server_default=db.func.now(),
+                          index=True)
+
+    # words from the text columns, kept up to date by Postgres for full-text search; each
+    # search filter's column has its own weight, so a filter can match that column alone
+    search_vector = db.deferred(db.Column(TSVECTOR, db.Computed(
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(breed, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(color, '')), 'C') || "
+        "setweight(to_tsvector('english', coalesce(species, '') || ' ' || coalesce(description, '')), 'D')",
+        persisted=True,
+    )))
+
+    __table_args__ = (
+        db.Index('ix_pets_search_vector', 'search_vector', postgresql_using='gin'),
+        # search facets, matched ignoring case; every search filters on status, and the
+        # included columns let facet counts come from an index-only scan
+        db.Index('ix_pets_facets', db.text('lower(status)'), db.text('lower(type)'),
+                 postgresql_include=['type', 'size', 'gender', 'age', 'status']),
+        db.Index('ix_pets_size', db.text('lower(size)')),
+        db.Index('ix_pets_gender', db.text('lower(gender)')),
+        db.Index('ix_pets_age', db.text('lower(age)')),
+    )
     
     @classmethod
     def create(cls, petfinder_animal):
@@ -206,10 +478,22 @@ class Pet(db.Model):
         given Petfinder API Animal object.
         """
 
+        pet = Pet(**cls.columns_from_petfinder(petfinder_animal))
+
+        db.session.add(pet)
+        return pet
+
+    @classmethod
+    def columns_from_petfinder(cls, petfinder_animal):
+        """
+        Maps a given Petfinder API Animal object to
+        Pawprint DB Pet column values.
+        """
+
         color = petfinder_animal.get("colors").get("primary") if petfinder_animal.get("colors").get("primary") else "No Color Listed"
         image_url = petfinder_animal.get("photos")[0].get("full") if petfinder_animal.get("photos") else None
 
-        pet = Pet(
+        return dict(
             id = petfinder_animal.get("id"),
             name = petfinder_animal.get("name"),
             type = petfinder_animal.get("type"),
@@ -225,8 +509,16 @@ class Pet(db.Model):
             organization_id = petfinder_animal.get("organization_id"),
         )
 
-        db.session.add(pet)
-        return pet
+    @classmethod
+    def upsert_many(cls, petfinder_animals):
+        """
+        Insert or update pets from Petfinder API animal objects in one
+        multi-row statement, in the caller's transaction. Their
+        organizations must already be stored. Returns how many rows were
+        written.
+        """
+
+        return upsert_rows(cls, [cls.columns_from_petfinder(animal) for animal in petfinder_animals])
     
     # organization = db.relationship('Organization')
 
@@ -246,6 +538,77 @@ class Bookmark(db.Model):
     pet_id = db.Column(db.Integer,
                        db.ForeignKey('pets.id', ondelete='cascade'),
                        primary_key=True)
+
+    created_at = db.Column(db.DateTime,
+                           nullable=False,
+                           server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_bookmarks_user_created', 'user_id', 'created_at', 'pet_id'),
+    )
+
+    @classmethod
+    def page_for_user(cls, user_id, after=None, before=None, per_page=20):
+        """
+        Return a KeysetPage of the pets bookmarked by the given user, most
+        recently bookmarked first, with each pet's organization loaded in
+        the same query.
+        """
+
+        query = (db.session.query(Pet, cls.created_at, cls.pet_id)
+                 .join(cls, cls.pet_id == Pet.id)
+                 .filter(cls.user_id == user_id)
+                 .options(db.joinedload(Pet.organization)))
+
+        return keyset_page(query, cls.created_at, cls.pet_id, after, before, per_page)
+
+    @classmethod
+    def saved_among(cls, user_id, pet_ids):
+        """Return the set of pet_ids the given user has bookmarked, in one primary key lookup."""
+
+        return set(db.session.execute(db.select(cls.pet_id)
+                                      .where(cls.user_id == user_id, cls.pet_id.in_(pet_ids))).scalars())
+
+    @classmethod
+    def stored_names(cls, pet_id, organization_id):
+        """
+        Return (pet name, organization name) in a single query, with None
+        for whichever of the two is not yet in the Pawprint DB.
+        """
+
+        return db.session.execute(db.select(
+            db.select(Pet.name).where(Pet.id == pet_id).scalar_subquery(),
+            db.select(Organization.name).where(Organization.id == organization_id).scalar_subquery(),
+        )).one()
+
+    @classmethod
+    def save_for_user(cls, user_id, pet_id, organization_id, petfinder_animal=None, petfinder_organization=None):
+        """
+        Bookmark a pet and follow its organization for the given user.
+
+        The organization and pet are inserted from their Petfinder objects
+        when given. Every insert uses ON CONFLICT DO NOTHING, so nothing has
+        to be looked up first and concurrent bookmarks cannot collide. All
+        statements run in the caller's transaction; the caller commits.
+        """
+
+        if petfinder_organization:
+            db.session.execute(insert(Organization)
+                               .values(**Organization.columns_from_petfinder(petfinder_organization))
+                               .on_conflict_do_nothing())
+
+        if petfinder_animal:
+            db.session.execute(insert(Pet)
+                               .values(**Pet.columns_from_petfinder(petfinder_animal))
+                               .on_conflict_do_nothing())
+
+        db.session.execute(insert(cls)
+                           .values(user_id=user_id, pet_id=pet_id)
+                           .on_conflict_do_nothing())
+
+        db.session.execute(insert(Follow)
+                           .values(user_id=user_id, organization_id=organization_id)
+                           .on_conflict_do_nothing())
     
 class Follow(db.Model):
     """Pawprint user 'following' an animal welfare organization."""
@@ -259,8 +622,240 @@ class Follow(db.Model):
     organization_id = db.Column(db.String,
                        db.ForeignKey('organizations.id', ondelete='cascade'),
                        primary_key=True)
+
+    created_at = db.Column(db.DateTime,
+                           nullable=False,
+                           server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_follows_user_created', 'user_id', 'created_at', 'organization_id'),
+    )
+
+    @classmethod
+    def page_for_user(cls, user_id, after=None, before=None, per_page=20):
+        """
+        Return a KeysetPage of the organizations followed by the given
+        user, most recently followed first.
+        """
+
+        query = (db.session.query(Organization, cls.created_at, cls.organization_id)
+                 .join(cls, cls.organization_id == Organization.id)
+                 .filter(cls.user_id == user_id))
+
+        return keyset_page(query, cls.created_at, cls.organization_id, after, before, per_page)
+
+    @classmethod
+    def saved_among(cls, user_id, organization_ids):
+        """Return the set of organization_ids the given user follows, in one primary key lookup."""
+
+        return set(db.session.execute(db.select(cls.organization_id)
+                                      .where(cls.user_id == user_id, cls.organization_id.in_(organization_ids))).scalars())
+
+    @classmethod
+    def page_by_distance(cls, user_id, latitude, longitude, page=1, per_page=20):
+        """
+        Return [(organization, miles away)] for one page of the organizations
+        followed by the given user, nearest to (latitude, longitude) first.
+        Organizations without coordinates come last, with a distance of None.
+        """
+
+        distance = Organization.distance_from(latitude, longitude)
+
+        query = (db.select(Organization, distance)
+                 .join(cls, cls.organization_id == Organization.id)
+                 .where(cls.user_id == user_id)
+                 .order_by(distance.asc().nulls_last(), Organization.id)
+                 .offset((page - 1) * per_page)
+                 .limit(per_page))
+
+        return db.session.execute(query).all()
     
 
+class ApiUsage(db.Model):
+    """Number of Petfinder API calls Pawprint made on a given (UTC) day."""
+
+    __tablename__ = 'api_usage'
+
+    day = db.Column(db.Date,
+                    primary_key=True)
+
+    calls = db.Column(db.Integer,
+                      nullable=False,
+                      default=0)
+
+    @classmethod
+    def record(cls, day, calls):
+        """
+        Atomically add calls to the count for day and return the new total,
+        which includes calls recorded by every other worker.
+        """
+
+        return db.session.execute(cls._add_calls(day, calls)).scalar_one()
+
+    @classmethod
+    def _add_calls(cls, day, calls):
+        """The upsert adding calls to day's count, returning the new total."""
+
+        statement = insert(cls).values(day=day, calls=calls)
+
+        return statement.on_conflict_do_update(
+            index_elements=[cls.day],
+            set_={"calls" : cls.calls + statement.excluded.calls},
+        ).returning(cls.calls)
+
+    @classmethod
+    def flush(cls, rate_limiter, force=False):
+        """
+        Add rate_limiter's unpersisted Petfinder requests to the day's count,
+        then hand the limiter the shared total, so it counts every worker's
+        and command's requests against the daily quota. Unless force is
+        True, does nothing until the limiter's flush interval has passed.
+        If the database fails, the requests are kept for the next flush.
+
+        Runs on its own connection and transaction, so it never commits
+        (or rolls back) whatever a view left pending in db.session.
+        """
+
+        unflushed = rate_limiter.take_unflushed(force=force) if rate_limiter is not None else None
+
+        if not unflushed:
+            return
+
+        day, calls = unflushed
+
+        try:
+            with db.engine.begin() as connection:
+                total = connection.execute(cls._add_calls(day, calls)).scalar_one()
+        except SQLAlchemyError:
+            rate_limiter.restore(day, calls)
+            return
+
+        rate_limiter.sync(day, total)
+
+
+
+class StoredSession(db.Model):
+    """Server-side session data, keyed by the id in the session cookie."""
+
+    __tablename__ = 'sessions'
+
+    id = db.Column(db.String(64),
+                   primary_key=True)
+
+    data = db.Column(db.Text,
+                     nullable=False)
+
+    expires_at = db.Column(db.DateTime(timezone=True),
+                           nullable=False,
+                           index=True)
+
+    # bumped on every save, so workers can tell whether their copy is current
+    version = db.Column(db.Integer,
+                        nullable=False,
+                        default=1,
+                        server_default="1")
+
+    # these run on their own connection so they never commit a view's pending changes
+
+    @classmethod
+    def load(cls, id):
+        """Return (serialized data, version) of unexpired session id, or None."""
+
+        statement = db.select(cls.data, cls.version).where(cls.id == id, cls.expires_at > db.func.now())
+
+        with db.engine.connect() as connection:
+            row = connection.execute(statement).one_or_none()
+            return None if row is None else tuple(row)
+
+    @classmethod
+    def version_of(cls, id):
+        """Return the version of unexpired session id, or None."""
+
+        statement = db.select(cls.version).where(cls.id == id, cls.expires_at > db.func.now())
+
+        with db.engine.connect() as connection:
+            return connection.execute(statement).scalar_one_or_none()
+
+    @classmethod
+    def save(cls, id, data, expires_at, version=None):
+        """
+        Insert or replace session id and return its new version. With a
+        version, only replace it if it is unexpired and still at that
+        version; return None if it changed or is gone.
+        """
+
+        if version is None:
+            statement = insert(cls).values(id=id, data=data, expires_at=expires_at)
+            statement = statement.on_conflict_do_update(
+                index_elements=[cls.id],
+                set_={"data" : statement.excluded.data, "expires_at" : statement.excluded.expires_at, "version" : cls.version + 1},
+            )
+        else:
+            statement = (db.update(cls)
+                         .where(cls.id == id, cls.version == version, cls.expires_at > db.func.now())
+                         .values(data=data, expires_at=expires_at, version=cls.version + 1))
+
+        with db.engine.begin() as connection:
+            return connection.execute(statement.returning(cls.version)).scalar_one_or_none()
+
+    @classmethod
+    def remove(cls, id):
+        """Delete session id if present."""
+
+        with db.engine.begin() as connection:
+            connection.execute(db.delete(cls).where(cls.id == id))
+
+    @classmethod
+    def purge_expired(cls):
+        """Delete every expired session. Returns how many were removed."""
+
+        with db.engine.begin() as connection:
+            return connection.execute(db.delete(cls).where(cls.expires_at <= db.func.now())).rowcount
+
+
+class IngestCheckpoint(db.Model):
+    """The last page of a Petfinder listing that ingestion finished storing."""
+
+    __tablename__ = 'ingest_checkpoints'
+
+    stream = db.Column(db.String,
+                       primary_key=True)
+
+    page = db.Column(db.Integer,
+                     nullable=False)
+
+    total_pages = db.Column(db.Integer)
+
+    updated_at = db.Column(db.DateTime,
+                           nullable=False,
+                           server_default=db.func.now(),
+                           onupdate=db.func.now())
+
+    @classmethod
+    def last_page(cls, stream):
+        """Return the last page stored for stream, or 0 if it has not started."""
+
+        return db.session.execute(db.select(cls.page).where(cls.stream == stream)).scalar_one_or_none() or 0
+
+    @classmethod
+    def record(cls, stream, page, total_pages):
+        """Mark page of stream as stored, in the caller's transaction (with the page's rows)."""
+
+        statement = insert(cls).values(stream=stream, page=page, total_pages=total_pages)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.stream],
+            set_={"page" : statement.excluded.page, "total_pages" : statement.excluded.total_pages, "updated_at" : db.func.now()},
+        )
+
+        db.session.execute(statement)
+
+    @classmethod
+    def clear(cls, stream):
+        """Forget stream's progress, so its next run starts from page 1."""
+
+        db.session.execute(db.delete(cls).where(cls.stream == stream))
+
+
 def connect_db(app):
     """Connect database to Flask app."""
 
@@ -0,0 +1,145 @@
+"""Password hashing for Pawprint, kept off the request threads."""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from flask import current_app
+
+
+def hash_password(password, rounds):
+    """Return a bcrypt hash of password at cost rounds. Runs in a pool process."""
+
+    return bcrypt.hashpw(password.encode('UTF-8'), bcrypt.gensalt(rounds)).decode('UTF-8')
+
+
+def check_password(hashed, password):
+    """Does password match bcrypt hash hashed? Runs in a pool process."""
+
+    try:
+        return bcrypt.checkpw(password.encode('UTF-8'), hashed.encode('UTF-8'))
+    except ValueError:
+        # not a bcrypt hash at all
+        return False
+
+
+def hash_rounds(hashed):
+    """Return the cost a bcrypt hash was made with, or None if it is not one."""
+
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashing requests are already waiting; the caller should shed load."""
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and checking on a bounded pool of worker processes.
+
+    bcrypt is deliberately CPU-heavy, so running it on request threads lets
+    a burst of logins starve every other page view. Here at most
+    max_pending requests may be queued or running; a caller that cannot get
+    a slot within queue_timeout seconds gets PasswordHasherBusy instead of
+    piling on. With workers=0 hashing runs inline (for tests).
+
+    New hashes use cost rounds. needs_rehash() tells callers when a stored
+    hash was made at another cost, so it can be replaced on the next
+    successful login. check_unknown() spends the same effort as a real
+    check, so an unknown username cannot be told apart by timing.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=16, queue_timeout=2):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._dummy_hash = None
+
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def _executor(self):
+        """Start the process pool on first use, so importing or forking does not."""
+
+        with self._pool_lock:
+            if self._pool is None:
+                # spawned workers do not inherit the web server's threads and locks
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+            return self._pool
+
+    def _run(self, function, *args):
+        """Run function(*args) in the pool, waiting for a queue slot first."""
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self.rejected += 1
+            raise PasswordHasherBusy("Too many password checks in progress")
+
+        try:
+            if not self.workers:
+                return function(*args)
+
+            return self._executor().submit(function, *args).result()
+        finally:
+            self._slots.release()
+            with self._stats_lock:
+                self.completed += 1
+
+    def hash(self, password):
+        """Return a bcrypt hash of password at the configured cost."""
+
+        return self._run(hash_password, password, self.rounds)
+
+    def check(self, hashed, password):
+        """Does password match hashed?"""
+
+        return self._run(check_password, hashed, password)
+
+    def check_unknown(self, password):
+        """Spend as long as check() would, for a user that does not exist. Always False."""
+
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash("pawprint-dummy-password")
+
+        self.check(self._dummy_hash, password)
+        return False
+
+    def needs_rehash(self, hashed):
+        """Was hashed made at a different cost than the configured one?"""
+
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        """Stop the worker processes, if any were started."""
+
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def stats(self):
+        """Return pool size and request counters for monitoring."""
+
+        with self._stats_lock:
+            return {
+                "rounds" : self.rounds,
+                "workers" : self.workers,
+                "completed" : self.completed,
+                "rejected" : self.rejected,
+            }
+
+
+def current_hasher():
+    """The current app's PasswordHasher."""
+
+    return current_app.extensions['passwords']
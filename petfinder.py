@@ -0,0 +1,692 @@
+"""Petfinder API access for Pawprint."""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ratelimit import INTERACTIVE, BACKGROUND
+from resilience import SingleFlight
+
+PETFINDER_API_URL = "https://api.petfinder.com/v2"
+
+# search filters that accept a comma-separated list, where order does not matter
+LIST_PARAMETERS = ("breed", "size", "gender", "age", "coat")
+
+# the most results Petfinder returns per page
+MAX_PAGE_LIMIT = 100
+
+logger = logging.getLogger(__name__)
+
+
+def canonicalize_search_params(params):
+    """
+    Return an equivalent, normalized copy of Petfinder search parameters.
+
+    Values are stripped and lowercased, comma-separated list filters are
+    sorted, empty filters are dropped, and the page defaults to 1. Searches
+    that mean the same thing therefore share one cache key.
+    """
+
+    canonical = {}
+
+    for key, value in params.items():
+        value = str(value).strip().lower() if value is not None else ""
+
+        if key in LIST_PARAMETERS and "," in value:
+            value = ",".join(sorted(part.strip() for part in value.split(",") if part.strip()))
+
+        if value:
+            canonical[key] = value
+
+    canonical["page"] = canonical.get("page", "1")
+
+    return dict(sorted(canonical.items()))
+
+
+def page_number(params):
+    """Return the requested page from search parameters, defaulting to 1."""
+
+    try:
+        return max(int(params.get("page") or 1), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def window_pages(page, page_size, limit):
+    """Return the upstream page numbers (of limit results each) that hold display page page."""
+
+    start = (page - 1) * page_size
+    end = start + page_size - 1
+
+    return range(start // limit + 1, end // limit + 2)
+
+
+def merge_window(key, payloads, page, page_size, limit):
+    """
+    Slice display page page out of consecutive upstream pages (the first
+    being window_pages()[0]) and build a Petfinder-style pagination block
+    for it. key is the list's name in the payloads, e.g. "animals".
+    """
+
+    first_page = (page - 1) * page_size // limit + 1
+    offset = (page - 1) * page_size - (first_page - 1) * limit
+
+    items = [item for payload in payloads for item in payload.get(key) or []]
+    items = items[offset:offset + page_size]
+
+    total_count = (payloads[0].get("pagination") or {}).get("total_count", 0) if payloads else 0
+    total_pages = -(-total_count // page_size)
+
+    links = {}
+    if page > 1:
+        links["previous"] = {"href" : f"?page={page - 1}"}
+    if page < total_pages:
+        links["next"] = {"href" : f"?page={page + 1}"}
+
+    return {
+        key : items,
+        "pagination" : {
+            "count_per_page" : page_size,
+            "total_count" : total_count,
+            "current_page" : page,
+            "total_pages" : total_pages,
+            "_links" : links,
+        },
+    }
+
+
+class PetfinderError(Exception):
+    """A Petfinder API request failed."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def is_outage(self):
+        """Does this error mean Petfinder itself is failing (rather than e.g. a 404)?"""
+
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+class PetfinderRateLimited(PetfinderError):
+    """Pawprint's own Petfinder request budget is used up."""
+
+    def __init__(self, message, serve_stale):
+        super().__init__(message, 429)
+        self.serve_stale = serve_stale
+
+    @property
+    def is_outage(self):
+        """Only treated as an outage (so cached data is served) if configured to."""
+
+        return self.serve_stale
+
+
+class CircuitOpenError(PetfinderError):
+    """Petfinder was not called because the circuit breaker is open."""
+
+    def __init__(self, message="Petfinder is temporarily unavailable"):
+        super().__init__(message, 503)
+
+
+class CountingRetry(Retry):
+    """urllib3 Retry that calls on_retry before each retry, since every retry is another request sent."""
+
+    def __init__(self, *args, on_retry=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_retry = on_retry
+
+    def new(self, **kwargs):
+        kwargs.setdefault("on_retry", self.on_retry)
+        return super().new(**kwargs)
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)
+
+        # increment() raises instead once retries are used up
+        if self.on_retry is not None:
+            self.on_retry()
+
+        return retry
+
+
+class TokenManager:
+    """
+    Process-wide holder of a Petfinder client-credentials access token.
+
+    One token is shared by every request a worker serves. The token is
+    refreshed shortly before Petfinder says it expires, and concurrent
+    callers that all find it stale wait on a single refresh request.
+    """
+
+    def __init__(self, api_key, secret, token_url=f"{PETFINDER_API_URL}/oauth2/token", refresh_margin=60, post=requests.post):
+        self.api_key = api_key
+        self.secret = secret
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self.post = post
+
+        self._lock = threading.Lock()
+        self._access_token = None
+        self._expires_at = 0
+
+    def _is_fresh(self):
+        """Is the held token valid for at least refresh_margin more seconds?"""
+
+        return self._access_token is not None and time.monotonic() < self._expires_at - self.refresh_margin
+
+    def get_token(self):
+        """Return a valid access token, requesting a new one if needed."""
+
+        if self._is_fresh():
+            return self._access_token
+
+        # only one thread refreshes; the rest block here and reuse its token
+        with self._lock:
+            if not self._is_fresh():
+                self._refresh()
+
+            return self._access_token
+
+    def invalidate(self, access_token):
+        """
+        Forget access_token (e.g. after Petfinder rejected it with a 401)
+        unless another thread has already replaced it.
+        """
+
+        with self._lock:
+            if self._access_token == access_token:
+                self._access_token = None
+                self._expires_at = 0
+
+    def _refresh(self):
+        """Request a new client-credentials token from Petfinder."""
+
+        data = {
+            "grant_type" : "client_credentials",
+            "client_id" : self.api_key,
+            "client_secret" : self.secret
+        }
+
+        response = self.post(self.token_url, data=data)
+
+        if response.status_code != 200:
+            raise PetfinderError("Could not obtain a Petfinder access token", response.status_code)
+
+        try:
+            json = response.json()
+        except ValueError as exc:
+            raise PetfinderError("Petfinder returned an access token response that is not JSON") from exc
+
+        self._access_token = json.get("access_token")
+        self._expires_at = time.monotonic() + json.get("expires_in", 3600)
+
+
+class PetfinderClient:
+    """
+    Petfinder API client for one worker process.
+
+    All threads share a single pool of keep-alive connections, so repeated
+    calls skip the TCP and TLS handshakes. Every call has connect and read
+    timeouts, and 5xx responses are retried with exponential backoff,
+    ignoring any Retry-After. A 429 is not retried; it counts against the
+    circuit breaker instead.
+
+    With a circuit breaker, calls fail fast while Petfinder is down. Search
+    and detail results are cached; once an entry goes stale it is served
+    immediately and refreshed in the background, and it is also served in
+    place of an error when Petfinder cannot be reached.
+
+    Concurrent requests for the same resource within a worker share one
+    upstream call.
+
+    With a rate limiter, every call first takes a token from the shared
+    budget. Background refreshes run at BACKGROUND priority. When the budget
+    is exhausted, rate_limit_mode decides what happens: "queue" waits up to
+    rate_limit_max_wait seconds and then serves cached data, "cache" serves
+    cached data at once, and "fail" raises at once.
+
+    With a recent_payloads cache, every animal and organization seen in
+    search results is kept for a short while, and detail lookups for them
+    (e.g. when bookmarking a pet from the results) skip the upstream call.
+
+    With a prefetcher, the page after the one just shown can be fetched in
+    the background at BACKGROUND priority, and a search for that page is
+    then answered from the prefetched result.
+
+    With a page_size, search pages are Pawprint's own: results are fetched
+    from Petfinder in pages of upstream_limit (up to 100, so one call
+    covers several display pages), pages a display page straddles are
+    fetched concurrently, and the merged window is re-sliced into a page
+    of page_size results with its own pagination block.
+    """
+
+    RATE_LIMIT_MODES = ("queue", "cache", "fail")
+
+    # 429s are not retried here: the token bucket and circuit breaker handle throttling
+    RETRY_STATUSES = (500, 502, 503, 504)
+
+    def __init__(self, api_key, secret, base_url=PETFINDER_API_URL, pool_size=10,
+                 connect_timeout=3.05, read_timeout=10, max_retries=2, backoff_factor=0.3,
+                 search_cache=None, detail_cache=None, breaker=None, stale_while_revalidate=True,
+                 rate_limiter=None, rate_limit_mode="queue", rate_limit_max_wait=2,
+                 recent_payloads=None, prefetcher=None, page_size=None, upstream_limit=MAX_PAGE_LIMIT,
+                 fan_out_workers=4):
+        if rate_limit_mode not in self.RATE_LIMIT_MODES:
+            raise ValueError(f"rate_limit_mode must be one of {self.RATE_LIMIT_MODES}")
+
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.search_cache = search_cache
+        self.detail_cache = detail_cache
+        self.breaker = breaker
+        self.stale_while_revalidate = stale_while_revalidate
+        self.rate_limiter = rate_limiter
+        self.rate_limit_mode = rate_limit_mode
+        self.rate_limit_max_wait = rate_limit_max_wait
+        self.recent_payloads = recent_payloads
+        self.prefetcher = prefetcher
+        self.page_size = page_size
+        self.upstream_limit = min(upstream_limit, MAX_PAGE_LIMIT)
+
+        self.inflight = SingleFlight()
+
+        self._revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix="petfinder-revalidate",
+                                               initializer=self.set_priority, initargs=(BACKGROUND,))
+        self._fan_out_pool = ThreadPoolExecutor(max_workers=fan_out_workers, thread_name_prefix="petfinder-fan-out")
+        self._revalidating = set()
+        self._revalidating_lock = threading.Lock()
+
+        retry = CountingRetry(
+            on_retry=self._count_request,
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False,
+            # a Retry-After would park a request thread for as long as the server asks
+            respect_retry_after_header=False,
+        )
+
+        # urllib3 connection pools are thread-safe, so one adapter is mounted
+        # on every thread's session and they all draw from the same pool
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self._local = threading.local()
+
+        self.token_manager = TokenManager(api_key, secret, token_url=f"{base_url}/oauth2/token", post=self._post)
+
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.requests = 0
+        self.errors = 0
+        self.outbound_seconds = 0.0
+
+    def set_priority(self, priority):
+        """Set the rate limit priority for calls made from the current thread."""
+
+        self._local.priority = priority
+
+    def _session(self):
+        """Return this thread's session, which uses the shared connection pool."""
+
+        session = getattr(self._local, "session", None)
+
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+
+        return session
+
+    def _count_request(self):
+        """Count one HTTP request sent to Petfinder against the daily quota."""
+
+        with self._stats_lock:
+            self.requests += 1
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.count()
+
+    def _request(self, method, url, **kwargs):
+        """Send a request through the pool, recording how long it took."""
+
+        # retries the adapter makes are counted by CountingRetry
+        self._count_request()
+        start = time.perf_counter()
+
+        try:
+            response = self._session().request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as exc:
+            self._record(time.perf_counter() - start, failed=True)
+            raise PetfinderError(f"Petfinder request failed: {exc}") from exc
+
+        elapsed = time.perf_counter() - start
+        self._record(elapsed, failed=response.status_code >= 400)
+        logger.debug("Petfinder %s %s -> %s in %.3fs", method, url, response.status_code, elapsed)
+
+        return response
+
+    def _record(self, elapsed, failed):
+        """Add one outbound call to the running totals."""
+
+        with self._stats_lock:
+            self.calls += 1
+            self.errors += failed
+            self.outbound_seconds += elapsed
+
+    def _post(self, url, data):
+        """POST form data to url."""
+
+        return self._request("POST", url, data=data)
+
+    def get(self, path, params=None):
+        """
+        Make an authorized GET request for path and return the parsed JSON.
+
+        If Petfinder rejects the token with a 401, the token is discarded and
+        the request is retried once with a fresh one.
+
+        Raises CircuitOpenError without calling Petfinder while the circuit
+        breaker is open, and PetfinderRateLimited when the request budget
+        is exhausted. Refused calls use none of the budget.
+        """
+
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError()
+
+        if self.rate_limiter is not None:
+            priority = getattr(self._local, "priority", INTERACTIVE)
+            timeout = self.rate_limit_max_wait if self.rate_limit_mode == "queue" else 0
+
+            if not self.rate_limiter.acquire(priority, timeout=timeout):
+                if self.breaker is not None:
+                    self.breaker.cancel()
+                raise PetfinderRateLimited("Petfinder request budget exhausted", serve_stale=self.rate_limit_mode != "fail")
+
+        if self.breaker is None:
+            return self._get(path, params)
+
+        start = time.perf_counter()
+        # anything other than a clean answer or a non-outage error counts against
+        # Petfinder, and the outcome is always recorded so a half-open probe is released
+        failed = True
+
+        try:
+            json = self._get(path, params)
+            failed = False
+            return json
+        except PetfinderError as exc:
+            failed = exc.is_outage
+            raise
+        finally:
+            self.breaker.record(time.perf_counter() - start, failed=failed)
+
+    def _get(self, path, params):
+        """GET path with the shared access token, retrying once after a 401."""
+
+        url = f"{self.base_url}{path}"
+
+        access_token = self.token_manager.get_token()
+        response = self._request("GET", url, params=params, headers={"Authorization" : f"Bearer {access_token}"})
+
+        if response.status_code == 401:
+            self.token_manager.invalidate(access_token)
+            access_token = self.token_manager.get_token()
+            response = self._request("GET", url, params=params, headers={"Authorization" : f"Bearer {access_token}"})
+
+        if response.status_code != 200:
+            raise PetfinderError(f"Petfinder returned {response.status_code} for {path}", response.status_code)
+
+        try:
+            return response.json()
+        except ValueError as exc:
+            # e.g. a proxy's HTML error page served with a 200
+            raise PetfinderError(f"Petfinder returned a response that is not JSON for {path}") from exc
+
+    def _cached(self, cache, key, fetch):
+        """
+        Return fetch() through cache, using stale entries when allowed.
+
+        A stale entry is returned at once while a background thread
+        refreshes it, or in place of an error if Petfinder is failing.
+        Concurrent fetches of the same key share one upstream call.
+        """
+
+        def shared_fetch():
+            return self.inflight.do(key, fetch)
+
+        if cache is None:
+            return shared_fetch()
+
+        value, fresh = cache.lookup(key)
+
+        if fresh:
+            return value
+
+        if value is not None and self.stale_while_revalidate:
+            self._revalidate(cache, key, shared_fetch)
+            return value
+
+        try:
+            value = shared_fetch()
+        except PetfinderError as exc:
+            if value is not None and exc.is_outage:
+                logger.warning("Serving stale %s: %s", key, exc)
+                return value
+            raise
+
+        cache.set(key, value)
+
+        return value
+
+    def _revalidate(self, cache, key, fetch):
+        """Refresh key in the background unless a refresh is already running."""
+
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def refresh():
+            try:
+                cache.set(key, fetch())
+            except PetfinderError as exc:
+                logger.warning("Could not revalidate %s: %s", key, exc)
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard(key)
+
+        self._revalidator.submit(refresh)
+
+    def _upstream_params(self, params, page):
+        """Return the parameters of each upstream search needed for display page page."""
+
+        if self.page_size is None:
+            return [dict(params, page=page)]
+
+        return [dict(params, page=upstream_page, limit=self.upstream_limit)
+                for upstream_page in window_pages(page, self.page_size, self.upstream_limit)]
+
+    def _fan_out(self, path, upstream_params):
+        """Run several upstream searches concurrently, at the caller's priority. Returns their payloads in order."""
+
+        if len(upstream_params) == 1:
+            return [self._search_page(path, upstream_params[0])]
+
+        priority = getattr(self._local, "priority", INTERACTIVE)
+
+        def search_page(params):
+            self.set_priority(priority)
+            return self._search_page(path, params)
+
+        futures = [self._fan_out_pool.submit(search_page, params) for params in upstream_params]
+
+        return [future.result() for future in futures]
+
+    def _search(self, path, params):
+        """Return display page params["page"] of a search, merged from upstream pages in page_size mode."""
+
+        page = page_number(params)
+        payloads = self._fan_out(path, self._upstream_params(params, page))
+
+        if self.page_size is None:
+            return payloads[0]
+
+        return merge_window(path.strip("/"), payloads, page, self.page_size, self.upstream_limit)
+
+    def _search_page(self, path, params):
+        """Run one canonicalized upstream search through search_cache, remembering each result."""
+
+        params = canonicalize_search_params(params)
+        key = (path, tuple(params.items()))
+
+        json = self.prefetcher.take(key) if self.prefetcher is not None else None
+
+        if json is None:
+            json = self._cached(self.search_cache, key, lambda: self.get(path, params))
+        elif self.search_cache is not None:
+            self.search_cache.set(key, json)
+
+        if self.recent_payloads is not None:
+            # "/animals" results are listed under "animals", and so on
+            for item in json.get(path.strip("/")) or []:
+                self.recent_payloads.set(f"{path}/{item.get('id')}", item)
+
+        return json
+
+    def _prefetch_next(self, path, params, pagination, owner):
+        """
+        Fetch the upstream pages behind the page after pagination's current
+        page in the background, skipping any already cached. Returns
+        whether anything was scheduled.
+        """
+
+        if self.prefetcher is None or not pagination:
+            return False
+
+        current_page = pagination.get("current_page")
+        total_pages = pagination.get("total_pages")
+
+        if not current_page or not total_pages or current_page >= total_pages:
+            return False
+
+        scheduled = False
+
+        for upstream_params in self._upstream_params(params, current_page + 1):
+            upstream_params = canonicalize_search_params(upstream_params)
+            key = (path, tuple(upstream_params.items()))
+
+            if self.search_cache is not None and key in self.search_cache:
+                continue
+
+            def fetch(key=key, upstream_params=upstream_params):
+                self.set_priority(BACKGROUND)
+                # a search for this page arriving meanwhile shares the call
+                return self.inflight.do(key, lambda: self.get(path, upstream_params))
+
+            scheduled = self.prefetcher.schedule(key, owner, fetch) or scheduled
+
+        return scheduled
+
+    def _get_detail(self, path, key):
+        """Return one object, from recent search results if possible, else through detail_cache."""
+
+        if self.recent_payloads is not None:
+            payload = self.recent_payloads.get(path)
+            if payload is not None:
+                return payload
+
+        return self._cached(self.detail_cache, path, lambda: self.get(path).get(key))
+
+    def search_animals(self, params):
+        """Search Petfinder animals. Returns a dict with 'animals' and 'pagination'."""
+
+        return self._search("/animals", params)
+
+    def prefetch_animals(self, params, pagination, owner):
+        """Fetch the next page of an animal search in the background. Returns whether it was scheduled."""
+
+        return self._prefetch_next("/animals", params, pagination, owner)
+
+    def get_animal(self, animal_id):
+        """Return the Petfinder animal with the given ID."""
+
+        return self._get_detail(f"/animals/{animal_id}", "animal")
+
+    def search_organizations(self, params):
+        """Search Petfinder organizations. Returns a dict with 'organizations' and 'pagination'."""
+
+        return self._search("/organizations", params)
+
+    def prefetch_organizations(self, params, pagination, owner):
+        """Fetch the next page of an organization search in the background. Returns whether it was scheduled."""
+
+        return self._prefetch_next("/organizations", params, pagination, owner)
+
+    def get_organization(self, organization_id):
+        """Return the Petfinder organization with the given ID."""
+
+        return self._get_detail(f"/organizations/{organization_id}", "organization")
+
+    def stats(self):
+        """Return outbound call counts and timings for monitoring."""
+
+        with self._stats_lock:
+            return {
+                "calls" : self.calls,
+                "requests" : self.requests,
+                "errors" : self.errors,
+                "outbound_seconds" : round(self.outbound_seconds, 3),
+                "mean_seconds" : round(self.outbound_seconds / self.calls, 3) if self.calls else 0,
+            }
+
+
+class AsyncPetfinderClient:
+    """
+    asyncio interface to a PetfinderClient, for async views.
+
+    Each call runs the blocking client on executor, so it still shares the
+    client's connection pool, access token, caches, circuit breaker and
+    rate limiter. Awaiting several calls with asyncio.gather() runs them
+    concurrently, so a view needing more than one upstream call only waits
+    for the slowest.
+    """
+
+    def __init__(self, client, executor):
+        self.client = client
+        self.executor = executor
+
+    async def _call(self, function, *args):
+        """Run function(*args) on the executor and await its result."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args))
+
+    async def search_animals(self, params):
+        """Search Petfinder animals. Returns a dict with 'animals' and 'pagination'."""
+
+        return await self._call(self.client.search_animals, params)
+
+    async def get_animal(self, animal_id):
+        """Return the Petfinder animal with the given ID."""
+
+        return await self._call(self.client.get_animal, animal_id)
+
+    async def search_organizations(self, params):
+        """Search Petfinder organizations. Returns a dict with 'organizations' and 'pagination'."""
+
+        return await self._call(self.client.search_organizations, params)
+
+    async def get_organization(self, organization_id):
+        """Return the Petfinder organization with the given ID."""
+
+        return await self._call(self.client.get_organization, organization_id)
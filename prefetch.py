@@ -0,0 +1,106 @@
+"""Speculative fetching of pages the user is likely to ask for next."""
+
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Runs speculative fetches on a small background pool and keeps their
+    results in a short-lived store until someone takes them.
+
+    At most max_in_flight fetches run or wait at once across the worker,
+    and at most per_owner of them for any one owner (e.g. a user), so a
+    single busy user cannot take the whole pool. Requests over either cap
+    are dropped rather than queued, since a late prefetch is worthless.
+
+    Every prefetch costs an upstream call, so stats() reports how many
+    prefetched results were actually used.
+    """
+
+    def __init__(self, store, max_in_flight=4, per_owner=1):
+        self.store = store
+        self.max_in_flight = max_in_flight
+        self.per_owner = per_owner
+
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="petfinder-prefetch")
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._owners = Counter()
+
+        self.scheduled = 0
+        self.skipped = 0
+        self.fetched = 0
+        self.failed = 0
+        self.hits = 0
+
+    def schedule(self, key, owner, fetch):
+        """
+        Run fetch() in the background and store its result under key.
+        Return whether the fetch was scheduled.
+        """
+
+        with self._lock:
+            if key in self._in_flight or key in self.store:
+                return False
+
+            if len(self._in_flight) >= self.max_in_flight or self._owners[owner] >= self.per_owner:
+                self.skipped += 1
+                return False
+
+            self._in_flight.add(key)
+            self._owners[owner] += 1
+            self.scheduled += 1
+
+        def run():
+            try:
+                value = fetch()
+            except Exception as exc:
+                logger.warning("Could not prefetch %s: %s", key, exc)
+                with self._lock:
+                    self.failed += 1
+            else:
+                self.store.set(key, value)
+                with self._lock:
+                    self.fetched += 1
+            finally:
+                with self._lock:
+                    self._in_flight.discard(key)
+                    self._owners[owner] -= 1
+                    if not self._owners[owner]:
+                        del self._owners[owner]
+
+        self._executor.submit(run)
+
+        return True
+
+    def take(self, key):
+        """Remove and return the prefetched result for key, or None."""
+
+        value = self.store.pop(key)
+
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+
+        return value
+
+    def stats(self):
+        """Return how many prefetches ran and how many were used."""
+
+        with self._lock:
+            return {
+                "scheduled" : self.scheduled,
+                "skipped" : self.skipped,
+                "in_flight" : len(self._in_flight),
+                "fetched" : self.fetched,
+                "failed" : self.failed,
+                "hits" : self.hits,
+                "upstream_calls" : self.fetched + self.failed,
+                "hit_rate" : round(self.hits / self.fetched, 3) if self.fetched else 0,
+                "stored" : len(self.store),
+            }
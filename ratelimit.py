@@ -0,0 +1,162 @@
+"""Outbound rate limiting and daily quota accounting for the Petfinder API."""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+# request priorities; background work may not use the reserved share of the budget
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+
+def utc_today():
+    """Petfinder's daily quota resets on the UTC date."""
+
+    return datetime.now(timezone.utc).date()
+
+
+class RateLimiter:
+    """
+    Token bucket plus daily quota shared by every outbound call in a worker.
+
+    The bucket refills at rate requests per second up to burst. Background
+    requests may not dip into the last background_reserve fraction of
+    either the bucket or the daily quota, which keeps room for interactive
+    page views.
+
+    acquire() admits a call; count() records each HTTP request actually
+    sent to Petfinder (a call can send several: retries, a fresh token),
+    and only those count towards the daily quota. Requests are counted in
+    memory; take_unflushed() and sync() let the app persist the count and
+    pick up requests made by other workers.
+    """
+
+    def __init__(self, rate=50, burst=50, daily_quota=1000, background_reserve=0.2, flush_interval=5):
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.background_reserve = background_reserve
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+
+        self._day = utc_today()
+        self._used_today = 0
+        self._unflushed = 0
+        self._flushed_at = 0
+
+        self.granted = {INTERACTIVE : 0, BACKGROUND : 0}
+        self.refused = {INTERACTIVE : 0, BACKGROUND : 0}
+
+    def _refill(self):
+        """Add tokens for the time since the last refill and roll over the day. Caller holds the lock."""
+
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+        today = utc_today()
+        if today != self._day:
+            self._day = today
+            self._used_today = 0
+
+    def _floors(self, priority):
+        """Return the (token, quota) levels a priority may not go below."""
+
+        if priority == BACKGROUND:
+            return self.burst * self.background_reserve, self.daily_quota * self.background_reserve
+
+        return 0, 0
+
+    def acquire(self, priority=INTERACTIVE, timeout=0):
+        """
+        Admit one call if the day's quota has room, taking a token from the
+        bucket and waiting up to timeout seconds for it to refill. Return
+        whether the call may be made; its requests are counted by count().
+        """
+
+        deadline = time.monotonic() + timeout
+        token_floor, quota_floor = self._floors(priority)
+
+        while True:
+            with self._lock:
+                self._refill()
+
+                # waiting cannot help once the day's quota is gone
+                if self.daily_quota - self._used_today - 1 < quota_floor:
+                    self.refused[priority] += 1
+                    return False
+
+                if self._tokens - 1 >= token_floor:
+                    self._tokens -= 1
+                    self.granted[priority] += 1
+                    return True
+
+                wait = (token_floor + 1 - self._tokens) / self.rate
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                with self._lock:
+                    self.refused[priority] += 1
+                return False
+
+            time.sleep(min(wait, remaining))
+
+    def count(self, requests=1):
+        """Add requests sent to Petfinder to today's usage."""
+
+        with self._lock:
+            self._refill()
+            self._used_today += requests
+            self._unflushed += requests
+
+    def take_unflushed(self, force=False):
+        """
+        Return (day, calls) not yet persisted and reset the count, or None if
+        it is too soon since the last flush (unless force is True).
+        """
+
+        with self._lock:
+            now = time.monotonic()
+
+            if not force and now - self._flushed_at < self.flush_interval:
+                return None
+
+            self._flushed_at = now
+            calls, self._unflushed = self._unflushed, 0
+
+            return self._day, calls
+
+    def restore(self, day, calls):
+        """Put back calls that could not be persisted."""
+
+        with self._lock:
+            if day == self._day:
+                self._unflushed += calls
+
+    def sync(self, day, total):
+        """Adopt the persisted total for day, which includes other workers' calls."""
+
+        with self._lock:
+            if day == self._day:
+                self._used_today = total + self._unflushed
+
+    def stats(self):
+        """Return current usage and remaining budget for monitoring."""
+
+        with self._lock:
+            self._refill()
+
+            return {
+                "day" : self._day.isoformat(),
+                "used_today" : self._used_today,
+                "daily_quota" : self.daily_quota,
+                "remaining_today" : max(self.daily_quota - self._used_today, 0),
+                "tokens" : round(self._tokens, 2),
+                "rate_per_second" : self.rate,
+                "granted" : dict(self.granted),
+                "refused" : dict(self.refused),
+            }
@@ -0,0 +1,175 @@
+"""Re-syncing stored pets and organizations with Petfinder, stalest first."""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from models import db, Organization, Pet, ApiUsage
+from petfinder import PetfinderError, PetfinderRateLimited, CircuitOpenError
+from ratelimit import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# kind -> (model, Petfinder detail key)
+KINDS = {
+    "organizations" : (Organization, "organization"),
+    "animals" : (Pet, "animal"),
+}
+
+# what a pet's status becomes once Petfinder no longer lists it (it was usually adopted)
+UNLISTED_STATUS = "unavailable"
+
+
+def fetch_details(petfinder, kind, ids, executor):
+    """
+    Fetch the current Petfinder object for each id on executor, bypassing
+    the client's caches. Returns {id: object, None if Petfinder no longer
+    has it, or the PetfinderError raised}. A response without the object
+    counts as a PetfinderError.
+    """
+
+    detail_key = KINDS[kind][1]
+
+    def fetch(id):
+        try:
+            return petfinder.get(f"/{kind}/{id}")[detail_key]
+        except KeyError:
+            return PetfinderError(f"Petfinder's response for {kind} {id} has no {detail_key}")
+        except PetfinderError as exc:
+            return None if exc.status_code == 404 else exc
+
+    return dict(zip(ids, executor.map(fetch, ids)))
+
+
+def store_missing_organizations(petfinder, animals, executor):
+    """
+    Fetch and store the organizations of animals that are not stored yet,
+    so the pets can reference them. Returns {organization id: None if
+    Petfinder no longer has it, or the PetfinderError raised} for those
+    that could not be stored.
+    """
+
+    missing = sorted(Organization.missing_ids(animal["organization_id"] for animal in animals if animal.get("organization_id")))
+    organizations = fetch_details(petfinder, "organizations", missing, executor)
+
+    Organization.upsert_many(organization for organization in organizations.values() if isinstance(organization, dict))
+
+    return {id : organization for id, organization in organizations.items() if not isinstance(organization, dict)}
+
+
+def apply_changes(row, columns):
+    """Set the columns of row that differ from columns. Returns whether any did."""
+
+    changed = False
+
+    for name, value in columns.items():
+        if getattr(row, name) != value:
+            setattr(row, name, value)
+            changed = True
+
+    return changed
+
+
+def refresh(petfinder, kind, max_age=24 * 3600, batch_size=100, workers=4, limit=None):
+    """
+    Re-fetch stored rows of kind ("animals" or "organizations") last
+    synced more than max_age seconds ago, stalest first, batch_size at a
+    time, until none are left (or limit rows were checked).
+
+    Each batch's detail lookups run on workers threads at background
+    priority. Only columns whose values changed are written; every
+    checked row gets a new synced_at, so it drops to the back of the
+    queue. Pets Petfinder no longer lists get status UNLISTED_STATUS.
+    Pets that moved to an organization not stored yet have it fetched
+    and stored first. Rows whose lookup failed, or whose new organization
+    could not be stored, are left for a later run. The run starts from
+    the day's shared Petfinder usage, records its requests after every
+    batch, and stops once the daily quota refuses its lookups or the
+    circuit breaker opens.
+
+    Returns a dict of rows checked, updated, unlisted and failed, upstream
+    calls (including token requests and retries), seconds taken and
+    rows/second.
+    """
+
+    model, _ = KINDS[kind]
+
+    # the database's clock, so the watermark compares like with like
+    started = db.session.execute(db.select(db.func.now())).scalar_one()
+    cutoff = started - timedelta(seconds=max_age)
+
+    stats = {"checked" : 0, "updated" : 0, "unlisted" : 0, "failed" : 0}
+    failed_ids = set()
+    calls_before = petfinder.stats()["requests"]
+    start = time.perf_counter()
+
+    ApiUsage.flush(petfinder.rate_limiter, force=True)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="petfinder-refresh",
+                            initializer=petfinder.set_priority, initargs=(BACKGROUND,)) as executor:
+        while limit is None or stats["checked"] + stats["failed"] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - stats["checked"] - stats["failed"])
+
+            rows = (model.query
+                    .filter(model.synced_at < cutoff, model.id.notin_(failed_ids))
+                    .order_by(model.synced_at, model.id)
+                    .limit(size)
+                    .all())
+
+            if not rows:
+                break
+
+            details = fetch_details(petfinder, kind, [row.id for row in rows], executor)
+            unstored = {}
+
+            if model is Pet:
+                unstored = store_missing_organizations(
+                    petfinder, [detail for detail in details.values() if isinstance(detail, dict)], executor)
+
+            for row in rows:
+                detail = details[row.id]
+
+                if isinstance(detail, dict) and detail.get("organization_id") in unstored:
+                    detail = unstored[detail["organization_id"]] or PetfinderError(
+                        f"Petfinder no longer has organization {detail['organization_id']}", 404)
+
+                if isinstance(detail, PetfinderError):
+                    logger.warning("Could not refresh %s %s: %s", kind, row.id, detail)
+                    failed_ids.add(row.id)
+                    stats["failed"] += 1
+                    continue
+
+                if detail is None:
+                    changed = model is Pet and apply_changes(row, {"status" : UNLISTED_STATUS})
+                    stats["unlisted"] += changed
+                else:
+                    changed = apply_changes(row, model.columns_from_petfinder(detail))
+
+                stats["updated"] += changed
+                stats["checked"] += 1
+                row.synced_at = db.func.now()
+
+            db.session.commit()
+            ApiUsage.flush(petfinder.rate_limiter, force=True)
+            logger.info("Refreshed %s %s so far", stats["checked"], kind)
+
+            errors = [*details.values(), *unstored.values()]
+
+            if any(isinstance(error, PetfinderRateLimited) for error in errors):
+                logger.warning("Petfinder request budget exhausted; stopping the %s refresh", kind)
+                break
+
+            if any(isinstance(error, CircuitOpenError) for error in errors):
+                logger.warning("Petfinder is unavailable; stopping the %s refresh", kind)
+                break
+
+    seconds = time.perf_counter() - start
+
+    return dict(
+        stats,
+        kind=kind,
+        upstream_calls=petfinder.stats()["requests"] - calls_before,
+        seconds=round(seconds, 3),
+        rows_per_second=round(stats["checked"] / seconds, 1) if seconds else 0,
+    )
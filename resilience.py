@@ -0,0 +1,182 @@
+"""Protection against a slow or failing upstream service."""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream service that keeps failing.
+
+    closed: calls flow normally. After failure_threshold consecutive
+    failures (errors or calls slower than slow_call_seconds) the breaker
+    opens.
+
+    open: calls are refused without touching the network until
+    reset_timeout seconds have passed, then the breaker goes half-open.
+
+    half_open: a single probe call is let through. Success closes the
+    breaker; failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, slow_call_seconds=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        """Current state, moving from open to half-open once the timeout passes."""
+
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+
+            return self._state
+
+    def allow(self):
+        """May a call be made right now?"""
+
+        state = self.state
+
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def cancel(self):
+        """Give back a call allow() let through that was not made after all."""
+
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, elapsed, failed):
+        """Record the outcome of a call that allow() let through."""
+
+        failed = failed or elapsed > self.slow_call_seconds
+
+        with self._lock:
+            self._probe_in_flight = False
+
+            if not failed:
+                self._failures = 0
+                if self._state != self.CLOSED:
+                    self._transition(self.CLOSED)
+                return
+
+            self._failures += 1
+
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                    self._transition(self.OPEN)
+
+    def _transition(self, state):
+        """Change state and log it. Caller holds the lock."""
+
+        logger.warning("Circuit breaker %s -> %s", self._state, state)
+        self._state = state
+
+    def stats(self):
+        """Return breaker state and counters for monitoring."""
+
+        state = self.state
+
+        with self._lock:
+            return {
+                "state" : state,
+                "consecutive_failures" : self._failures,
+                "times_opened" : self.times_opened,
+                "rejected" : self.rejected,
+            }
+
+
+class _Flight:
+    """One in-progress call that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers that arrive
+    while it is still running wait for it and share its result (or its
+    exception) instead of repeating the work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, function):
+        """Return function(), or the result of an identical call already in flight."""
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.result
+
+        try:
+            flight.result = function()
+            return flight.result
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """Return how many calls ran and how many were saved by sharing."""
+
+        with self._lock:
+            return {
+                "calls" : self.calls,
+                "saved" : self.shared,
+                "in_flight" : len(self._flights),
+            }
@@ -0,0 +1,174 @@
+"""Full-text and faceted search over the pets stored in the Pawprint DB."""
+
+import re
+
+from models import db, Pet
+from petfinder import page_number
+
+# PetSearchForm filters matched (ignoring case) against an indexed column
+FACETS = ("type", "size", "gender", "age", "status")
+
+# PetSearchForm filters matched against the full-text index -> the weight of their column's words
+TEXT_FILTERS = {"name" : "A", "breed" : "B", "color" : "C"}
+
+# Petfinder's size filter values, as stored
+SIZES = {"xlarge" : "extra large"}
+
+
+def can_search_locally(params):
+    """Can the local index answer a search with these filters? (It knows no geography.)"""
+
+    return all(key in FACETS or key in TEXT_FILTERS or key == "page" for key, value in params.items() if value)
+
+
+def facet_values(name, value):
+    """Return the lowercased stored values a comma-separated facet filter stands for."""
+
+    values = [part.strip().lower() for part in str(value).split(",") if part.strip()]
+
+    if name == "size":
+        return [SIZES.get(value, value) for value in values]
+
+    return values
+
+
+def weighted_query(value, weight):
+    """
+    Return a tsquery matching all the words of value, like plainto_tsquery,
+    but only among words of the given weight. None if value has no words.
+    """
+
+    words = re.findall(r"[^\W_]+", value)
+
+    if not words:
+        return None
+
+    return db.func.to_tsquery('english', " & ".join(f"'{word}':{weight}" for word in words))
+
+
+def text_query(params):
+    """
+    Return a tsquery for the text filters in params, or None without any.
+    Each filter matches only its own column. Its comma-separated values
+    are alternatives; filters must all match.
+    """
+
+    query = None
+
+    for name, weight in TEXT_FILTERS.items():
+        values = [weighted_query(part, weight) for part in str(params.get(name) or "").split(",")]
+        values = [value for value in values if value is not None]
+
+        if not values:
+            continue
+
+        alternatives = values[0]
+        for value in values[1:]:
+            alternatives = alternatives.op("||")(value)
+
+        query = alternatives if query is None else query.op("&&")(alternatives)
+
+    return query
+
+
+def filter_pets(params):
+    """Return the WHERE conditions for a search; adoptable pets only unless a status is given."""
+
+    conditions = []
+
+    for name in FACETS:
+        value = params.get(name) or ("adoptable" if name == "status" else None)
+        if value:
+            # matches the lower() facet indexes on pets
+            conditions.append(db.func.lower(getattr(Pet, name)).in_(facet_values(name, value)))
+
+    query = text_query(params)
+    if query is not None:
+        conditions.append(Pet.search_vector.op("@@")(query))
+
+    return conditions, query
+
+
+def facet_counts(conditions):
+    """
+    Return (total, {facet: {value: count}}) for the pets matching
+    conditions, from a single GROUPING SETS query.
+    """
+
+    columns = [getattr(Pet, name) for name in FACETS]
+
+    rows = db.session.execute(
+        db.select(*columns, *(db.func.grouping(column) for column in columns), db.func.count())
+        .where(*conditions)
+        .group_by(db.func.grouping_sets(*(db.tuple_(column) for column in columns), db.tuple_()))
+    ).all()
+
+    total = 0
+    facets = {name : {} for name in FACETS}
+
+    for row in rows:
+        values, grouped, count = row[:len(FACETS)], row[len(FACETS):-1], row[-1]
+
+        if all(grouped):
+            total = count
+            continue
+
+        # exactly one facet column is grouped on in every other row
+        index = grouped.index(0)
+        facets[FACETS[index]][values[index]] = count
+
+    return total, facets
+
+
+def as_petfinder_animal(pet):
+    """The fields of a Petfinder animal object the search results page reads."""
+
+    return {
+        "id" : pet.id,
+        "name" : pet.name,
+        "organization_id" : pet.organization_id,
+        "primary_photo_cropped" : {"large" : pet.image_url} if pet.image_url else None,
+    }
+
+
+def search_pets(params, per_page=20):
+    """
+    Search stored pets with PetSearchForm filters, best text matches (or
+    newest pets) first.
+
+    Returns a Petfinder-shaped search result for params["page"], with
+    "facets" holding the count of matching pets per facet value.
+    """
+
+    page = page_number(params)
+    conditions, query = filter_pets(params)
+    total, facets = facet_counts(conditions)
+
+    order = (db.func.ts_rank(Pet.search_vector, query).desc(),) if query is not None else ()
+
+    pets = db.session.execute(
+        db.select(Pet)
+        .where(*conditions)
+        .order_by(*order, Pet.id.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+    ).scalars().all()
+
+    total_pages = -(-total // per_page)
+    links = {}
+    if page > 1:
+        links["previous"] = {"href" : f"/pets?page={page - 1}"}
+    if page < total_pages:
+        links["next"] = {"href" : f"/pets?page={page + 1}"}
+
+    return {
+        "animals" : [as_petfinder_animal(pet) for pet in pets],
+        "pagination" : {
+            "count_per_page" : per_page,
+            "total_count" : total,
+            "current_page" : page,
+            "total_pages" : total_pages,
+            "_links" : links,
+        },
+        "facets" : facets,
+    }
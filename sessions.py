@@ -0,0 +1,271 @@
+"""Server-side sessions for Pawprint."""
+
+import logging
+import secrets
+import threading
+from datetime import datetime, timezone
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+
+def new_session_id():
+    """Return a fresh, unguessable session id."""
+
+    return secrets.token_urlsafe(32)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    Session data kept on the server; the cookie only carries sid. version
+    is the stored version the data was loaded at (None for a new session).
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, version=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid or new_session_id()
+        self.version = version
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the data to a new id, e.g. on login, so an id seen before cannot be reused."""
+
+        self.previous_sid = self.previous_sid or self.sid
+        self.sid = new_session_id()
+        self.version = None
+        self.modified = True
+
+
+class DictSessionStore:
+    """Sessions held in this process's memory. Only for a single worker (or tests)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def _entry(self, sid):
+        """Return the unexpired (data, expires_at, version) for sid, or None. Caller holds the lock."""
+
+        entry = self._sessions.get(sid)
+
+        if entry is not None and entry[1] <= datetime.now(timezone.utc):
+            del self._sessions[sid]
+            return None
+
+        return entry
+
+    def load(self, sid):
+        """Return (serialized session, version) for sid, or None if it is missing or expired."""
+
+        with self._lock:
+            entry = self._entry(sid)
+            return None if entry is None else (entry[0], entry[2])
+
+    def version(self, sid):
+        """Return the stored version of session sid, or None if it is missing or expired."""
+
+        with self._lock:
+            entry = self._entry(sid)
+            return None if entry is None else entry[2]
+
+    def save(self, sid, data, expires_at, version=None):
+        """
+        Store serialized session data under sid until expires_at and return
+        its new version. With a version, only replace the session if it is
+        still at that version; return None if it changed or is gone.
+        """
+
+        with self._lock:
+            entry = self._entry(sid)
+
+            if version is not None and (entry is None or entry[2] != version):
+                return None
+
+            new_version = 1 if entry is None else entry[2] + 1
+            self._sessions[sid] = (data, expires_at, new_version)
+
+            return new_version
+
+    def delete(self, sid):
+        """Remove the session sid if present."""
+
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class SQLSessionStore:
+    """
+    Sessions in the database (see models.StoredSession), shared by every
+    worker. Each operation runs on its own connection and transaction, so
+    saving a session never commits a view's unfinished work.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def load(self, sid):
+        """Return (serialized session, version) for sid, or None if it is missing or expired."""
+
+        return self.model.load(sid)
+
+    def version(self, sid):
+        """Return the stored version of session sid, or None if it is missing or expired."""
+
+        return self.model.version_of(sid)
+
+    def save(self, sid, data, expires_at, version=None):
+        """
+        Store serialized session data under sid until expires_at and return
+        its new version. With a version, only replace the session if it is
+        still at that version; return None if it changed or is gone.
+        """
+
+        return self.model.save(sid, data, expires_at, version)
+
+    def delete(self, sid):
+        """Remove the session sid if present."""
+
+        self.model.remove(sid)
+
+
+class CachedSessionStore:
+    """
+    Cache of loaded sessions in front of another store.
+
+    Every load still asks the store for the session's version, so a change
+    or logout made through another worker is seen at once; only when the
+    cached copy is at the current version is the data itself skipped.
+    Saves are compare-and-set on the version through the store, so a
+    worker can never write an out-of-date copy back over a newer one.
+    """
+
+    def __init__(self, store, cache):
+        self.store = store
+        self.cache = cache
+
+    def load(self, sid):
+        """Return (serialized session, version) for sid, reading the data from the cache if it is current."""
+
+        cached = self.cache.get(sid)
+
+        if cached is not None and self.store.version(sid) == cached[1]:
+            return cached
+
+        loaded = self.store.load(sid)
+
+        if loaded is None:
+            self.cache.delete(sid)
+        else:
+            self.cache.set(sid, loaded)
+
+        return loaded
+
+    def version(self, sid):
+        """Return the stored version of session sid, or None if it is missing or expired."""
+
+        return self.store.version(sid)
+
+    def save(self, sid, data, expires_at, version=None):
+        """Save through the store, caching the data if the save went through."""
+
+        new_version = self.store.save(sid, data, expires_at, version)
+
+        if new_version is None:
+            self.cache.delete(sid)
+        else:
+            self.cache.set(sid, (data, new_version))
+
+        return new_version
+
+    def delete(self, sid):
+        """Remove the session sid from the store and the cache."""
+
+        self.store.delete(sid)
+        self.cache.delete(sid)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Keeps session data in store and only an opaque session id in the
+    cookie, so requests no longer carry (and re-verify) the data itself.
+    Data is serialized the same way Flask's cookie sessions are.
+
+    A session is only saved if nobody else changed it since this request
+    loaded it. Otherwise the request's changes are dropped, so a logout
+    made by a concurrent request cannot be undone.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+
+        if sid:
+            try:
+                loaded = self.store.load(sid)
+            except SQLAlchemyError as exc:
+                logger.warning("Could not load session: %s", exc)
+                loaded = None
+
+            if loaded is not None:
+                data, version = loaded
+                return ServerSideSession(self.serializer.loads(data), sid=sid, version=version)
+
+        return ServerSideSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        try:
+            if session.previous_sid:
+                self.store.delete(session.previous_sid)
+
+            # an emptied session (e.g. after logout) is dropped along with its cookie
+            if not session:
+                if session.modified and not session.new:
+                    self.store.delete(session.sid)
+                    response.delete_cookie(name, domain=domain, path=path,
+                                           secure=self.get_cookie_secure(app),
+                                           samesite=self.get_cookie_samesite(app))
+                return
+
+            if session.modified:
+                expires_at = datetime.now(timezone.utc) + app.permanent_session_lifetime
+                session.version = self.store.save(session.sid, self.serializer.dumps(dict(session)), expires_at, session.version)
+
+                if session.version is None:
+                    logger.warning("Session changed by another request; not saving this request's changes")
+                    return
+
+        except SQLAlchemyError as exc:
+            logger.warning("Could not save session: %s", exc)
+            return
+
+        if session.new or session.modified or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
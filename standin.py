@@ -0,0 +1,416 @@
+"""
+A local stand-in for the Petfinder API, for offline development,
+benchmarks and load tests.
+
+Serves /v2/oauth2/token, /v2/animals, /v2/animals/<id>,
+/v2/organizations and /v2/organizations/<id> over a generated dataset,
+with optional latency and injected 5xx, 401 and 429 responses. Point the
+app at it with the "offline" configuration profile, or run it on its own:
+
+    python standin.py --port 8765 --animals 10000 --latency 0.1
+"""
+
+import argparse
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+TYPES = {
+    "Dog" : ("Labrador Retriever", "Pit Bull Terrier", "Beagle", "Pug", "Samoyed", "Mixed Breed"),
+    "Cat" : ("Domestic Short Hair", "Domestic Long Hair", "Siamese", "Tabby", "Maine Coon"),
+    "Rabbit" : ("Lop Eared", "Dutch", "Rex"),
+}
+COLORS = ("Black", "White", "Brown", "Gray", "Golden", "Cream", "Tricolor")
+SIZES = ("Small", "Medium", "Large", "Extra Large")
+GENDERS = ("Male", "Female", "Unknown")
+AGES = ("Baby", "Young", "Adult", "Senior")
+STATUSES = ("adoptable", "adoptable", "adoptable", "adopted", "found")
+NAMES = ("Fred", "Spark", "Luna", "Milo", "Bella", "Max", "Daisy", "Oliver", "Coco", "Rocky", "Penny", "Toby")
+ORGANIZATION_NAMES = ("Rescue", "Sanctuary", "Humane Society", "Animal Shelter", "Pet Adoption League")
+CITIES = (
+    ("New York", "NY", "10001"), ("Brooklyn", "NY", "11201"), ("Newark", "NJ", "07102"),
+    ("Philadelphia", "PA", "19103"), ("Boston", "MA", "02108"), ("Chicago", "IL", "60601"),
+    ("Austin", "TX", "78701"), ("Denver", "CO", "80202"), ("Seattle", "WA", "98101"),
+    ("Los Angeles", "CA", "90012"), ("San Francisco", "CA", "94103"), ("Miami", "FL", "33130"),
+)
+
+# Petfinder's filter values for the size field
+SIZE_FILTERS = {"small" : "Small", "medium" : "Medium", "large" : "Large", "xlarge" : "Extra Large"}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def generate_organizations(count, rng):
+    """Return count Petfinder organization objects."""
+
+    organizations = []
+
+    for i in range(1, count + 1):
+        city, state, postcode = rng.choice(CITIES)
+        id = f"{state}{i}"
+
+        organizations.append({
+            "id" : id,
+            "name" : f"{city} {rng.choice(ORGANIZATION_NAMES)} {i}",
+            "email" : f"adopt@{id.lower()}.example.org",
+            "phone" : f"555-{i % 10000:04d}",
+            "address" : {"address1" : None, "address2" : None, "city" : city, "state" : state, "postcode" : postcode, "country" : "US"},
+            "url" : f"https://www.petfinder.com/member/us/{state.lower()}/{id.lower()}/",
+            "website" : None,
+            "mission_statement" : None,
+            "photos" : [],
+        })
+
+    return organizations
+
+
+def generate_animals(count, organizations, rng):
+    """Return count Petfinder animal objects, each belonging to one of organizations."""
+
+    animals = []
+
+    for id in range(1, count + 1):
+        type = rng.choice(tuple(TYPES))
+        organization = rng.choice(organizations)
+
+        animals.append({
+            "id" : id,
+            "organization_id" : organization["id"],
+            "url" : f"https://www.petfinder.com/{type.lower()}/{id}/",
+            "type" : type,
+            "species" : type,
+            "breeds" : {"primary" : rng.choice(TYPES[type]), "secondary" : None, "mixed" : rng.random() < 0.3, "unknown" : False},
+            "colors" : {"primary" : rng.choice(COLORS), "secondary" : None, "tertiary" : None},
+            "age" : rng.choice(AGES),
+            "gender" : rng.choice(GENDERS),
+            "size" : rng.choice(SIZES),
+            "name" : f"{rng.choice(NAMES)} {id}",
+            "description" : f"A friendly {type.lower()} looking for a home.",
+            "photos" : [],
+            "primary_photo_cropped" : None,
+            "status" : rng.choice(STATUSES),
+            "published_at" : "2023-01-01T00:00:00+0000",
+            "contact" : {"email" : organization["email"], "phone" : organization["phone"], "address" : organization["address"]},
+        })
+
+    return animals
+
+
+def matches(value, wanted):
+    """Does value equal (case-insensitively) any of the comma-separated wanted values?"""
+
+    return value is not None and value.lower() in (part.strip().lower() for part in wanted.split(","))
+
+
+def filter_animals(animals, params):
+    """Apply the Petfinder animal search filters the app uses to animals."""
+
+    status = params.get("status", "adoptable")
+    results = [animal for animal in animals if matches(animal["status"], status)]
+
+    if "type" in params:
+        results = [animal for animal in results if matches(animal["type"], params["type"])]
+    if "breed" in params:
+        results = [animal for animal in results if matches(animal["breeds"]["primary"], params["breed"])]
+    if "size" in params:
+        sizes = ",".join(SIZE_FILTERS.get(size.strip().lower(), size) for size in params["size"].split(","))
+        results = [animal for animal in results if matches(animal["size"], sizes)]
+    if "gender" in params:
+        results = [animal for animal in results if matches(animal["gender"], params["gender"])]
+    if "age" in params:
+        results = [animal for animal in results if matches(animal["age"], params["age"])]
+    if "color" in params:
+        results = [animal for animal in results if matches(animal["colors"]["primary"], params["color"])]
+    if "name" in params:
+        results = [animal for animal in results if params["name"].lower() in animal["name"].lower()]
+    if "organization" in params:
+        results = [animal for animal in results if matches(animal["organization_id"], params["organization"])]
+    if "location" in params:
+        # no geography here: a location only matches its exact postcode, city or state
+        results = [animal for animal in results if located_at(animal["contact"]["address"], params["location"])]
+
+    return results
+
+
+def filter_organizations(organizations, params):
+    """Apply the Petfinder organization search filters the app uses to organizations."""
+
+    results = organizations
+
+    if "name" in params:
+        results = [organization for organization in results if params["name"].lower() in organization["name"].lower()]
+    if "state" in params:
+        results = [organization for organization in results if matches(organization["address"]["state"], params["state"])]
+    if "country" in params:
+        results = [organization for organization in results if matches(organization["address"]["country"], params["country"])]
+    if "location" in params:
+        results = [organization for organization in results if located_at(organization["address"], params["location"])]
+
+    return results
+
+
+def located_at(address, location):
+    """Is address at location ("postcode", "City, State" or "State")?"""
+
+    location = location.strip().lower()
+
+    return location in (
+        address["postcode"].lower(),
+        f"{address['city']}, {address['state']}".lower(),
+        address["state"].lower(),
+    )
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers Petfinder API requests from the stand-in's dataset."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("UTF-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stand_in.record(status)
+
+    def send_problem(self, status, title, detail, headers=None):
+        """Send an error in Petfinder's problem+json shape."""
+
+        self.send_json(status, {"type" : f"https://httpstatus.es/{status}", "status" : status, "title" : title, "detail" : detail}, headers)
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("UTF-8"))
+
+        if urlsplit(self.path).path.rstrip("/") != "/v2/oauth2/token":
+            return self.send_problem(404, "Not Found", "Unknown endpoint")
+
+        if form.get("grant_type") != ["client_credentials"] or not form.get("client_id") or not form.get("client_secret"):
+            return self.send_problem(401, "Unauthorized", "Invalid client credentials")
+
+        self.send_json(200, {"token_type" : "Bearer", "expires_in" : stand_in.token_ttl, "access_token" : stand_in.issue_token()})
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        url = urlsplit(self.path)
+        params = {key : values[-1] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+
+        if stand_in.latency:
+            time.sleep(stand_in.latency)
+
+        fault = stand_in.fault()
+
+        if fault == 500:
+            return self.send_problem(500, "Internal Server Error", "Injected error")
+        if fault == 429:
+            return self.send_problem(429, "Too Many Requests", "Injected rate limit", {"Retry-After" : "1"})
+
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+
+        if fault == 401 or not stand_in.token_valid(token):
+            return self.send_problem(401, "Unauthorized", "Access token invalid or expired")
+
+        if len(parts) == 2 and parts[0] == "v2" and parts[1] in ("animals", "organizations"):
+            return self.send_json(200, stand_in.search(parts[1], params))
+
+        if len(parts) == 3 and parts[0] == "v2" and parts[1] in ("animals", "organizations"):
+            item = stand_in.lookup(parts[1], parts[2])
+
+            if item is None:
+                return self.send_problem(404, "Not Found", "Not Found")
+
+            return self.send_json(200, {"animal" if parts[1] == "animals" else "organization" : item})
+
+        self.send_problem(404, "Not Found", "Unknown endpoint")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PetfinderStandIn:
+    """
+    A generated Petfinder dataset served over HTTP.
+
+    The dataset is the same for the same sizes and seed. Every GET waits
+    latency seconds, then fails with a 500, 429 or 401 with probability
+    error_rate, rate_limited_rate and unauthorized_rate respectively.
+    Access tokens expire after token_ttl seconds, like Petfinder's.
+    """
+
+    def __init__(self, animals=1000, organizations=100, latency=0, error_rate=0, rate_limited_rate=0,
+                 unauthorized_rate=0, token_ttl=3600, seed=0):
+        rng = random.Random(seed)
+        self.organizations = generate_organizations(organizations, rng)
+        self.animals = generate_animals(animals, self.organizations, rng)
+        self._animals_by_id = {str(animal["id"]) : animal for animal in self.animals}
+        self._organizations_by_id = {organization["id"].lower() : organization for organization in self.organizations}
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limited_rate = rate_limited_rate
+        self.unauthorized_rate = unauthorized_rate
+        self.token_ttl = token_ttl
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._tokens = {}
+        self._responses = Counter()
+        self.server = None
+
+    def issue_token(self):
+        """Return a new access token valid for token_ttl seconds."""
+
+        token = secrets.token_urlsafe(24)
+
+        with self._lock:
+            self._tokens[token] = time.monotonic() + self.token_ttl
+
+        return token
+
+    def token_valid(self, token):
+        """Was token issued here and has it not expired?"""
+
+        with self._lock:
+            return self._tokens.get(token, 0) > time.monotonic()
+
+    def fault(self):
+        """Pick the status to inject for one request: 500, 429, 401 or None."""
+
+        with self._lock:
+            roll = self._random.random()
+
+        for status, rate in ((500, self.error_rate), (429, self.rate_limited_rate), (401, self.unauthorized_rate)):
+            if roll < rate:
+                return status
+            roll -= rate
+
+        return None
+
+    def record(self, status):
+        """Count a response sent with status."""
+
+        with self._lock:
+            self._responses[status] += 1
+
+    def search(self, kind, params):
+        """Return one page of kind ("animals" or "organizations") matching params."""
+
+        if kind == "animals":
+            results = filter_animals(self.animals, params)
+        else:
+            results = filter_organizations(self.organizations, params)
+
+        try:
+            limit = min(max(int(params.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+            page = max(int(params.get("page", 1)), 1)
+        except ValueError:
+            limit, page = DEFAULT_LIMIT, 1
+
+        total_pages = math.ceil(len(results) / limit)
+        items = results[(page - 1) * limit:page * limit]
+
+        links = {}
+        if page > 1:
+            links["previous"] = {"href" : f"/v2/{kind}?{urlencode(dict(params, page=page - 1))}"}
+        if page < total_pages:
+            links["next"] = {"href" : f"/v2/{kind}?{urlencode(dict(params, page=page + 1))}"}
+
+        return {
+            kind : items,
+            "pagination" : {
+                "count_per_page" : limit,
+                "total_count" : len(results),
+                "current_page" : page,
+                "total_pages" : total_pages,
+                "_links" : links,
+            },
+        }
+
+    def lookup(self, kind, id):
+        """Return the animal or organization with id, or None."""
+
+        if kind == "animals":
+            return self._animals_by_id.get(id)
+
+        return self._organizations_by_id.get(id.lower())
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serve on host:port (port 0 picks a free one) from a background thread. Returns the base URL."""
+
+        self.server = ThreadingHTTPServer((host, port), StandInHandler)
+        self.server.daemon_threads = True
+        self.server.stand_in = self
+        threading.Thread(target=self.server.serve_forever, name="petfinder-stand-in", daemon=True).start()
+
+        return self.base_url
+
+    @property
+    def base_url(self):
+        """URL to use as the Petfinder client's base_url."""
+
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def shutdown(self):
+        """Stop serving."""
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def stats(self):
+        """Return how many responses were sent, by status."""
+
+        with self._lock:
+            return dict(self._responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--animals", type=int, default=1000)
+    parser.add_argument("--organizations", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0, help="seconds to wait before each answer")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with a 500")
+    parser.add_argument("--rate-limited-rate", type=float, default=0, help="share of requests answered with a 429")
+    parser.add_argument("--unauthorized-rate", type=float, default=0, help="share of requests answered with a 401")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="access token lifetime in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stand_in = PetfinderStandIn(
+        animals=args.animals,
+        organizations=args.organizations,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limited_rate=args.rate_limited_rate,
+        unauthorized_rate=args.unauthorized_rate,
+        token_ttl=args.token_ttl,
+        seed=args.seed,
+    )
+
+    print(f"Petfinder stand-in at {stand_in.start(args.host, args.port)} (set PETFINDER_BASE_URL to use it)")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stand_in.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""ApiUsage model tests."""
+
+from datetime import date
+from unittest import TestCase
+
+from models import db, ApiUsage
+from ratelimit import RateLimiter, utc_today
+
+from app import create_app
+
+app = create_app("test")
+
+with app.app_context():
+    db.drop_all()
+    db.create_all()
+
+class ApiUsageModelTestCase(TestCase):
+    """Test model for daily Petfinder API usage."""
+
+    def setUp(self):
+        """Create test client."""
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+
+        db.session.rollback()
+        ApiUsage.query.delete()
+
+        self.client = app.test_client()
+        app.testing=True
+
+    def tearDown(self):
+        """Clean up fouled transactions."""
+
+        db.session.rollback()
+        self.app_context.pop()
+
+    def test_record_accumulates(self):
+        """Does ApiUsage.record add to the day's count and return the running total?"""
+
+        day = date(2023, 3, 1)
+
+        self.assertEqual(ApiUsage.record(day, 5), 5)
+        self.assertEqual(ApiUsage.record(day, 3), 8)
+        self.assertEqual(ApiUsage.record(date(2023, 3, 2), 1), 1)
+        db.session.commit()
+
+        self.assertEqual(ApiUsage.query.get(day).calls, 8)
+
+    def test_flush_leaves_session_alone(self):
+        """Does flushing record the limiter's requests without committing the caller's pending changes?"""
+
+        limiter = RateLimiter(flush_interval=0)
+        limiter.count(3)
+
+        # e.g. a view's unfinished work
+        db.session.add(ApiUsage(day=date(2023, 3, 1), calls=99))
+        db.session.flush()
+
+        ApiUsage.flush(limiter)
+        db.session.rollback()
+
+        self.assertIsNone(ApiUsage.query.get(date(2023, 3, 1)))
+        self.assertEqual(ApiUsage.query.get(utc_today()).calls, 3)
+        self.assertEqual(limiter.stats()["used_today"], 3)
@@ -0,0 +1,67 @@
+"""App factory tests."""
+
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask_debugtoolbar import DebugToolbarExtension
+
+from app import create_app, reset_after_fork
+from config import Config, ProductionConfig
+
+
+class AppFactoryTestCase(TestCase):
+    """Test configuration profiles and per-process services."""
+
+    def setUp(self):
+        """Give every profile dummy Petfinder credentials, so secret.py is not needed."""
+
+        for name, value in (("PETFINDER_API_KEY", "TEST-KEY"), ("PETFINDER_SECRET", "TEST-SECRET")):
+            patcher = patch.object(Config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_production_profile_is_lean(self):
+        """Does production skip SQL echo and the toolbar and tune the engine pool?"""
+
+        with patch.dict(os.environ, {"PAWPRINT_ENV" : "production"}), \
+             patch.object(ProductionConfig, "SECRET_KEY", "TEST-SECRET-KEY"), \
+             patch("flask_debugtoolbar.DebugToolbarExtension") as toolbar:
+            app = create_app()
+
+        self.assertFalse(app.config['SQLALCHEMY_ECHO'])
+        self.assertTrue(app.config['SQLALCHEMY_ENGINE_OPTIONS']["pool_pre_ping"])
+        toolbar.assert_not_called()
+
+    def test_development_profile_installs_toolbar(self):
+        """Does development echo SQL and install the toolbar?"""
+
+        with patch("flask_debugtoolbar.DebugToolbarExtension", wraps=DebugToolbarExtension) as toolbar:
+            app = create_app("development")
+
+        self.assertTrue(app.config['SQLALCHEMY_ECHO'])
+        toolbar.assert_called_once_with(app)
+
+    def test_forked_worker_gets_own_services(self):
+        """Does a forked worker replace the Petfinder client and executor built before the fork?"""
+
+        app = create_app("test")
+        petfinder = app.extensions['petfinder']
+        executor = app.extensions['upstream_executor']
+
+        reset_after_fork(app)
+
+        self.assertIsNot(app.extensions['petfinder'], petfinder)
+        self.assertIsNot(app.extensions['upstream_executor'], executor)
+
+    def test_offline_profile_uses_stand_in(self):
+        """Does the offline profile point the Petfinder client at a local stand-in?"""
+
+        app = create_app("offline")
+        stand_in = app.extensions['petfinder_stand_in']
+
+        try:
+            self.assertEqual(app.extensions['petfinder'].base_url, stand_in.base_url)
+            self.assertEqual(app.extensions['petfinder'].get_animal(1)["id"], 1)
+        finally:
+            stand_in.shutdown()
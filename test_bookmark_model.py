@@ -1,17 +1,17 @@
 """User model tests."""
 
-import os
+from datetime import datetime, timedelta
 from unittest import TestCase
 
 from models import db, User, Organization, Pet, Bookmark, Follow
 
-#set environmental variable to be a test db
-os.environ['DATABASE_URL'] = "postgresql:///pawprint-test"
+from app import create_app
 
-from app import app
+app = create_app("test")
 
-db.drop_all()
-db.create_all()
+with app.app_context():
+    db.drop_all()
+    db.create_all()
 
 class BookmarkModelTestCase(TestCase):
     """Test model for bookmarks."""
@@ -19,17 +19,19 @@ class BookmarkModelTestCase(TestCase):
     def setUp(self):
         """Create test client."""
 
+        self.app_context = app.app_context()
+        self.app_context.push()
+
         db.session.rollback()
         User.query.delete()
         Bookmark.query.delete()
         Follow.query.delete()
+        Pet.query.delete()
+        Organization.query.delete()
 
         self.client = app.test_client()
         app.testing=True
 
-        self.app_context = app.app_context()
-        self.app_context.push()
-
     def tearDown(self):
         """Clean up fouled transactions."""
 
@@ -98,3 +100,67 @@ class BookmarkModelTestCase(TestCase):
         # the bookmark should have the correct IDs
         self.assertEqual(bookmark.user_id, user.id)
         self.assertEqual(bookmark.pet_id, pet.id)
+
+    def test_bookmark_keyset_pagination(self):
+        """Does Bookmark.page_for_user walk a user's bookmarks newest first in both directions?"""
+
+        user = User(
+            email="test@test.com",
+            username="testuser",
+            password="HASHED_PASSWORD",
+            first_name="Test"
+        )
+
+        organization = Organization(
+            id="TEST-0",
+            name="Test Organization",
+            email="test@organization.org",
+            city="Test City",
+            state="Test State",
+            postcode="TEST-CODE",
+            country="Test Country",
+            url="https://google.com"
+        )
+
+        db.session.add_all([user, organization])
+        db.session.commit()
+
+        # five pets bookmarked a minute apart, plus two bookmarked at the same moment
+        start = datetime(2023, 3, 1)
+
+        for i in range(7):
+            pet = Pet(
+                id=20000 + i,
+                name=f"Test Pet {i}",
+                type="Test",
+                species="Test",
+                breed="Beta",
+                age="Newborn",
+                gender="Unknown",
+                size="Small",
+                status="Unavailable",
+                organization_id="TEST-0"
+            )
+            db.session.add(pet)
+            db.session.flush()
+            db.session.add(Bookmark(user_id=user.id, pet_id=pet.id, created_at=start + timedelta(minutes=min(i, 5))))
+
+        db.session.commit()
+
+        first = Bookmark.page_for_user(user.id, per_page=3)
+        second = Bookmark.page_for_user(user.id, after=first.next_cursor, per_page=3)
+        third = Bookmark.page_for_user(user.id, after=second.next_cursor, per_page=3)
+
+        # newest first, ties broken by pet id
+        self.assertEqual([pet.id for pet in first.items], [20006, 20005, 20004])
+        self.assertEqual([pet.id for pet in second.items], [20003, 20002, 20001])
+        self.assertEqual([pet.id for pet in third.items], [20000])
+
+        self.assertIsNone(first.previous_cursor)
+        self.assertIsNone(third.next_cursor)
+
+        # stepping back from the third page lands on the second page again
+        back = Bookmark.page_for_user(user.id, before=third.previous_cursor, per_page=3)
+        self.assertEqual([pet.id for pet in back.items], [20003, 20002, 20001])
+        self.assertIsNotNone(back.previous_cursor)
+        self.assertIsNotNone(back.next_cursor)
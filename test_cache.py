@@ -0,0 +1,66 @@
+"""Cache tests."""
+
+import time
+from unittest import TestCase
+
+from cache import TTLCache
+
+
+class TTLCacheTestCase(TestCase):
+    """Test the TTL + LRU cache."""
+
+    def test_get_and_set(self):
+        """Are stored values returned and lookups counted?"""
+
+        cache = TTLCache()
+        cache.set("dogs", {"animals" : []})
+
+        self.assertEqual(cache.get("dogs"), {"animals" : []})
+        self.assertIsNone(cache.get("cats"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_entries_expire(self):
+        """Does an entry disappear once its TTL has passed?"""
+
+        cache = TTLCache(ttl=0.01)
+        cache.set("dogs", [1, 2, 3])
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get("dogs"))
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_lru_eviction_under_byte_budget(self):
+        """Is the least recently used entry evicted when the budget is exceeded?"""
+
+        # each value encodes to 10 bytes of JSON
+        cache = TTLCache(max_bytes=25)
+        cache.set("a", "12345678")
+        cache.set("b", "12345678")
+        cache.get("a")
+        cache.set("c", "12345678")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "12345678")
+        self.assertEqual(cache.get("c"), "12345678")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.stats()["bytes"], 25)
+
+    def test_oversized_value_not_stored(self):
+        """Is a value larger than the whole budget skipped?"""
+
+        cache = TTLCache(max_bytes=5)
+        cache.set("a", "far too large to fit")
+
+        self.assertEqual(len(cache), 0)
+
+    def test_pop(self):
+        """Does pop return a fresh value once and remove it?"""
+
+        cache = TTLCache()
+        cache.set("dogs", [1, 2, 3])
+
+        self.assertIn("dogs", cache)
+        self.assertEqual(cache.pop("dogs"), [1, 2, 3])
+        self.assertNotIn("dogs", cache)
+        self.assertIsNone(cache.pop("dogs"))
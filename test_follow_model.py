@@ -1,17 +1,16 @@
 """User model tests."""
 
-import os
 from unittest import TestCase
 
 from models import db, User, Organization, Bookmark, Follow
 
-#set environmental variable to be a test db
-os.environ['DATABASE_URL'] = "postgresql:///pawprint-test"
+from app import create_app
 
-from app import app
+app = create_app("test")
 
-db.drop_all()
-db.create_all()
+with app.app_context():
+    db.drop_all()
+    db.create_all()
 
 class FollowModelTestCase(TestCase):
     """Test model for bookmarks."""
@@ -19,6 +18,9 @@ class FollowModelTestCase(TestCase):
     def setUp(self):
         """Create test client."""
 
+        self.app_context = app.app_context()
+        self.app_context.push()
+
         db.session.rollback()
         User.query.delete()
         Bookmark.query.delete()
@@ -27,9 +29,6 @@ class FollowModelTestCase(TestCase):
         self.client = app.test_client()
         app.testing=True
 
-        self.app_context = app.app_context()
-        self.app_context.push()
-
     def tearDown(self):
         """Clean up fouled transactions."""
 
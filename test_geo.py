@@ -0,0 +1,47 @@
+"""Postcode centroid and distance tests."""
+
+from unittest import TestCase
+
+from geo import normalize_postcode, centroid, locate, bounding_box, distance_miles
+
+
+class GeoTestCase(TestCase):
+    """Test postcode lookups and distances."""
+
+    def test_locate(self):
+        """Are postcodes, ZIP+4 codes and "City, State" found, and unknown places not?"""
+
+        self.assertEqual(normalize_postcode(" 10001-1234 "), "10001")
+        self.assertEqual(locate("10001-1234"), centroid("10001"))
+        self.assertEqual(locate("Boston,MA"), locate("boston, ma"))
+        self.assertLess(distance_miles(*locate("Boston, MA"), *centroid("02108")), 5)
+        self.assertIsNotNone(locate("Dubuque, IA"))
+        self.assertIsNone(locate("Test City, Test State"))
+        self.assertIsNone(locate(None))
+
+    def test_distance_miles(self):
+        """Is the haversine distance close to the known distance between two cities?"""
+
+        new_york = centroid("10001")
+        los_angeles = centroid("90012")
+
+        self.assertEqual(distance_miles(*new_york, *new_york), 0)
+        # about 2,450 miles as the crow flies
+        self.assertAlmostEqual(distance_miles(*new_york, *los_angeles), 2450, delta=25)
+
+    def test_bounding_box(self):
+        """Does the bounding box hold every point within the radius?"""
+
+        new_york = centroid("10001")
+        min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(*new_york, 100)
+
+        for postcode in ("08608", "19103", "06902", "02108"):
+            latitude, longitude = centroid(postcode)
+            inside = min_latitude <= latitude <= max_latitude and min_longitude <= longitude <= max_longitude
+
+            if distance_miles(*new_york, latitude, longitude) <= 100:
+                self.assertTrue(inside, postcode)
+
+        # Boston is about 190 miles away
+        latitude, longitude = centroid("02108")
+        self.assertFalse(min_latitude <= latitude <= max_latitude and min_longitude <= longitude <= max_longitude)
@@ -0,0 +1,121 @@
+"""Petfinder ingestion tests."""
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from models import db, Organization, Pet, IngestCheckpoint, ApiUsage
+from petfinder import PetfinderClient, PetfinderError, PetfinderRateLimited
+from ratelimit import RateLimiter, utc_today
+from standin import PetfinderStandIn
+from ingest import ingest, stream_name
+
+from app import create_app
+
+app = create_app("test")
+
+with app.app_context():
+    db.drop_all()
+    db.create_all()
+
+stand_in = PetfinderStandIn(animals=3000, organizations=30)
+stand_in.start()
+
+
+def adoptable_in(state):
+    """The stand-in's adoptable animals in state."""
+
+    return [animal for animal in stand_in.animals if animal["status"] == "adoptable" and animal["contact"]["address"]["state"] == state]
+
+
+class IngestTestCase(TestCase):
+    """Test mirroring Petfinder listings from the stand-in."""
+
+    def setUp(self):
+        """Empty the mirrored tables and make a client without caches or retries."""
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+
+        db.session.rollback()
+        Pet.query.delete()
+        Organization.query.delete()
+        IngestCheckpoint.query.delete()
+        ApiUsage.query.delete()
+        db.session.commit()
+
+        self.petfinder = PetfinderClient("TEST-KEY", "TEST-SECRET", base_url=stand_in.base_url, max_retries=0)
+
+    def tearDown(self):
+        """Clean up fouled transactions."""
+
+        db.session.rollback()
+        self.app_context.pop()
+
+    def test_ingest_region(self):
+        """Are every adoptable animal in the region and its organization stored?"""
+
+        expected = adoptable_in("NY")
+
+        result = ingest(self.petfinder, "animals", "NY")
+
+        self.assertEqual(result["rows"], len(expected))
+        self.assertEqual(result["pages"], -(-len(expected) // 100))
+        self.assertEqual(Pet.query.count(), len(expected))
+        self.assertEqual(Organization.query.count(), len({animal["organization_id"] for animal in expected}))
+        self.assertEqual(IngestCheckpoint.last_page(stream_name("animals", "NY")), 0)
+
+    def test_interrupted_run_resumes(self):
+        """Does a run that fails part way resume after the last stored page?"""
+
+        get = self.petfinder.get
+        calls = []
+
+        def failing_get(path, params=None):
+            calls.append(path)
+            if path == "/animals" and len([call for call in calls if call == "/animals"]) == 3:
+                raise PetfinderError("Petfinder returned 500 for /animals", 500)
+            return get(path, params)
+
+        with patch.object(self.petfinder, "get", failing_get):
+            self.assertRaises(PetfinderError, ingest, self.petfinder, "animals", "NY")
+
+        self.assertEqual(IngestCheckpoint.last_page(stream_name("animals", "NY")), 2)
+
+        result = ingest(self.petfinder, "animals", "NY")
+
+        self.assertEqual(result["start_page"], 3)
+        self.assertEqual(Pet.query.count(), len(adoptable_in("NY")))
+
+    def test_rerun_updates_rows(self):
+        """Does a later run update rows that changed upstream?"""
+
+        ingest(self.petfinder, "organizations", "NY")
+        organization = stand_in.organizations[[organization["address"]["state"] for organization in stand_in.organizations].index("NY")]
+        original = organization["name"]
+
+        organization["name"] = "Renamed Rescue"
+        try:
+            ingest(self.petfinder, "organizations", "NY")
+        finally:
+            organization["name"] = original
+
+        self.assertEqual(Organization.query.get(organization["id"]).name, "Renamed Rescue")
+
+    def test_shares_daily_quota(self):
+        """Does a run start from the day's shared usage, record its own requests and stop at the quota?"""
+
+        ApiUsage.record(utc_today(), 50)
+        db.session.commit()
+        self.petfinder.rate_limiter = RateLimiter(daily_quota=1000)
+
+        ingest(self.petfinder, "organizations", "NY")
+
+        # a token request and one page
+        self.assertEqual(ApiUsage.query.get(utc_today()).calls, 52)
+        self.assertEqual(self.petfinder.rate_limiter.stats()["used_today"], 52)
+
+        # web workers have since used up the background share of the quota
+        ApiUsage.record(utc_today(), 900)
+        db.session.commit()
+
+        self.assertRaises(PetfinderRateLimited, ingest, self.petfinder, "organizations", "NY", restart=True)
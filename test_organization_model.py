@@ -1,18 +1,18 @@
 """Organization model tests."""
 
-import os
 from unittest import TestCase
 
 from models import db, Organization
 from sqlalchemy.exc import IntegrityError
 
-#set environmental variable to be a test db
-os.environ['DATABASE_URL'] = "postgresql:///pawprint-test"
+from app import create_app
+from geo import centroid, distance_miles
 
-from app import app
+app = create_app("test")
 
-db.drop_all()
-db.create_all()
+with app.app_context():
+    db.drop_all()
+    db.create_all()
 
 class OrganizationModelTestCase(TestCase):
     """Test model for organizations."""
@@ -20,15 +20,15 @@ class OrganizationModelTestCase(TestCase):
     def setUp(self):
         """Create test client."""
 
+        self.app_context = app.app_context()
+        self.app_context.push()
+
         db.session.rollback()
         Organization.query.delete()
 
         self.client = app.test_client()
         app.testing=True
 
-        self.app_context = app.app_context()
-        self.app_context.push()
-
     def tearDown(self):
         """Clean up fouled transactions."""
 
@@ -104,3 +104,29 @@ class OrganizationModelTestCase(TestCase):
         # attempting to commit bad_organization should raise an IntegrityError exception
         db.session.add(bad_organization)
         self.assertRaises(IntegrityError, db.session.commit)
+
+    def test_organization_distance(self):
+        """
+        Are organizations located by postcode, and does Organization.within
+        find only those in range, nearest first?
+        """
+
+        places = {"NYC" : "10001", "NWK" : "07102", "PHL" : "19103", "BOS" : "02108", "NOWHERE" : "TEST-CODE"}
+
+        for id, postcode in places.items():
+            db.session.add(Organization.create({
+                "id" : id,
+                "name" : f"Test Organization {id}",
+                "email" : "test@organization.org",
+                "address" : {"city" : "Test City", "state" : "Test State", "postcode" : postcode, "country" : "US"},
+                "url" : "https://google.com",
+            }))
+        db.session.commit()
+
+        self.assertIsNone(Organization.query.get("NOWHERE").latitude)
+
+        nearby = Organization.within(*centroid("10003"), 100)
+
+        self.assertEqual([organization.id for organization, _ in nearby], ["NYC", "NWK", "PHL"])
+        self.assertAlmostEqual(nearby[0][1], distance_miles(*centroid("10003"), *centroid("10001")), places=3)
+        self.assertEqual(len(Organization.within(*centroid("10003"), 100, limit=1)), 1)
@@ -0,0 +1,66 @@
+"""Password hasher tests."""
+
+from unittest import TestCase
+
+from passwords import PasswordHasher, PasswordHasherBusy, hash_rounds
+
+
+class PasswordHasherTestCase(TestCase):
+    """Test bcrypt hashing, cost changes and back-pressure."""
+
+    def setUp(self):
+        """Create an inline hasher at the cheapest cost."""
+
+        self.hasher = PasswordHasher(rounds=4, workers=0, max_pending=1, queue_timeout=0.01)
+
+    def test_hash_and_check(self):
+        """Does a hash match its own password and no other?"""
+
+        hashed = self.hasher.hash("password")
+
+        self.assertEqual(hash_rounds(hashed), 4)
+        self.assertTrue(self.hasher.check(hashed, "password"))
+        self.assertFalse(self.hasher.check(hashed, "passw0rd"))
+        self.assertFalse(self.hasher.check("NOT_A_HASH", "password"))
+
+    def test_needs_rehash(self):
+        """Is a hash made at another cost flagged for rehashing?"""
+
+        hashed = self.hasher.hash("password")
+        self.assertFalse(self.hasher.needs_rehash(hashed))
+
+        self.hasher.rounds = 5
+        self.assertTrue(self.hasher.needs_rehash(hashed))
+        self.assertTrue(self.hasher.needs_rehash("NOT_A_HASH"))
+
+    def test_check_unknown(self):
+        """Does checking an unknown user still run a bcrypt check, and fail?"""
+
+        self.assertFalse(self.hasher.check_unknown("password"))
+        self.assertFalse(self.hasher.check_unknown("password"))
+
+        # one hash for the dummy, then one check per call
+        self.assertEqual(self.hasher.stats()["completed"], 3)
+
+    def test_busy(self):
+        """Is a caller turned away when every slot stays taken past the queue timeout?"""
+
+        self.hasher._slots.acquire()
+
+        try:
+            self.assertRaises(PasswordHasherBusy, self.hasher.hash, "password")
+        finally:
+            self.hasher._slots.release()
+
+        self.assertEqual(self.hasher.stats()["rejected"], 1)
+        self.assertTrue(self.hasher.check(self.hasher.hash("password"), "password"))
+
+    def test_process_pool(self):
+        """Do hashes made in worker processes check out?"""
+
+        hasher = PasswordHasher(rounds=4, workers=1)
+
+        try:
+            self.assertTrue(hasher.check(hasher.hash("password"), "password"))
+        finally:
+            hasher.shutdown()
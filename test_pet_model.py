@@ -1,18 +1,17 @@
 """Pet model tests."""
 
-import os
 from unittest import TestCase
 
 from models import db, Pet, Organization
 from sqlalchemy.exc import IntegrityError
 
-#set environmental variable to be a test db
-os.environ['DATABASE_URL'] = "postgresql:///pawprint-test"
+from app import create_app
 
-from app import app
+app = create_app("test")
 
-db.drop_all()
-db.create_all()
+with app.app_context():
+    db.drop_all()
+    db.create_all()
 
 class PetModelTestCase(TestCase):
     """Test model for pets."""
@@ -20,15 +19,15 @@ class PetModelTestCase(TestCase):
     def setUp(self):
         """Create test client."""
 
+        self.app_context = app.app_context()
+        self.app_context.push()
+
         db.session.rollback()
         Pet.query.delete()
 
         self.client = app.test_client()
         app.testing=True
 
-        self.app_context = app.app_context()
-        self.app_context.push()
-
     def tearDown(self):
         """Clean up fouled transactions."""
 
@@ -0,0 +1,426 @@
+"""Petfinder API access tests."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import patch, Mock
+
+from cache import TTLCache
+from petfinder import TokenManager, PetfinderClient, AsyncPetfinderClient, PetfinderError, PetfinderRateLimited, canonicalize_search_params
+from prefetch import Prefetcher
+from ratelimit import RateLimiter
+from resilience import CircuitBreaker
+
+
+def make_response(status_code=200, json=None):
+    """Build a stand-in for a requests.Response."""
+
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = json or {}
+    return response
+
+
+class CanonicalizeSearchParamsTestCase(TestCase):
+    """Test normalization of search parameters."""
+
+    def test_equivalent_searches_match(self):
+        """Do searches that mean the same thing canonicalize identically?"""
+
+        first = canonicalize_search_params({"type" : "Dog", "size" : "large, small", "name" : "", "location" : "10001"})
+        second = canonicalize_search_params({"location" : " 10001 ", "size" : "SMALL,large", "type" : "dog", "page" : 1})
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, {"location" : "10001", "page" : "1", "size" : "large,small", "type" : "dog"})
+
+    def test_location_not_sorted(self):
+        """Is a "City, State" location left in order?"""
+
+        params = canonicalize_search_params({"location" : "New York, NY", "page" : 2})
+
+        self.assertEqual(params["location"], "new york, ny")
+        self.assertEqual(params["page"], "2")
+
+
+class TokenManagerTestCase(TestCase):
+    """Test the shared Petfinder access token manager."""
+
+    def setUp(self):
+        """Create a token manager with dummy credentials."""
+
+        self.post = Mock()
+        self.token_manager = TokenManager("TEST-KEY", "TEST-SECRET", post=self.post)
+
+    def test_token_reused_until_expiry(self):
+        """Is one token shared until it is about to expire?"""
+
+        self.post.return_value = make_response(json={"access_token" : "TOKEN-1", "expires_in" : 3600})
+
+        self.assertEqual(self.token_manager.get_token(), "TOKEN-1")
+        self.assertEqual(self.token_manager.get_token(), "TOKEN-1")
+        self.assertEqual(self.post.call_count, 1)
+
+        # a token inside the refresh margin should be replaced
+        self.token_manager._expires_at = time.monotonic() + 30
+        self.post.return_value = make_response(json={"access_token" : "TOKEN-2", "expires_in" : 3600})
+
+        self.assertEqual(self.token_manager.get_token(), "TOKEN-2")
+        self.assertEqual(self.post.call_count, 2)
+
+    def test_concurrent_refreshes_collapse(self):
+        """Do concurrent callers share a single token request?"""
+
+        def slow_post(*args, **kwargs):
+            time.sleep(0.05)
+            return make_response(json={"access_token" : "TOKEN-1", "expires_in" : 3600})
+
+        self.post.side_effect = slow_post
+
+        threads = [threading.Thread(target=self.token_manager.get_token) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.post.call_count, 1)
+
+
+class PetfinderClientTestCase(TestCase):
+    """Test the pooled Petfinder API client."""
+
+    def setUp(self):
+        """Create a client whose sessions are replaced by a mock."""
+
+        self.client = PetfinderClient("TEST-KEY", "TEST-SECRET", base_url="https://petfinder.test/v2")
+        self.session = Mock()
+
+        patcher = patch.object(self.client, "_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_once_on_401(self):
+        """Is a request retried once with a new token after a 401?"""
+
+        responses = {
+            "POST" : iter([
+                make_response(json={"access_token" : "OLD-TOKEN", "expires_in" : 3600}),
+                make_response(json={"access_token" : "NEW-TOKEN", "expires_in" : 3600}),
+            ]),
+            "GET" : iter([
+                make_response(status_code=401),
+                make_response(json={"animal" : {"id" : 11037}}),
+            ]),
+        }
+        self.session.request.side_effect = lambda method, url, **kwargs: next(responses[method])
+
+        animal = self.client.get_animal(11037)
+
+        self.assertEqual(animal, {"id" : 11037})
+        self.assertEqual(self.session.request.call_count, 4)
+        self.assertEqual(self.session.request.call_args.kwargs["headers"]["Authorization"], "Bearer NEW-TOKEN")
+
+    def test_error_status_raises(self):
+        """Does a non-200 response raise PetfinderError and get counted?"""
+
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.session.request.return_value = make_response(status_code=404)
+
+        with self.assertRaises(PetfinderError) as context:
+            self.client.get_organization("TEST-0")
+
+        self.assertEqual(context.exception.status_code, 404)
+        self.assertEqual(self.client.stats()["errors"], 1)
+
+    def test_search_cache(self):
+        """Are equivalent searches answered from the search cache?"""
+
+        self.client.search_cache = TTLCache()
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.session.request.return_value = make_response(json={"animals" : [], "pagination" : {}})
+
+        self.client.search_animals({"type" : "dog", "location" : "10001"})
+        self.client.search_animals({"type" : "Dog", "location" : "10001", "name" : "", "page" : 1})
+
+        self.assertEqual(self.session.request.call_count, 1)
+        self.assertEqual(self.client.search_cache.stats()["hits"], 1)
+
+    def test_open_breaker_fails_fast(self):
+        """Are calls refused without touching the network while the breaker is open?"""
+
+        self.client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.session.request.return_value = make_response(status_code=503)
+
+        with self.assertRaises(PetfinderError):
+            self.client.get_animal(11037)
+        with self.assertRaises(PetfinderError):
+            self.client.get_animal(11037)
+
+        self.assertEqual(self.session.request.call_count, 1)
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_non_json_response_releases_probe(self):
+        """Does a 200 that is not JSON count as a failed half-open probe, instead of leaving the probe in flight?"""
+
+        self.client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.client.breaker.record(0.1, failed=True)
+        time.sleep(0.02)
+
+        html = make_response()
+        html.json.side_effect = ValueError("Expecting value")
+        self.session.request.return_value = html
+
+        with self.assertRaises(PetfinderError) as context:
+            self.client.get_animal(11037)
+
+        self.assertTrue(context.exception.is_outage)
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.02)
+        self.session.request.return_value = make_response(json={"animal" : {"id" : 11037}})
+
+        self.assertEqual(self.client.get_animal(11037), {"id" : 11037})
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_refused_calls_use_no_quota(self):
+        """Are calls the open breaker refuses left out of the daily quota?"""
+
+        self.client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        self.client.rate_limiter = RateLimiter(daily_quota=100)
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.session.request.return_value = make_response(status_code=503)
+
+        for _ in range(5):
+            with self.assertRaises(PetfinderError):
+                self.client.get_animal(11037)
+
+        self.assertEqual(self.session.request.call_count, 1)
+        self.assertEqual(self.client.rate_limiter.stats()["used_today"], 1)
+
+    def test_stale_entry_served_during_outage(self):
+        """Is the last good payload served when Petfinder fails?"""
+
+        self.client.detail_cache = TTLCache(ttl=0.01, stale_ttl=60)
+        self.client.stale_while_revalidate = False
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+
+        self.session.request.return_value = make_response(json={"animal" : {"id" : 11037}})
+        self.client.get_animal(11037)
+        time.sleep(0.02)
+
+        self.session.request.return_value = make_response(status_code=500)
+        self.assertEqual(self.client.get_animal(11037), {"id" : 11037})
+
+    def test_stale_while_revalidate(self):
+        """Is a stale entry returned at once and refreshed in the background?"""
+
+        self.client.detail_cache = TTLCache(ttl=0.01, stale_ttl=60)
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+
+        self.session.request.return_value = make_response(json={"animal" : {"id" : 11037, "status" : "adoptable"}})
+        self.client.get_animal(11037)
+        time.sleep(0.02)
+
+        self.session.request.return_value = make_response(json={"animal" : {"id" : 11037, "status" : "adopted"}})
+        self.assertEqual(self.client.get_animal(11037)["status"], "adoptable")
+
+        self.client._revalidator.shutdown(wait=True)
+        self.assertEqual(self.client.get_animal(11037)["status"], "adopted")
+
+    def test_rate_limit_modes(self):
+        """Does an exhausted budget serve cached data in "cache" mode and raise in "fail" mode?"""
+
+        self.client.detail_cache = TTLCache(ttl=0.01, stale_ttl=60)
+        self.client.stale_while_revalidate = False
+        self.client.rate_limiter = RateLimiter(rate=0.001, burst=1, daily_quota=100)
+        self.client.rate_limit_mode = "cache"
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.session.request.return_value = make_response(json={"animal" : {"id" : 11037}})
+
+        self.client.get_animal(11037)
+        time.sleep(0.02)
+
+        self.assertEqual(self.client.get_animal(11037), {"id" : 11037})
+        self.assertEqual(self.session.request.call_count, 1)
+
+        self.client.rate_limit_mode = "fail"
+
+        with self.assertRaises(PetfinderRateLimited):
+            self.client.get_animal(11037)
+
+    def test_concurrent_detail_requests_coalesce(self):
+        """Do concurrent requests for one animal share a single upstream call?"""
+
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+
+        def slow_request(method, url, **kwargs):
+            time.sleep(0.05)
+            return make_response(json={"animal" : {"id" : 11037}})
+
+        self.session.request.side_effect = slow_request
+
+        threads = [threading.Thread(target=self.client.get_animal, args=(11037,)) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.session.request.call_count, 1)
+        self.assertEqual(self.client.inflight.stats()["saved"], 9)
+
+    def test_search_results_reused_for_details(self):
+        """Is an animal seen in search results returned without another upstream call?"""
+
+        self.client.recent_payloads = TTLCache()
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.session.request.return_value = make_response(json={
+            "animals" : [{"id" : 11037, "name" : "Fred"}, {"id" : 11038, "name" : "Spark"}],
+            "pagination" : {},
+        })
+
+        self.client.search_animals({"type" : "dog"})
+
+        self.assertEqual(self.client.get_animal(11038), {"id" : 11038, "name" : "Spark"})
+        self.assertEqual(self.session.request.call_count, 1)
+
+        # an animal that was not in the results is still fetched
+        self.session.request.return_value = make_response(json={"animal" : {"id" : 11039}})
+        self.client.get_animal(11039)
+        self.assertEqual(self.session.request.call_count, 2)
+
+    def test_sessions_share_one_pool(self):
+        """Do sessions on different threads share the same adapter?"""
+
+        client = PetfinderClient("TEST-KEY", "TEST-SECRET")
+        sessions = []
+
+        thread = threading.Thread(target=lambda: sessions.append(client._session()))
+        thread.start()
+        thread.join()
+        sessions.append(client._session())
+
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertIs(sessions[0].get_adapter("https://api.petfinder.com"), sessions[1].get_adapter("https://api.petfinder.com"))
+
+    def test_next_page_prefetched(self):
+        """Is the next search page fetched in the background and then served without an upstream call?"""
+
+        self.client.prefetcher = Prefetcher(TTLCache())
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+        self.session.request.return_value = make_response(json={"animals" : [], "pagination" : {"current_page" : 1, "total_pages" : 3}})
+
+        json = self.client.search_animals({"type" : "dog"})
+        self.assertTrue(self.client.prefetch_animals({"type" : "dog"}, json["pagination"], "user-1"))
+        self.client.prefetcher._executor.shutdown(wait=True)
+
+        self.assertEqual(self.session.request.call_args.kwargs["params"]["page"], "2")
+
+        self.client.search_animals({"type" : "Dog", "page" : "2"})
+
+        self.assertEqual(self.session.request.call_count, 2)
+        self.assertEqual(self.client.prefetcher.stats()["hits"], 1)
+
+        # nothing to prefetch after the last page
+        self.assertFalse(self.client.prefetch_animals({"type" : "dog"}, {"current_page" : 3, "total_pages" : 3}, "user-1"))
+
+    def test_display_pages_sliced_from_upstream_window(self):
+        """Are display pages cut from 100-result upstream pages, fetched concurrently when straddled?"""
+
+        self.client.page_size = 30
+        self.client.search_cache = TTLCache()
+        self.client.token_manager._access_token = "TOKEN"
+        self.client.token_manager._expires_at = time.monotonic() + 3600
+
+        def upstream_page(method, url, params=None, **kwargs):
+            page = int(params["page"])
+            animals = [{"id" : id} for id in range((page - 1) * 100, min(page * 100, 250))]
+            return make_response(json={"animals" : animals, "pagination" : {"total_count" : 250, "current_page" : page}})
+
+        self.session.request.side_effect = upstream_page
+
+        json = self.client.search_animals({"type" : "dog", "page" : 2})
+
+        self.assertEqual([animal["id"] for animal in json["animals"]], list(range(30, 60)))
+        self.assertEqual(json["pagination"]["total_pages"], 9)
+        self.assertEqual(self.session.request.call_args.kwargs["params"]["limit"], "100")
+
+        # page 4 (results 90-119) straddles upstream pages 1 and 2, both now cached
+        json = self.client.search_animals({"type" : "dog", "page" : 4})
+
+        self.assertEqual([animal["id"] for animal in json["animals"]], list(range(90, 120)))
+        self.assertEqual(self.session.request.call_count, 2)
+
+        json = self.client.search_animals({"type" : "dog", "page" : 9})
+
+        self.assertEqual([animal["id"] for animal in json["animals"]], list(range(240, 250)))
+        self.assertNotIn("next", json["pagination"]["_links"])
+
+
+class AsyncPetfinderClientTestCase(TestCase):
+    """Test the asyncio interface to the Petfinder client."""
+
+    def setUp(self):
+        """Wrap a stand-in sync client whose lookups block for a while."""
+
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.client = Mock()
+        self.async_client = AsyncPetfinderClient(self.client, self.executor)
+
+    def tearDown(self):
+        """Stop the executor."""
+
+        self.executor.shutdown()
+
+    def test_calls_overlap(self):
+        """Do gathered calls run side by side on the executor rather than one after another?"""
+
+        running = []
+        overlapped = threading.Event()
+
+        def slow_lookup(id):
+            running.append(id)
+            if len(running) == 2:
+                overlapped.set()
+            overlapped.wait(timeout=1)
+            time.sleep(0.2)
+            return {"id" : id}
+
+        self.client.get_animal.side_effect = slow_lookup
+        self.client.get_organization.side_effect = slow_lookup
+
+        async def both():
+            return await asyncio.gather(self.async_client.get_animal(1), self.async_client.get_organization("NJ333"))
+
+        start = time.monotonic()
+        animal, organization = asyncio.run(both())
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(animal, {"id" : 1})
+        self.assertEqual(organization, {"id" : "NJ333"})
+        self.assertTrue(overlapped.is_set())
+        self.assertLess(elapsed, 0.35)
+
+    def test_errors_reach_caller(self):
+        """Are the sync client's errors raised unchanged to the awaiting caller?"""
+
+        for error in (PetfinderError("Not Found", 404), PetfinderRateLimited("Budget used up", serve_stale=False), ValueError("bad id")):
+            self.client.get_animal.side_effect = error
+
+            with self.assertRaises(type(error)) as raised:
+                asyncio.run(self.async_client.get_animal(1))
+
+            self.assertIs(raised.exception, error)
@@ -0,0 +1,45 @@
+"""Prefetcher tests."""
+
+import threading
+from unittest import TestCase
+
+from cache import TTLCache
+from prefetch import Prefetcher
+
+
+class PrefetcherTestCase(TestCase):
+    """Test speculative background fetching."""
+
+    def test_prefetched_value_taken_once(self):
+        """Is a prefetched result handed out once and counted as a hit?"""
+
+        prefetcher = Prefetcher(TTLCache())
+
+        self.assertTrue(prefetcher.schedule("page-2", "user-1", lambda: {"page" : 2}))
+        prefetcher._executor.shutdown(wait=True)
+
+        self.assertEqual(prefetcher.take("page-2"), {"page" : 2})
+        self.assertIsNone(prefetcher.take("page-2"))
+        self.assertEqual(prefetcher.stats()["hits"], 1)
+        self.assertEqual(prefetcher.stats()["hit_rate"], 1)
+
+    def test_caps_drop_extra_prefetches(self):
+        """Are prefetches over the per-owner or global cap dropped?"""
+
+        prefetcher = Prefetcher(TTLCache(), max_in_flight=2, per_owner=1)
+        release = threading.Event()
+
+        def blocked():
+            release.wait()
+            return {}
+
+        self.assertTrue(prefetcher.schedule("a-2", "user-1", blocked))
+        self.assertFalse(prefetcher.schedule("a-3", "user-1", blocked))
+        self.assertTrue(prefetcher.schedule("b-2", "user-2", blocked))
+        self.assertFalse(prefetcher.schedule("c-2", "user-3", blocked))
+
+        release.set()
+        prefetcher._executor.shutdown(wait=True)
+
+        self.assertEqual(prefetcher.stats()["skipped"], 2)
+        self.assertEqual(prefetcher.stats()["fetched"], 2)
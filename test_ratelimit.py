@@ -0,0 +1,78 @@
+"""Rate limiter tests."""
+
+import time
+from unittest import TestCase
+
+from ratelimit import RateLimiter, INTERACTIVE, BACKGROUND
+
+
+class RateLimiterTestCase(TestCase):
+    """Test the token bucket and daily quota."""
+
+    def test_burst_then_refuse(self):
+        """Are calls refused once the bucket is empty?"""
+
+        limiter = RateLimiter(rate=1, burst=3, daily_quota=100)
+
+        self.assertTrue(all(limiter.acquire() for _ in range(3)))
+        self.assertFalse(limiter.acquire())
+        self.assertEqual(limiter.stats()["refused"][INTERACTIVE], 1)
+
+    def test_queue_waits_for_refill(self):
+        """Does a caller with a timeout wait for the bucket to refill?"""
+
+        limiter = RateLimiter(rate=100, burst=1, daily_quota=100)
+        limiter.acquire()
+
+        start = time.monotonic()
+        self.assertTrue(limiter.acquire(timeout=1))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_background_reserve(self):
+        """Is background work kept out of the share reserved for page views?"""
+
+        limiter = RateLimiter(rate=0.001, burst=10, daily_quota=1000, background_reserve=0.5)
+
+        granted = sum(limiter.acquire(BACKGROUND) for _ in range(10))
+
+        self.assertEqual(granted, 5)
+        self.assertTrue(limiter.acquire(INTERACTIVE))
+
+    def test_daily_quota(self):
+        """Are calls refused, without waiting, once the daily quota is used by the requests counted?"""
+
+        limiter = RateLimiter(rate=1000, burst=1000, daily_quota=2)
+        limiter.acquire()
+        # e.g. a token request and the call itself
+        limiter.count(2)
+
+        start = time.monotonic()
+        self.assertFalse(limiter.acquire(timeout=1))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(limiter.stats()["remaining_today"], 0)
+
+    def test_flush_and_sync(self):
+        """Are unflushed calls handed over once and other workers' calls adopted?"""
+
+        limiter = RateLimiter(flush_interval=0)
+        limiter.count()
+        limiter.count()
+
+        day, calls = limiter.take_unflushed()
+        self.assertEqual(calls, 2)
+        self.assertEqual(limiter.take_unflushed(), (day, 0))
+
+        # another worker has made 40 calls today
+        limiter.sync(day, 42)
+        self.assertEqual(limiter.stats()["used_today"], 42)
+
+    def test_admitting_does_not_count(self):
+        """Does admitting a call leave the quota alone until its requests are counted?"""
+
+        limiter = RateLimiter(daily_quota=10)
+
+        self.assertTrue(limiter.acquire())
+        self.assertEqual(limiter.stats()["used_today"], 0)
+
+        limiter.count(3)
+        self.assertEqual(limiter.stats()["used_today"], 3)
@@ -0,0 +1,141 @@
+"""Stored pet and organization refresh tests."""
+
+from datetime import datetime
+from unittest import TestCase
+
+from models import db, Organization, Pet, ApiUsage
+from petfinder import PetfinderClient
+from ratelimit import RateLimiter, utc_today
+from resilience import CircuitBreaker
+from standin import PetfinderStandIn
+from refresh import refresh, UNLISTED_STATUS
+
+from app import create_app
+
+app = create_app("test")
+
+with app.app_context():
+    db.drop_all()
+    db.create_all()
+
+class RefreshTestCase(TestCase):
+    """Test re-syncing stored rows from the stand-in."""
+
+    def setUp(self):
+        """Store a few of the stand-in's pets and their organizations."""
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+
+        db.session.rollback()
+        Pet.query.delete()
+        Organization.query.delete()
+        ApiUsage.query.delete()
+
+        self.stand_in = PetfinderStandIn(animals=20, organizations=5)
+        self.petfinder = PetfinderClient("TEST-KEY", "TEST-SECRET", base_url=self.stand_in.start(), max_retries=0)
+
+        Organization.upsert_many(self.stand_in.organizations)
+        Pet.upsert_many(self.stand_in.animals[:10])
+        db.session.commit()
+
+    def tearDown(self):
+        """Stop the stand-in and clean up fouled transactions."""
+
+        self.stand_in.shutdown()
+        db.session.rollback()
+        self.app_context.pop()
+
+    def test_refresh_updates_changed_rows(self):
+        """Are changed and unlisted pets updated, and every row marked synced?"""
+
+        self.stand_in.animals[0]["status"] = "adopted"
+        self.stand_in._animals_by_id.pop("2")
+
+        result = refresh(self.petfinder, "animals", max_age=0, batch_size=4, workers=2)
+
+        self.assertEqual(result["checked"], 10)
+        self.assertEqual(result["updated"], 2)
+        self.assertEqual(result["unlisted"], 1)
+        self.assertEqual(result["upstream_calls"], 11) # one token request, one lookup per pet
+        self.assertEqual(Pet.query.get(1).status, "adopted")
+        self.assertEqual(Pet.query.get(2).status, UNLISTED_STATUS)
+
+        # everything was just synced, so nothing is stale yet
+        self.assertEqual(refresh(self.petfinder, "animals", max_age=3600)["checked"], 0)
+
+    def test_refresh_stalest_first(self):
+        """Does a limited run check the least recently synced rows?"""
+
+        db.session.execute(db.update(Organization).where(Organization.id == self.stand_in.organizations[3]["id"])
+                           .values(synced_at=datetime(2000, 1, 1)))
+        db.session.commit()
+
+        result = refresh(self.petfinder, "organizations", max_age=0, limit=1)
+
+        self.assertEqual(result["checked"], 1)
+        self.assertGreater(Organization.query.get(self.stand_in.organizations[3]["id"]).synced_at.year, 2000)
+
+    def test_failed_lookups_left_for_later(self):
+        """Are rows whose lookup failed counted and left stale?"""
+
+        self.stand_in.error_rate = 1
+
+        result = refresh(self.petfinder, "organizations", max_age=0)
+
+        self.assertEqual(result["failed"], 5)
+        self.assertEqual(result["checked"], 0)
+
+    def test_shares_daily_quota(self):
+        """Does a run start from the day's shared usage, record its own requests and stop at the quota?"""
+
+        ApiUsage.record(utc_today(), 70)
+        db.session.commit()
+        # background lookups may not use the last 20 of these
+        self.petfinder.rate_limiter = RateLimiter(daily_quota=100)
+
+        result = refresh(self.petfinder, "animals", max_age=0, batch_size=4, workers=1)
+
+        self.assertLess(result["checked"], 10)
+        self.assertGreater(result["failed"], 0)
+        self.assertEqual(ApiUsage.query.get(utc_today()).calls, 70 + result["upstream_calls"])
+
+    def test_moved_pets_store_new_organization(self):
+        """Is a pet's new organization stored before the pet, and a pet whose new organization is gone left for later?"""
+
+        moved_to = dict(self.stand_in.organizations[0], id="NEW1", name="New Organization")
+        self.stand_in.organizations.append(moved_to)
+        self.stand_in._organizations_by_id["new1"] = moved_to
+        self.stand_in.animals[0]["organization_id"] = "NEW1"
+        self.stand_in.animals[1]["organization_id"] = "GONE1"
+
+        result = refresh(self.petfinder, "animals", max_age=0, batch_size=4, workers=2)
+
+        self.assertEqual(result["checked"], 9)
+        self.assertEqual(result["failed"], 1)
+        self.assertEqual(Organization.query.get("NEW1").name, "New Organization")
+        self.assertEqual(Pet.query.get(1).organization_id, "NEW1")
+        self.assertNotEqual(Pet.query.get(2).organization_id, "GONE1")
+
+    def test_response_without_object_fails(self):
+        """Is a lookup whose response lacks the animal counted as failed?"""
+
+        get = self.petfinder.get
+        self.petfinder.get = lambda path, params=None: {} if path == "/animals/3" else get(path, params)
+
+        result = refresh(self.petfinder, "animals", max_age=0, batch_size=4, workers=2)
+
+        self.assertEqual(result["checked"], 9)
+        self.assertEqual(result["failed"], 1)
+
+    def test_stops_while_circuit_open(self):
+        """Does a run stop after the first batch once the circuit breaker refuses its lookups?"""
+
+        self.petfinder.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        self.petfinder.breaker.record(0.1, failed=True)
+
+        result = refresh(self.petfinder, "animals", max_age=0, batch_size=4, workers=2)
+
+        self.assertEqual(result["checked"], 0)
+        self.assertEqual(result["failed"], 4)
+        self.assertEqual(result["upstream_calls"], 0)
@@ -0,0 +1,144 @@
+"""Resilience helper tests."""
+
+import threading
+import time
+from unittest import TestCase
+
+from resilience import CircuitBreaker, SingleFlight
+
+
+class CircuitBreakerTestCase(TestCase):
+    """Test the circuit breaker state machine."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Does the breaker open after failure_threshold failures and refuse calls?"""
+
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record(0.1, failed=True)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()["rejected"], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        """Do calls slower than slow_call_seconds open the breaker?"""
+
+        breaker = CircuitBreaker(failure_threshold=2, slow_call_seconds=1)
+        breaker.record(2, failed=False)
+        breaker.record(2, failed=False)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_success_resets_failures(self):
+        """Does a success in between keep the breaker closed?"""
+
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record(0.1, failed=True)
+        breaker.record(0.1, failed=False)
+        breaker.record(0.1, failed=True)
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_probe(self):
+        """After the timeout, is exactly one probe allowed, closing the breaker on success?"""
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record(0.1, failed=True)
+        time.sleep(0.02)
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record(0.1, failed=False)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        """Does a failed half-open probe open the breaker again?"""
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record(0.1, failed=True)
+        time.sleep(0.02)
+
+        self.assertTrue(breaker.allow())
+        breaker.record(0.1, failed=True)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.stats()["times_opened"], 2)
+
+    def test_cancelled_probe(self):
+        """Can a half-open probe that was never made be handed to the next caller?"""
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record(0.1, failed=True)
+        time.sleep(0.02)
+
+        self.assertTrue(breaker.allow())
+        breaker.cancel()
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+
+class SingleFlightTestCase(TestCase):
+    """Test coalescing of concurrent identical calls."""
+
+    def run_concurrently(self, function, count=10):
+        """Call function from count threads at once and return their results."""
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(function())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_share_one_result(self):
+        """Do concurrent callers for one key share a single call?"""
+
+        singleflight = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"id" : 11037}
+
+        results = self.run_concurrently(lambda: singleflight.do("/animals/11037", fetch))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"id" : 11037}] * 10)
+        self.assertEqual(singleflight.stats()["saved"], 9)
+
+    def test_errors_are_shared(self):
+        """Do waiting callers receive the leader's exception?"""
+
+        singleflight = SingleFlight()
+
+        def fetch():
+            time.sleep(0.05)
+            raise ValueError("upstream failed")
+
+        def call():
+            try:
+                return singleflight.do("key", fetch)
+            except ValueError as exc:
+                return str(exc)
+
+        results = self.run_concurrently(call, count=5)
+
+        self.assertEqual(results, ["upstream failed"] * 5)
+        self.assertEqual(singleflight.stats()["calls"], 1)
+
+    def test_sequential_calls_not_shared(self):
+        """Does a call after the previous one finished run again?"""
+
+        singleflight = SingleFlight()
+        singleflight.do("key", lambda: 1)
+        singleflight.do("key", lambda: 2)
+
+        self.assertEqual(singleflight.stats(), {"calls" : 2, "saved" : 0, "in_flight" : 0})
@@ -0,0 +1,88 @@
+"""Local pet search tests."""
+
+from unittest import TestCase
+
+from models import db, Pet
+from search import search_pets, can_search_locally
+
+from app import create_app
+
+app = create_app("test")
+
+with app.app_context():
+    db.drop_all()
+    db.create_all()
+
+
+def make_pet(id, name, type="Dog", breed="Pug", size="Small", status="adoptable", description=None):
+    """Build a stored pet with the given searchable fields."""
+
+    return Pet(id=id, name=name, type=type, species=type, breed=breed, color="Black", age="Adult",
+               gender="Female", size=size, status=status, description=description)
+
+
+class PetSearchTestCase(TestCase):
+    """Test full-text and faceted search over stored pets."""
+
+    def setUp(self):
+        """Store a handful of pets."""
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+
+        db.session.rollback()
+        Pet.query.delete()
+
+        db.session.add_all([
+            make_pet(1, "Fred", description="Loves long walks"),
+            make_pet(2, "Spark", breed="Samoyed", size="Large"),
+            make_pet(3, "Luna", type="Cat", breed="Siamese", size="Medium"),
+            make_pet(4, "Milo", breed="Samoyed", size="Extra Large", status="adopted"),
+            make_pet(5, "Walks", type="Cat", breed="Tabby"),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up fouled transactions."""
+
+        db.session.rollback()
+        self.app_context.pop()
+
+    def test_facet_filters(self):
+        """Do facet filters match Petfinder's values, adoptable pets only by default?"""
+
+        json = search_pets({"type" : "dog", "size" : "small,xlarge"})
+        self.assertEqual([pet["id"] for pet in json["animals"]], [1])
+
+        json = search_pets({"type" : "dog", "size" : "small,xlarge", "status" : "adopted"})
+        self.assertEqual([pet["id"] for pet in json["animals"]], [4])
+
+    def test_text_search(self):
+        """Are name, breed and color matched by stemmed full-text search, each against its own column only?"""
+
+        self.assertEqual({pet["id"] for pet in search_pets({"breed" : "samoyed,tabby"})["animals"]}, {2, 5})
+        self.assertEqual({pet["id"] for pet in search_pets({"color" : "black"})["animals"]}, {1, 2, 3, 5})
+
+        # Fred's description "Loves long walks" does not match a name search
+        self.assertEqual([pet["id"] for pet in search_pets({"name" : "walk"})["animals"]], [5])
+        self.assertEqual(search_pets({"breed" : "walk"})["animals"], [])
+        self.assertEqual(search_pets({"name" : "samoyed"})["animals"], [])
+        self.assertEqual(search_pets({"breed" : "dog"})["animals"], [])
+        self.assertEqual(search_pets({"name" : "!!, ''"})["pagination"]["total_count"], 4)
+
+    def test_facet_counts_and_pages(self):
+        """Are facet counts and pagination computed over every matching pet?"""
+
+        json = search_pets({"page" : 2}, per_page=3)
+
+        self.assertEqual(len(json["animals"]), 1)
+        self.assertEqual(json["pagination"]["total_count"], 4)
+        self.assertEqual(json["pagination"]["total_pages"], 2)
+        self.assertEqual(json["facets"]["type"], {"Dog" : 2, "Cat" : 2})
+        self.assertEqual(json["facets"]["size"], {"Small" : 2, "Large" : 1, "Medium" : 1})
+
+    def test_can_search_locally(self):
+        """Are location searches left to Petfinder?"""
+
+        self.assertTrue(can_search_locally({"type" : "dog", "name" : "", "location" : None, "page" : 2}))
+        self.assertFalse(can_search_locally({"type" : "dog", "location" : "10001"}))
@@ -0,0 +1,137 @@
+"""Server-side session tests."""
+
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+
+from flask import Flask, session
+
+from cache import TTLCache
+from sessions import ServerSideSessionInterface, DictSessionStore, CachedSessionStore
+
+
+def make_app(store):
+    """Build a tiny app whose sessions live in store."""
+
+    app = Flask(__name__)
+    app.secret_key = "TEST-SECRET-KEY"
+    app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session["search"] = {"type" : value}
+        return "set"
+
+    @app.route('/get')
+    def get_value():
+        return session.get("search", {}).get("type", "none")
+
+    @app.route('/user')
+    def get_user():
+        return str(session.get("user", "none"))
+
+    @app.route('/login')
+    def login():
+        session.regenerate()
+        session["user"] = 1
+        return "logged in"
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return "logged out"
+
+    return app
+
+
+class ServerSideSessionTestCase(TestCase):
+    """Test sessions kept on the server behind an opaque cookie."""
+
+    def setUp(self):
+        """Create an app with an in-memory session store."""
+
+        self.store = DictSessionStore()
+        self.client = make_app(self.store).test_client()
+
+    def session_cookie(self):
+        """Return the session cookie's value, or None."""
+
+        return next((cookie.value for cookie in self.client.cookie_jar if cookie.name == "session"), None)
+
+    def test_cookie_only_carries_id(self):
+        """Is the data stored server-side and read back through the cookie's id?"""
+
+        self.client.get("/set/dog")
+        sid = self.session_cookie()
+
+        self.assertNotIn("dog", sid)
+        self.assertIn("dog", self.store.load(sid)[0])
+        self.assertEqual(self.client.get("/get").get_data(as_text=True), "dog")
+
+    def test_regenerate_and_clear(self):
+        """Does logging in move the session to a new id, and logging out delete it?"""
+
+        self.client.get("/set/cat")
+        old_sid = self.session_cookie()
+
+        self.client.get("/login")
+        new_sid = self.session_cookie()
+
+        self.assertNotEqual(old_sid, new_sid)
+        self.assertIsNone(self.store.load(old_sid))
+        self.assertEqual(self.client.get("/get").get_data(as_text=True), "cat")
+
+        self.client.get("/logout")
+
+        self.assertIsNone(self.store.load(new_sid))
+        self.assertIsNone(self.session_cookie())
+
+    def test_cached_store_reads_through(self):
+        """Are repeat loads of an unchanged session answered by the cache rather than the backing store?"""
+
+        cache = TTLCache()
+        store = CachedSessionStore(self.store, cache)
+        self.assertEqual(store.save("SID", "{}", expires_at=datetime.now(timezone.utc) + timedelta(hours=1)), 1)
+
+        self.assertEqual(store.load("SID"), ("{}", 1))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        # changed through another worker: the cached copy is out of date
+        self.store.save("SID", '{"user": 1}', expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        self.assertEqual(store.load("SID"), ('{"user": 1}', 2))
+
+        self.store.delete("SID")
+        self.assertIsNone(store.load("SID"))
+
+    def test_stale_copy_not_saved(self):
+        """Is a save refused when the session changed or was removed since it was loaded?"""
+
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        version = self.store.save("SID", "{}", expires_at)
+
+        self.assertEqual(self.store.save("SID", '{"a": 1}', expires_at, version), version + 1)
+        self.assertIsNone(self.store.save("SID", '{"b": 1}', expires_at, version))
+        self.assertEqual(self.store.load("SID"), ('{"a": 1}', version + 1))
+
+        self.store.delete("SID")
+        self.assertIsNone(self.store.save("SID", '{"a": 1}', expires_at, version + 1))
+
+    def test_logout_seen_by_other_workers(self):
+        """
+        After logging out through one worker, is the session gone for
+        another worker that cached it, and not written back by it?
+        """
+
+        worker_a = make_app(CachedSessionStore(self.store, TTLCache())).test_client()
+        worker_b = make_app(CachedSessionStore(self.store, TTLCache())).test_client()
+
+        worker_a.get("/login")
+        sid = next(cookie.value for cookie in worker_a.cookie_jar if cookie.name == "session")
+        worker_b.set_cookie("localhost", "session", sid)
+
+        self.assertEqual(worker_b.get("/user").get_data(as_text=True), "1")
+
+        worker_a.get("/logout")
+
+        self.assertEqual(worker_b.get("/user").get_data(as_text=True), "none")
+        worker_b.get("/set/dog")
+        self.assertIsNone(self.store.load(sid))
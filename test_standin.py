@@ -0,0 +1,112 @@
+"""Petfinder stand-in tests."""
+
+import time
+from unittest import TestCase
+
+from petfinder import PetfinderClient, PetfinderError
+from ratelimit import RateLimiter
+from standin import PetfinderStandIn
+
+
+class PetfinderStandInTestCase(TestCase):
+    """Test the stand-in through the real Petfinder client."""
+
+    def setUp(self):
+        """Start a small stand-in and a client without retries pointed at it."""
+
+        self.stand_in = PetfinderStandIn(animals=150, organizations=10)
+        self.client = PetfinderClient("TEST-KEY", "TEST-SECRET", base_url=self.stand_in.start(), max_retries=0)
+
+    def tearDown(self):
+        """Stop the stand-in."""
+
+        self.stand_in.shutdown()
+
+    def test_same_seed_same_dataset(self):
+        """Is the generated dataset reproducible?"""
+
+        self.assertEqual(PetfinderStandIn(animals=150, organizations=10).animals, self.stand_in.animals)
+
+    def test_search_filters_and_pages(self):
+        """Are animal searches filtered like Petfinder's and paginated?"""
+
+        json = self.client.search_animals({"type" : "dog", "size" : "small,xlarge", "limit" : 5})
+        pagination = json["pagination"]
+
+        self.assertLessEqual(len(json["animals"]), 5)
+        self.assertGreater(pagination["total_count"], 0)
+        self.assertEqual(pagination["total_pages"], -(-pagination["total_count"] // 5))
+        for animal in json["animals"]:
+            self.assertEqual(animal["type"], "Dog")
+            self.assertIn(animal["size"], ("Small", "Extra Large"))
+            self.assertEqual(animal["status"], "adoptable")
+
+        second = self.client.search_animals({"type" : "dog", "size" : "small,xlarge", "limit" : 5, "page" : 2})
+        self.assertEqual(second["pagination"]["current_page"], 2)
+        self.assertFalse({animal["id"] for animal in json["animals"]} & {animal["id"] for animal in second["animals"]})
+
+    def test_details(self):
+        """Are animals and organizations found by id, and unknown ids a 404?"""
+
+        organization = self.stand_in.organizations[0]
+
+        self.assertEqual(self.client.get_animal(1)["id"], 1)
+        self.assertEqual(self.client.get_organization(organization["id"].lower())["name"], organization["name"])
+
+        with self.assertRaises(PetfinderError) as raised:
+            self.client.get_animal(10 ** 6)
+        self.assertEqual(raised.exception.status_code, 404)
+
+    def test_injected_errors(self):
+        """Are injected 500s and 429s passed on to the client?"""
+
+        self.stand_in.error_rate = 1
+        with self.assertRaises(PetfinderError) as raised:
+            self.client.get_animal(1)
+        self.assertEqual(raised.exception.status_code, 500)
+
+        self.stand_in.error_rate, self.stand_in.rate_limited_rate = 0, 1
+        with self.assertRaises(PetfinderError) as raised:
+            self.client.get_animal(2)
+        self.assertEqual(raised.exception.status_code, 429)
+
+    def test_rejected_token_is_replaced(self):
+        """Does the client get a new token after the stand-in rejects its current one?"""
+
+        self.client.get_animal(1)
+        self.stand_in._tokens.clear()
+
+        self.assertEqual(self.client.get_animal(2)["id"], 2)
+        self.assertEqual(self.stand_in.stats()[401], 1)
+
+    def test_every_request_counts_towards_quota(self):
+        """Do token requests and the pool's own retries each count towards the daily quota?"""
+
+        client = PetfinderClient("TEST-KEY", "TEST-SECRET", base_url=self.stand_in.base_url, max_retries=2,
+                                 backoff_factor=0, rate_limiter=RateLimiter(daily_quota=100))
+
+        client.get_animal(1)
+        self.assertEqual(client.rate_limiter.stats()["used_today"], 2) # token request and lookup
+
+        self.stand_in.error_rate = 1
+        with self.assertRaises(PetfinderError):
+            client.get_animal(2)
+
+        self.assertEqual(self.stand_in.stats()[500], 3)
+        self.assertEqual(client.rate_limiter.stats()["used_today"], 5)
+        self.assertEqual(client.stats()["requests"], 5)
+
+    def test_rate_limited_not_retried(self):
+        """Is a 429 with Retry-After returned at once, without retries or waiting?"""
+
+        client = PetfinderClient("TEST-KEY", "TEST-SECRET", base_url=self.stand_in.base_url, max_retries=2, backoff_factor=0)
+        client.get_animal(1)
+        self.stand_in.rate_limited_rate = 1
+
+        start = time.monotonic()
+        with self.assertRaises(PetfinderError) as raised:
+            client.get_animal(2)
+
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.stand_in.stats()[429], 1)
@@ -1,18 +1,17 @@
 """User model tests."""
 
-import os
 from unittest import TestCase
 
 from models import db, User, Bookmark, Follow
 from sqlalchemy.exc import IntegrityError
 
-#set environmental variable to be a test db
-os.environ['DATABASE_URL'] = "postgresql:///pawprint-test"
+from app import create_app
 
-from app import app
+app = create_app("test")
 
-db.drop_all()
-db.create_all()
+with app.app_context():
+    db.drop_all()
+    db.create_all()
 
 class UserModelTestCase(TestCase):
     """Test model for users."""
@@ -20,6 +19,9 @@ class UserModelTestCase(TestCase):
     def setUp(self):
         """Create test client."""
 
+        self.app_context = app.app_context()
+        self.app_context.push()
+
         db.session.rollback()
         User.query.delete()
         Bookmark.query.delete()
@@ -28,9 +30,6 @@ class UserModelTestCase(TestCase):
         self.client = app.test_client()
         app.testing=True
 
-        self.app_context = app.app_context()
-        self.app_context.push()
-
     def tearDown(self):
         """Clean up fouled transactions."""
 
@@ -110,4 +109,20 @@ class UserModelTestCase(TestCase):
 
         # User.authenticate should return False if given incorrect username or password
         self.assertFalse(User.authenticate(username="testuse", password="HASHED_PASSWORD"))
-        self.assertFalse(User.authenticate(username="testuser", password="HASHED_PASWORD"))
\ No newline at end of file
+        self.assertFalse(User.authenticate(username="testuser", password="HASHED_PASWORD"))
+
+    def test_user_authenticate_rehashes_old_cost(self):
+        """Does a successful login rehash a password hashed at an older bcrypt cost?"""
+
+        user = User.signup("test@test.com", "testuser", "password", "Test", "Testing", None, "10001")
+        db.session.commit()
+
+        hasher = app.extensions['passwords']
+        hasher.rounds += 1
+
+        try:
+            self.assertIs(user, User.authenticate(username="testuser", password="password"))
+            self.assertFalse(hasher.needs_rehash(user.password))
+            self.assertIs(user, User.authenticate(username="testuser", password="password"))
+        finally:
+            hasher.rounds -= 1
@@ -1,21 +1,24 @@
 """User views tests."""
 
-import os
+import base64
+import json
 from unittest import TestCase
 
 from models import db, User, Organization, Pet, Bookmark, Follow
+from sqlalchemy import event
 from sqlalchemy.exc import IntegrityError
 
-#set environmental variable to be a test db
-os.environ['DATABASE_URL'] = "postgresql:///pawprint-test"
+from app import create_app, CURRENT_USER_KEY, PET_SEARCH_FORM_KEY, ORGANIZATION_SEARCH_FORM_KEY
+from geo import centroid
 
-from app import app, CURRENT_USER_KEY
+app = create_app("test")
 
 # disable CSRF tokens to test signing up and logging in
 app.config['WTF_CSRF_ENABLED'] = False
 
-db.drop_all()
-db.create_all()
+with app.app_context():
+    db.drop_all()
+    db.create_all()
 
 class UserViewsTestCase(TestCase):
     """Test views for users."""
@@ -23,17 +26,19 @@ class UserViewsTestCase(TestCase):
     def setUp(self):
         """Create test client and add sample data."""
 
+        self.app_context = app.app_context()
+        self.app_context.push()
+
         db.session.rollback()
         User.query.delete()
         Bookmark.query.delete()
         Follow.query.delete()
+        Pet.query.delete()
+        Organization.query.delete()
 
         self.client = app.test_client()
         app.testing=True
 
-        self.app_context = app.app_context()
-        self.app_context.push()
-
         # create and commit a test user
 
         user = User(
@@ -159,3 +164,378 @@ class UserViewsTestCase(TestCase):
             # assert that test user successfully accesses the Edit Profile form page
             self.assertEqual(response.status_code, 200)
             self.assertIn("Edit Profile", html)
+
+    def test_new_search_starts_at_first_page(self):
+        """Does submitting a search from a later page redirect to page 1 and keep the filters?"""
+
+        response = self.client.post("/organizations?page=3", data={"name" : "Rescue"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.location, "/organizations")
+
+        with self.client.session_transaction() as session:
+            self.assertEqual(session[ORGANIZATION_SEARCH_FORM_KEY]["name"], "Rescue")
+
+    def count_selects(self, path, table=None):
+        """GET path as the logged in test user and return how many SELECTs (from table, if given) it issued."""
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and (table is None or f"FROM {table}" in statement):
+                statements.append(statement)
+
+        with self.client.session_transaction() as session:
+            session[CURRENT_USER_KEY] = self.user_id
+
+        # start from an empty identity map so each page loads what it needs
+        db.session.expire_all()
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = self.client.get(path)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+
+    def add_bookmarks(self, count, start=1):
+        """Bookmark count new pets, each from its own new organization, for the test user."""
+
+        for i in range(start, start + count):
+            organization = Organization(
+                id=f"TEST-{i}",
+                name=f"Test Organization {i}",
+                email="test@organization.org",
+                city="Test City",
+                state="Test State",
+                postcode="TEST-CODE",
+                country="Test Country",
+                url="https://google.com"
+            )
+            pet = Pet(
+                id=20000 + i,
+                name=f"Test Pet {i}",
+                type="Test",
+                species="Test",
+                breed="Beta",
+                age="Newborn",
+                gender="Unknown",
+                size="Small",
+                status="Unavailable",
+                organization_id=organization.id
+            )
+            db.session.add_all([organization, pet])
+            db.session.flush()
+            db.session.add(Bookmark(user_id=self.user_id, pet_id=pet.id))
+            db.session.add(Follow(user_id=self.user_id, organization_id=organization.id))
+
+        db.session.commit()
+
+    def test_logged_in_pages_skip_user_query(self):
+        """Do pages that only need to know who is logged in skip loading the user?"""
+
+        self.assertEqual(self.count_selects("/home"), 0)
+
+    def test_bookmarks_and_follows_query_count(self):
+        """
+        Do the bookmarks and follows pages issue the same number of queries
+        no matter how many pets and organizations the user has saved?
+        """
+
+        self.add_bookmarks(2)
+        few_bookmarks = self.count_selects("/bookmarks")
+        few_follows = self.count_selects("/follows")
+
+        self.add_bookmarks(50, start=3)
+        many_bookmarks = self.count_selects("/bookmarks")
+        many_follows = self.count_selects("/follows")
+
+        self.assertEqual(few_bookmarks, many_bookmarks)
+        self.assertEqual(few_follows, many_follows)
+
+    def test_local_pet_search(self):
+        """With LOCAL_PET_SEARCH on, is /pets answered from stored pets, with facet counts?"""
+
+        with self.client.session_transaction() as session:
+            session[PET_SEARCH_FORM_KEY] = {"type" : "test", "status" : "unavailable"}
+
+        app.config['LOCAL_PET_SEARCH'] = True
+        try:
+            html = self.client.get("/pets").get_data(as_text=True)
+        finally:
+            app.config['LOCAL_PET_SEARCH'] = False
+
+        self.assertIn("Test Pet", html)
+        self.assertIn("1 matching pets saved on Pawprint", html)
+
+    def test_follows_by_distance(self):
+        """Does /follows?sort=distance list followed organizations nearest to the user's location first?"""
+
+        for id, name, postcode in (("FAR", "Boston Rescue", "02108"), ("NEAR", "Hoboken Rescue", "07030")):
+            db.session.add(Organization(id=id, name=name, email="test@organization.org", city="Test City",
+                                        state="Test State", postcode=postcode, country="US",
+                                        url="https://google.com", latitude=centroid(postcode)[0],
+                                        longitude=centroid(postcode)[1]))
+            db.session.flush()
+            db.session.add(Follow(user_id=self.user_id, organization_id=id))
+        db.session.add(Follow(user_id=self.user_id, organization_id="TEST-0"))
+        self.user.location = "10001"
+        db.session.commit()
+
+        with self.client.session_transaction() as session:
+            session[CURRENT_USER_KEY] = self.user_id
+
+        html = self.client.get("/follows?sort=distance").get_data(as_text=True)
+
+        self.assertLess(html.index("Hoboken Rescue"), html.index("Boston Rescue"))
+        self.assertLess(html.index("Boston Rescue"), html.index("Test Organization"))
+        self.assertIn("Distance unknown", html)
+
+        # without a known location the page explains why it cannot sort
+        self.user.location = "Test City"
+        db.session.commit()
+
+        response = self.client.get("/follows?sort=distance")
+        self.assertEqual(response.status_code, 302)
+
+    def test_bookmarked_markers_query_count(self):
+        """
+        Are a search page's bookmarked pets found in one query whatever the
+        page size, remembered for the next visit, and forgotten when a
+        bookmark is removed?
+        """
+
+        self.add_bookmarks(2)
+        for i in range(40):
+            db.session.add(Pet(id=30000 + i, name=f"Other Pet {i}", type="Test", species="Test", breed="Beta",
+                               age="Newborn", gender="Unknown", size="Small", status="Unavailable",
+                               organization_id="TEST-0"))
+        db.session.commit()
+        app.extensions['saved_markers'].forget(self.user_id)
+
+        with self.client.session_transaction() as session:
+            session[PET_SEARCH_FORM_KEY] = {"type" : "test", "status" : "unavailable"}
+
+        page_size = app.config['SEARCH_PAGE_SIZE']
+        app.config['LOCAL_PET_SEARCH'] = True
+        try:
+            app.config['SEARCH_PAGE_SIZE'] = 5
+            small_page = self.count_selects("/pets", table="bookmarks")
+
+            app.config['SEARCH_PAGE_SIZE'] = 50
+            app.extensions['saved_markers'].forget(self.user_id)
+            large_page = self.count_selects("/pets", table="bookmarks")
+            repeat_visit = self.count_selects("/pets", table="bookmarks")
+
+            self.assertEqual(self.client.get("/pets").get_data(as_text=True).count('href="/bookmarks">Bookmarked</a>'), 2)
+
+            self.client.post("/bookmarks/remove", data={"pet_id" : 20001})
+            after_removal = self.count_selects("/pets", table="bookmarks")
+            html = self.client.get("/pets").get_data(as_text=True)
+        finally:
+            app.config['LOCAL_PET_SEARCH'] = False
+            app.config['SEARCH_PAGE_SIZE'] = page_size
+
+        self.assertEqual(small_page, 1)
+        self.assertEqual(large_page, 1)
+        self.assertEqual(repeat_visit, 0)
+        self.assertEqual(after_removal, 1)
+        self.assertEqual(html.count('href="/bookmarks">Bookmarked</a>'), 1)
+
+    def test_followed_markers(self):
+        """Are followed organizations among a page of results found in one query, then from the cache?"""
+
+        self.add_bookmarks(3)
+        markers = app.extensions['saved_markers']
+        markers.forget(self.user_id)
+        ids = ["TEST-0", "TEST-1", "TEST-2", "TEST-3", "NOT-STORED"]
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            self.assertEqual(markers.saved("follows", self.user_id, ids), {"TEST-1", "TEST-2", "TEST-3"})
+            self.assertEqual(markers.saved("follows", self.user_id, ids[:3]), {"TEST-1", "TEST-2"})
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+        self.assertEqual(len(statements), 1)
+
+    def test_tampered_cursor_redirects(self):
+        """Does a cursor edited to hold the wrong types redirect to the first page instead of erroring?"""
+
+        def cursor(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode("UTF-8")).decode("ascii")
+
+        with self.client.session_transaction() as session:
+            session[CURRENT_USER_KEY] = self.user_id
+
+        tampered = {
+            "/bookmarks" : [["2023-01-01T00:00:00", "abc"], ["2023-01-01T00:00:00", {"id" : 1}], ["yesterday", 1], [5, 1]],
+            "/follows" : [["2023-01-01T00:00:00", 7], ["2023-01-01T00:00:00", ["TEST-0"]], ["2023-01-01T00:00:00", True]],
+        }
+
+        for path, values in tampered.items():
+            for value in values:
+                for direction in ("after", "before"):
+                    response = self.client.get(f"{path}?{direction}={cursor(value)}")
+                    self.assertEqual(response.status_code, 302, (path, value))
+                    self.assertEqual(response.location, path)
+
+        # a cursor of the right types still works
+        self.assertEqual(self.client.get(f"/follows?after={cursor(['2023-01-01T00:00:00', 'TEST-0'])}").status_code, 200)
+
+    def bookmark(self, data, petfinder):
+        """POST a bookmark as the logged in test user with petfinder standing in for Petfinder.
+        Returns the statements it issued against pets, organizations, bookmarks and follows."""
+
+        statements = []
+        tables = ("pets", "organizations", "bookmarks", "follows")
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if any(f" {table}" in statement for table in tables):
+                statements.append(statement)
+
+        with self.client.session_transaction() as session:
+            session[CURRENT_USER_KEY] = self.user_id
+
+        async_petfinder = app.extensions['async_petfinder']
+        app.extensions['async_petfinder'] = petfinder
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = self.client.post("/pets/bookmark/new", data=data)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+            app.extensions['async_petfinder'] = async_petfinder
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.location, "/pets")
+        return statements
+
+    def test_bookmark_new_pet_and_organization(self):
+        """Does bookmarking a pet from an unstored organization fetch and store both in one call?"""
+
+        petfinder = StubAsyncPetfinder()
+        statements = self.bookmark({"pet_id" : 30001, "organization_id" : "NEW-1"}, petfinder)
+
+        self.assertEqual(petfinder.calls, [("animal", 30001), ("organization", "NEW-1")])
+        self.assertEqual(db.session.get(Pet, 30001).organization_id, "NEW-1")
+        self.assertEqual(db.session.get(Organization, "NEW-1").name, "New Organization")
+        self.assertIsNotNone(db.session.get(Bookmark, (self.user_id, 30001)))
+        self.assertIsNotNone(db.session.get(Follow, (self.user_id, "NEW-1")))
+
+        # one lookup, then one insert each for the organization, pet, bookmark and follow
+        self.assertEqual(len(statements), 5)
+        self.assertTrue(statements[0].lstrip().upper().startswith("SELECT"))
+        self.assertTrue(all(statement.lstrip().upper().startswith("INSERT") for statement in statements[1:]))
+
+    def test_bookmark_again_is_noop(self):
+        """Does bookmarking an already bookmarked pet skip Petfinder and leave the rows as they were?"""
+
+        data = {"pet_id" : 11037, "organization_id" : "TEST-0"}
+        self.bookmark(data, StubAsyncPetfinder())
+        created_at = db.session.get(Bookmark, (self.user_id, 11037)).created_at
+        db.session.commit()
+
+        petfinder = StubAsyncPetfinder()
+        statements = self.bookmark(data, petfinder)
+
+        self.assertEqual(petfinder.calls, [])
+        self.assertEqual(Pet.query.count(), 1)
+        self.assertEqual(Organization.query.count(), 1)
+        self.assertEqual(Bookmark.query.count(), 1)
+        self.assertEqual(Follow.query.count(), 1)
+        self.assertEqual(db.session.get(Bookmark, (self.user_id, 11037)).created_at, created_at)
+
+        # one lookup, then the bookmark and follow inserts, which do nothing
+        self.assertEqual(len(statements), 3)
+
+    def test_bookmark_stored_pet_missing_organization(self):
+        """Is only the organization fetched when the pet is stored but the organization is not?"""
+
+        petfinder = StubAsyncPetfinder()
+        statements = self.bookmark({"pet_id" : 11037, "organization_id" : "NEW-1"}, petfinder)
+
+        self.assertEqual(petfinder.calls, [("organization", "NEW-1")])
+        self.assertEqual(db.session.get(Organization, "NEW-1").name, "New Organization")
+        self.assertEqual(db.session.get(Pet, 11037).name, "Test Pet")
+        self.assertIsNotNone(db.session.get(Bookmark, (self.user_id, 11037)))
+        self.assertIsNotNone(db.session.get(Follow, (self.user_id, "NEW-1")))
+
+        # one lookup, then inserts for the organization, bookmark and follow
+        self.assertEqual(len(statements), 4)
+
+    def test_deleted_user_logged_out(self):
+        """Is a session whose user has been deleted logged out instead of erroring?"""
+
+        with self.client.session_transaction() as session:
+            session[CURRENT_USER_KEY] = self.user_id
+
+        db.session.delete(self.user)
+        db.session.commit()
+
+        response = self.client.get("/follows?sort=distance")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.location, "/")
+        with self.client.session_transaction() as session:
+            self.assertNotIn(CURRENT_USER_KEY, session)
+
+        with self.client.session_transaction() as session:
+            session[CURRENT_USER_KEY] = self.user_id
+
+        petfinder = StubAsyncPetfinder()
+        async_petfinder = app.extensions['async_petfinder']
+        app.extensions['async_petfinder'] = petfinder
+        try:
+            response = self.client.post("/pets/bookmark/new", data={"pet_id" : 11037, "organization_id" : "TEST-0"})
+        finally:
+            app.extensions['async_petfinder'] = async_petfinder
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.location, "/")
+        self.assertEqual(petfinder.calls, [])
+        self.assertEqual(Bookmark.query.count(), 0)
+        with self.client.session_transaction() as session:
+            self.assertNotIn(CURRENT_USER_KEY, session)
+
+class StubAsyncPetfinder:
+    """Stands in for AsyncPetfinderClient, recording each lookup."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_animal(self, animal_id):
+        self.calls.append(("animal", animal_id))
+        return {
+            "id" : animal_id,
+            "name" : "New Pet",
+            "type" : "Dog",
+            "species" : "Dog",
+            "breeds" : {"primary" : "Beagle"},
+            "colors" : {"primary" : None},
+            "age" : "Young",
+            "gender" : "Female",
+            "size" : "Small",
+            "status" : "adoptable",
+            "description" : None,
+            "photos" : [],
+            "organization_id" : "NEW-1",
+        }
+
+    async def get_organization(self, organization_id):
+        self.calls.append(("organization", organization_id))
+        return {
+            "id" : organization_id,
+            "name" : "New Organization",
+            "email" : "new@organization.org",
+            "phone" : None,
+            "address" : {"address1" : None, "city" : "Test City", "state" : "TS", "postcode" : "TEST-CODE", "country" : "US"},
+            "url" : "https://google.com",
+            "photos" : [],
+        }